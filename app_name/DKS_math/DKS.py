@@ -7,11 +7,109 @@ from itertools import product
 import cProfile
 import asyncio
 import copy
+import os
 import time
 from datetime import datetime as dt
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from app_name.DKS_math.solver.solver_p_in import PressInSolver
 from app_name.DKS_math.solver.solver_p_out import *
+from app_name.DKS_math.confGDH import summry_to_array
+
+P_OUT_TARGET_WINDOW = (-0.1, 0.75)
+DEFAULT_QUANT_RESOLUTION = {'q_rate': 0.01, 'p_in': 0.01, 'p_target': 0.01}
+_worker_state = {}
+
+
+def _init_worker(solvers:List['ConfGDHSolver'], modes:List[Mode]):
+    """Инициализация процесса пула: компоновки (с ГДХ ступеней) и режимы передаются один раз"""
+    _worker_state['solvers'] = solvers
+    _worker_state['modes'] = modes
+
+
+def _minimize_task(solver_ind:int, mode_ind:int, cnt:Tuple[int, ...]):
+    """Оптимизация одного сочетания количества агрегатов в процессе пула"""
+    comp = _worker_state['solvers'][solver_ind].get_conf_gdh_solver(cnt)
+    return comp.solver.minimize(_worker_state['modes'][mode_ind])
+
+
+def _min_value_task(solver_ind:int, mode_ind:int, pruned:bool):
+    """Расчет режима для компоновки целиком в процессе пула"""
+    solver = _worker_state['solvers'][solver_ind]
+    return solver.sync_get_min_value(_worker_state['modes'][mode_ind], pruned)
+
+
+def _modes_chain_task(solver_ind:int, pruned:bool, warm_start:Dict):
+    """Расчет всех режимов компоновки цепочкой с теплым стартом в процессе пула
+    Returns:
+        tuple: (итоговые режимы, решения по сочетаниям после последнего режима)
+    """
+    solver = _worker_state['solvers'][solver_ind]
+    values = [
+        solver.sync_get_min_value(mode, pruned, warm_start)
+    for mode in _worker_state['modes']]
+    return values, warm_start
+
+
+def select_summry(summry:np.ndarray, p_target:float=None) -> int|None:
+    """Выбор сочетания количества агрегатов
+    
+    Отбор по таргету давления на выходе последней ступени, затем минимум суммарного 
+    количества агрегатов, затем минимум суммарной мощности (первое при равенстве).
+    Args:
+        summry (np.ndarray): Структурированный массив (n_comb, n_stages) с полями SUMMRY_DTYPE
+        p_target (float, optional): Целевое давление, МПа; None - без отбора по таргету
+    Returns:
+        int | None: Индекс выбранного сочетания, None - нет допустимых
+    """
+    ind = np.arange(len(summry))
+    if p_target is not None:
+        p_out_diff = summry['p_out'][:, -1] - p_target
+        ind = ind[(p_out_diff < P_OUT_TARGET_WINDOW[1]) & (p_out_diff > P_OUT_TARGET_WINDOW[0])]
+        if not ind.size:
+            return None
+    work_gpa = summry['work_gpa'][ind].sum(axis=1)
+    ind = ind[work_gpa == work_gpa.min()]
+    power = np.nansum(summry['power'][ind] * summry['work_gpa'][ind], axis=1)
+    return ind[np.argmin(power)]
+
+
+def summ_to_frame(result:List[dict], decimals:int=None) -> pd.DataFrame:
+    """Результат выбранного сочетания по ступеням в DataFrame (значения - объекты python)"""
+    def to_value(value):
+        if decimals is not None and isinstance(value, (float, np.floating)):
+            value = np.round(value, decimals)
+        return value.item() if isinstance(value, np.generic) else value
+
+    return pd.DataFrame(
+        [{name: to_value(value) for name, value in stage.items()} for stage in result], 
+        index=pd.Index(np.arange(len(result)), name='stage_num'), 
+        dtype=object)
+
+
+class ConfGDHVariant(ConfGDH):
+    """Вариант компоновки с заданным количеством работающих агрегатов на ступенях
+
+    ГДХ ступеней разделяются с исходной компоновкой, вариант хранит только кортеж 
+    количеств и собственный решатель. После создания не изменяется.
+    """
+
+    def __init__(self, base:'ConfGDHSolver', counts:Tuple[int, ...]) -> None:
+        self.counts = tuple(counts)
+        self.stage_list = tuple(
+            (stage, cnt) 
+        for (stage, _), cnt in zip(base.stage_list, self.counts))
+        self.avo_dp = base.avo_dp
+        self.t_in = base.t_in
+        self.avo_t_in = base.avo_t_in
+        self.solver = type(base.solver)(self, base.solver.bound_dict)
+        self._frozen = True
+
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'{type(self).__name__} is immutable')
+        super().__setattr__(name, value)
+
 
 class ConfGDHSolver(ConfGDH):
     def __init__(self, comp_list:List[List[Tuple[GdhInstance, int]]], 
@@ -25,25 +123,25 @@ class ConfGDHSolver(ConfGDH):
             for stage_list, bound_dict in zip(comp_list[1:], bound_dict_list[1:])
         ]
 
-    def get_list_conf_gdh_solver(self) -> List['ConfGDHSolver']: 
-        list_gpa_max = list(product(*list([
+    def get_list_cnt(self) -> List[Tuple[int, ...]]:
+        return list(product(*list([
                 list(range(1, cnt+1))
             for _, cnt in self.stage_list])))
-        res = []
-        for cnt in list_gpa_max:
-            comp = self.clone()
-            comp.stage_list = [
-                (spch,cnt[ind])
-            for ind, (spch,_) in enumerate(comp.stage_list)]
-            res.append(comp)
-        return res
+
+
+    def get_conf_gdh_solver(self, cnt:Tuple[int, ...]) -> ConfGDHVariant:
+        return ConfGDHVariant(self, cnt)
+
+
+    def get_list_conf_gdh_solver(self) -> List[ConfGDHVariant]: 
+        return [self.get_conf_gdh_solver(cnt) for cnt in self.get_list_cnt()]
     
 
     def clone(self)->'ConfGDHSolver':
         return copy.deepcopy(self)
     
 
-    def get_summ(self, min_value_list, list_comp:List['ConfGDHSolver'], mode: Mode):
+    def get_summ(self, min_value_list, list_comp:List[ConfGDHVariant], mode: Mode):
 
         res = [
             comp.get_summry_without_bound(mode, min_val.x)
@@ -54,29 +152,11 @@ class ConfGDHSolver(ConfGDH):
         if not res:
             return None
         
-        df_res = pd.DataFrame([
-            {**stage, 'stage_num': i, 'count_ind': ind} 
-            for ind, result in enumerate(res)
-            for i, stage in enumerate(result) 
-        ]).set_index(['stage_num','count_ind'])
-
-        df_res = df_res.unstack('count_ind').stack(level=0).T
-        df_res = df_res[((df_res.loc[:, (df_res.columns.levels[0][-1], 'p_out')] - mode.p_target) < 0.75) & 
-                        ((df_res.loc[:, (df_res.columns.levels[0][-1], 'p_out')] - mode.p_target) > -0.1)] #отбор по таргету 
-        
-        if df_res.empty:
+        ind = select_summry(summry_to_array(res), mode.p_target)
+        if ind is None:
             return None
         
-        work_gpa_sum = df_res.loc[:, (slice(None), 'work_gpa')].sum(axis=1).min() #поиск минимального количества агрегатов на ступенях
-        
-        df_res = df_res[df_res.loc[:, (slice(None), 'work_gpa')].sum(axis=1) == work_gpa_sum] #поиск минимального количества агрегатов на ступенях - индекс
-
-        idx_min = (df_res.loc[:, (slice(None), 'power')] * 
-                   df_res.loc[:, (slice(None), 'work_gpa')].to_numpy()).sum(axis=1).idxmin() #поиск минимальной суммарной мощности на ступенях
-        df_res = df_res.loc[idx_min]
-        df_res:pd.DataFrame = df_res.unstack()
-        
-        df_res = df_res.assign(
+        df_res = summ_to_frame(res[ind]).assign(
             q_rate=mode.q_rate,
             p_in=mode.p_in,
             p_target=mode.p_target
@@ -98,30 +178,286 @@ class ConfGDHSolver(ConfGDH):
         return await self.get_summ(min_value_list, list_comp, mode)
 
 
-    def sync_get_min_value(self, mode:Mode):
+    def sync_get_min_value(self, mode:Mode, pruned=False, warm_start:Dict[Tuple[int, ...], np.ndarray]=None):
+        """Расчет режима по всем сочетаниям количества агрегатов
+        Args:
+            mode (Mode): Режим
+            pruned (bool, optional): Поиск по уровням количества агрегатов {default = False}
+            warm_start (Dict[Tuple[int, ...], np.ndarray], optional): Решения предыдущего режима 
+                по сочетаниям количества агрегатов; используются как начальное приближение 
+                и обновляются сошедшимися решениями {default = None}
+        Returns:
+            pd.DataFrame: Итоговый режим
+        """
+        if pruned:
+            return self.get_min_value_pruned(mode, warm_start)
+        
         list_comp = self.get_list_conf_gdh_solver()
-        min_value_list = []
-        for comp in list_comp:
-            result = comp.solver.minimize(mode)
-            min_value_list.append(result)
+        min_value_list = [self.minimize_comp(comp, mode, warm_start) for comp in list_comp]
 
         return self.get_summ(min_value_list, list_comp, mode)
 
 
-    def get_all_comp(self, modes):
+    @staticmethod
+    def minimize_comp(comp:ConfGDHVariant, mode:Mode, warm_start:Dict[Tuple[int, ...], np.ndarray]=None):
+        """Оптимизация сочетания с начальным приближением из warm_start"""
+        if warm_start is None:
+            return comp.solver.minimize(mode)
+        res = comp.solver.minimize(mode, warm_start.get(comp.counts))
+        if res.success:
+            warm_start[comp.counts] = res.x
+        return res
+
+
+    def get_min_value_pruned(self, mode:Mode, warm_start:Dict[Tuple[int, ...], np.ndarray]=None):
+        """Поиск по уровням суммарного количества агрегатов
+        
+        Сочетания перебираются по возрастанию суммы work_gpa, перебор останавливается 
+        на первом уровне с допустимым режимом. Результат совпадает с полным перебором, 
+        так как get_summ сначала выбирает минимальную сумму агрегатов.
+        """
+        levels = defaultdict(list)
+        for cnt in self.get_list_cnt():
+            levels[sum(cnt)].append(cnt)
+
+        for level in sorted(levels):
+            list_comp = [
+                comp
+            for comp in map(self.get_conf_gdh_solver, levels[level])
+                if self.is_freq_feasible(comp, mode)
+            ]
+            if not list_comp:
+                continue
+            min_value_list = [self.minimize_comp(comp, mode, warm_start) for comp in list_comp]
+            res = self.get_summ(min_value_list, list_comp, mode)
+            if res is not None:
+                return res
+        return None
+
+
+    def is_freq_feasible(self, comp:ConfGDHVariant, mode:Mode, tol=1e-6) -> bool:
+        """Проверка пересечения границ частот (get_freq_bound_all) с ограничением freq_dimm
+        
+        Solver.minimize ограничивает частоты ступеней min/max границ get_freq_bound_all, 
+        поэтому пустое пересечение с допустимым диапазоном freq_dimm доказывает 
+        недопустимость сочетания без запуска оптимизатора.
+        """
+        freq_bounds = comp.get_freq_bound_all(mode)
+        for ind, ((stage, _), freq) in enumerate(zip(comp.stage_list, freq_bounds)):
+            if np.isnan(freq).any():
+                continue
+            freq_dimm = self.solver.bound_dict[ind].bounds.freq_dimm
+            if (np.max(freq) / stage.freq_nom < freq_dimm.min_value - tol or 
+                np.min(freq) / stage.freq_nom > freq_dimm.max_value + tol):
+                return False
+        return True
+
+
+    def get_all_comp(self, modes, max_workers=1, pruned=False, warm_start=False, 
+                     quantizer:'ModeQuantizer'=None, warm_starts:List[Dict]=None):
+        """Расчет всех режимов для всех компоновок
+        Args:
+            modes (List[Mode]): Режимы
+            max_workers (int, optional): Количество процессов; 1 - последовательный расчет, 
+                None - по числу ядер {default = 1}
+            pruned (bool, optional): Поиск по уровням количества агрегатов вместо полного перебора {default = False}
+            warm_start (bool, optional): Начальное приближение из решения предыдущего режима 
+                с тем же сочетанием количества агрегатов {default = False}
+            quantizer (ModeQuantizer, optional): Однократный расчет режимов, совпадающих 
+                после округления {default = None}
+            warm_starts (List[Dict], optional): Решения по сочетаниям для каждой компоновки 
+                от предыдущего расчета; при warm_start дополняются решениями этого {default = None}
+        Returns:
+            Dict[int, list]: Итоговые режимы по индексу компоновки
+        """
+        if quantizer is not None:
+            unique_modes, inverse = quantizer.unique(modes)
+            results = self.get_all_comp(unique_modes, max_workers, pruned, warm_start, warm_starts=warm_starts)
+            return quantizer.fan_out(results, modes, inverse)
+
         solvers = [self] + self.add_solvers
+        if max_workers != 1:
+            return self.get_all_comp_pool(solvers, modes, max_workers, pruned, warm_start, warm_starts)
+        
         results = defaultdict(list)
-        for ind, solver in enumerate(solvers):
-            for mode in modes:
-                tasks = solver.sync_get_min_value(mode)
-                results[ind].append(tasks)
-        return results   
-
-def calc_modes_parall(conf_solv_obj: ConfGDHSolver, modes: List[Mode]):
-    results = conf_solv_obj.get_all_comp(modes)
+        for ind, _, res in self.iter_all_comp(modes, pruned, warm_start, warm_starts):
+            results[ind].append(res)
+        return results
+
+
+    def iter_all_comp(self, modes, pruned=False, warm_start=False, warm_starts:List[Dict]=None):
+        """Последовательный расчет с выдачей каждого режима сразу после решения
+
+        Порядок - по режимам, внутри режима по компоновкам: первый режим всех компоновок 
+        доступен до расчета остальных.
+        Args:
+            modes (List[Mode]): Режимы
+            pruned (bool, optional): Поиск по уровням количества агрегатов {default = False}
+            warm_start (bool, optional): Начальное приближение из решения предыдущего режима 
+                с тем же сочетанием количества агрегатов {default = False}
+            warm_starts (List[Dict], optional): Решения предыдущего расчета по компоновкам, 
+                обновляются на месте {default = None}
+        Yields:
+            Tuple[int, int, pd.DataFrame | None]: (индекс компоновки, индекс режима, итоговый режим)
+        """
+        solvers = [self] + self.add_solvers
+        if warm_start and warm_starts is not None:
+            solvers_warm_start = warm_starts
+        else:
+            solvers_warm_start = [{} if warm_start else None for _ in solvers]
+        for mode_ind, mode in enumerate(modes):
+            for ind, solver in enumerate(solvers):
+                yield ind, mode_ind, solver.sync_get_min_value(mode, pruned, solvers_warm_start[ind])
+
+
+    def get_all_comp_pool(self, solvers:List['ConfGDHSolver'], modes:List[Mode], max_workers=None, pruned=False, 
+                          warm_start=False, warm_starts:List[Dict]=None):
+        """Расчет в пуле процессов: задача - (компоновка, режим, сочетание количества агрегатов), 
+        при поиске по уровням - (компоновка, режим), при теплом старте - компоновка целиком"""
+        max_workers = os.cpu_count() if max_workers is None else max_workers
+        if warm_start:
+            with ProcessPoolExecutor(max_workers=max_workers, 
+                                     initializer=_init_worker, 
+                                     initargs=(solvers, modes)) as pool:
+                chains = list(pool.map(_modes_chain_task, range(len(solvers)), [pruned] * len(solvers), 
+                                       warm_starts or [{} for _ in solvers]))
+            #решения из процессов пула переносятся в warm_starts вызывающего
+            if warm_starts is not None:
+                for layout_warm_start, (_, chain_warm_start) in zip(warm_starts, chains):
+                    layout_warm_start.update(chain_warm_start)
+            return defaultdict(list, enumerate(values for values, _ in chains))
+
+        if pruned:
+            tasks = [
+                (solver_ind, mode_ind, pruned)
+            for solver_ind in range(len(solvers))
+                for mode_ind in range(len(modes))
+            ]
+            with ProcessPoolExecutor(max_workers=max_workers, 
+                                     initializer=_init_worker, 
+                                     initargs=(solvers, modes)) as pool:
+                values = iter(pool.map(_min_value_task, *zip(*tasks)))
+                results = defaultdict(list)
+                for ind in range(len(solvers)):
+                    results[ind] = [next(values) for _ in modes]
+                return results
+
+        tasks = [
+            (solver_ind, mode_ind, cnt)
+        for solver_ind, solver in enumerate(solvers)
+            for mode_ind in range(len(modes))
+                for cnt in solver.get_list_cnt()
+        ]
+        chunksize = max(1, len(tasks) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, 
+                                 initializer=_init_worker, 
+                                 initargs=(solvers, modes)) as pool:
+            min_values = iter(pool.map(_minimize_task, *zip(*tasks), chunksize=chunksize))
+
+            results = defaultdict(list)
+            for ind, solver in enumerate(solvers):
+                list_comp = solver.get_list_conf_gdh_solver()
+                for mode in modes:
+                    min_value_list = [next(min_values) for _ in list_comp]
+                    results[ind].append(solver.get_summ(min_value_list, list_comp, mode))
+        return results
+
+
+class ModeQuantizer:
+    """Округление режимов до шага по полям и однократный расчет совпавших режимов
+
+    Режимы с одинаковыми после округления значениями рассчитываются один раз, итоговый 
+    режим копируется всем исходным с заменой столбцов q_rate, p_in, p_target на исходные.
+    Поля без шага сравниваются точно.
+    """
+    def __init__(self, resolution:Dict[str, float]=None) -> None:
+        self.resolution = dict(DEFAULT_QUANT_RESOLUTION if resolution is None else resolution)
+        self.modes = 0
+        self.solved = 0
+
+
+    def quantize(self, mode:Mode) -> Mode:
+        res = mode.clone()
+        for name, step in self.resolution.items():
+            value = getattr(mode, name)
+            if step and value is not None:
+                setattr(res, name, _round_step(value, step))
+        return res
+
+
+    @staticmethod
+    def key(mode:Mode) -> tuple:
+        return tuple(
+            tuple(value) if isinstance(value, (list, tuple, np.ndarray)) else value 
+        for value in mode.to_dict().values())
+
+
+    def unique(self, modes:List[Mode]) -> Tuple[List[Mode], List[int]]:
+        """Уникальные округленные режимы и индекс уникального режима для каждого исходного"""
+        index, unique_modes, inverse = {}, [], []
+        for mode in modes:
+            q_mode = self.quantize(mode)
+            key = self.key(q_mode)
+            if key not in index:
+                index[key] = len(unique_modes)
+                unique_modes.append(q_mode)
+            inverse.append(index[key])
+        self.modes += len(modes)
+        self.solved += len(unique_modes)
+        return unique_modes, inverse
+
+
+    @staticmethod
+    def fan_out(results:Dict[int, list], modes:List[Mode], inverse:List[int]) -> Dict[int, list]:
+        """Итоговые режимы уникальных режимов по исходным режимам"""
+        fanned = defaultdict(list)
+        for ind, layout_results in results.items():
+            fanned[ind] = [
+                None if layout_results[unique_ind] is None else layout_results[unique_ind].assign(
+                    q_rate=mode.q_rate,
+                    p_in=mode.p_in,
+                    p_target=mode.p_target
+                )
+            for mode, unique_ind in zip(modes, inverse)]
+        return fanned
+
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'modes': self.modes,
+            'solved': self.solved,
+            'hits': self.modes - self.solved,
+            'hit_rate': (self.modes - self.solved) / self.modes if self.modes else 0.,
+        }
+
+
+def _round_step(value, step:float):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [_round_step(item, step) for item in value]
+    return round(round(value / step) * step, 10)
+
+
+def calc_modes_parall(conf_solv_obj: ConfGDHSolver, modes: List[Mode], max_workers=1, pruned=False, warm_start=False,
+                      quantizer:ModeQuantizer=None):
+    results = conf_solv_obj.get_all_comp(modes, max_workers, pruned, warm_start, quantizer)
     return results
 
 
+def calc_modes_warm(conf_solv_obj: ConfGDHSolver, modes: List[Mode], max_workers=1, pruned=False, 
+                    warm_starts:List[Dict]=None):
+    """Расчет части режимов с теплым стартом от решений предыдущей части (выполняется в процессе пула)
+    Args:
+        warm_starts (List[Dict], optional): Решения по сочетаниям для каждой компоновки 
+            из предыдущего вызова; None - холодный старт первого режима {default = None}
+    Returns:
+        tuple: (итоговые режимы по индексу компоновки, warm_starts для следующей части)
+    """
+    if warm_starts is None:
+        warm_starts = [{} for _ in range(1 + len(conf_solv_obj.add_solvers))]
+    results = conf_solv_obj.get_all_comp(modes, max_workers, pruned, True, warm_starts=warm_starts)
+    return results, warm_starts
+
+
 
 
  
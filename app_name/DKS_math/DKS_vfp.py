@@ -2,18 +2,27 @@ import asyncio
 from collections import defaultdict
 from multiprocessing import Pool
 import multiprocessing
+import os
 import time
 import concurrent
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Tuple, Union
 from itertools import product
-from app_name.DKS_math.DKS import ConfGDHSolver
+from app_name.DKS_math.DKS import ConfGDHSolver, ConfGDHVariant, select_summry, summ_to_frame, _init_worker, _worker_state
+from app_name.DKS_math.confGDH import SUMMRY_DTYPE, summry_to_array
 from app_name.DKS_math.solver.solver_p_in import PressInSolver
 from app_name.DKS_math.solver.solver_p_out import *
 from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 
+def _vfp_column_task(solver_ind:int, q_rates:List[float], p_target:float, mode_params:Dict[str, float], 
+                     pruned:bool, warm_start:bool, skip_infeasible:bool):
+    """Расчет столбца таблицы VFP (одно давление на выходе) в процессе пула"""
+    solver:ConfGDHSolverVfp = _worker_state['solvers'][solver_ind]
+    return solver.solve_column(q_rates, p_target, mode_params, pruned, warm_start, skip_infeasible)
+
+
 class ConfGDHSolverVfp(ConfGDHSolver):
     def __init__(self, comp_list:List[List[Tuple[GdhInstance, int]]], 
                  bound_dict_list:List[List[Dict[str, Tuple[np.ndarray, np.ndarray, float]]]], 
@@ -26,73 +35,147 @@ class ConfGDHSolverVfp(ConfGDHSolver):
             for stage_list, bound_dict in zip(comp_list[1:], bound_dict_list[1:])
         ]
 
-    def get_summ(self, min_value_list, list_comp:List['ConfGDHSolver'], mode: Mode):
+    def get_summ(self, min_value_list, list_comp:List[ConfGDHVariant], mode: Mode):
         result = [
-            comp.get_summry_without_bound(Mode(
-                                        q_rate=mode.q_rate,
-                                        p_in=min_val.x[0], 
-                                        t_in=mode.t_in,
-                                        r_value=mode.r_value,
-                                        k_value=mode.k_value,
-                                        p_target=mode.p_target,
-                                        press_conditonal=mode.press_conditonal,
-                                        temp_conditonal=mode.temp_conditonal), min_val.x[1:])
+            comp.get_summry_without_bound(mode, min_val.x[1:], p_in=min_val.x[0])
         for min_val, comp in zip(min_value_list, list_comp)
             if min_val.success
         ]   
         if not result:
             return None
     
-        df_res = pd.DataFrame([
-            {**stage, 'stage_num': i, 'count_ind': ind} 
-            for ind, res in enumerate(result)
-            for i, stage in enumerate(res) 
-        ]).set_index(['stage_num','count_ind']).round(2)
-
-        df_res = df_res.unstack('count_ind').stack(level=0).T
+        summry = summry_to_array(result)
+        for name, (dtype, _) in SUMMRY_DTYPE.fields.items():
+            if dtype.kind == 'f':
+                summry[name] = summry[name].round(2)
+        ind = select_summry(summry)
 
-        work_gpa_sum = df_res.loc[:, (slice(None), 'work_gpa')].sum(axis=1).min() #поиск минимального количества агрегатов на ступенях
-        
-        df_res = df_res[df_res.loc[:, (slice(None), 'work_gpa')].sum(axis=1) == work_gpa_sum] #поиск минимального количества агрегатов на ступенях - индекс
-
-        
-        idx_min = (df_res.loc[:, (slice(None), 'power')] * 
-                   df_res.loc[:, (slice(None), 'work_gpa')].to_numpy()).sum(axis=1).idxmin() #поиск минимальной суммарной мощности на ступенях
-        df_res = df_res.loc[idx_min]
-        df_res:pd.DataFrame = df_res.unstack()
-        
-        df_res = df_res.assign(
+        df_res = summ_to_frame(result[ind], decimals=2).assign(
             q_rate=mode.q_rate,
             p_target=mode.p_target
         )
 
         return df_res.round(2)
-    
 
-    def get_all_comp(self, modes):
+
+    def is_freq_feasible(self, comp:ConfGDHVariant, mode:Mode, tol=1e-6) -> bool:
+        """Давление на входе - переменная PressInSolver, границы частот заранее не известны"""
+        return True
+
+
+    def solve_column(self, q_rates:List[float], p_target:float, mode_params:Dict[str, float], 
+                     pruned=False, warm_start=False, skip_infeasible=False) -> list:
+        """Расчет столбца таблицы VFP по возрастанию расхода
+        Args:
+            q_rates (List[float]): Расходы, млн. м3/сут
+            p_target (float): Давление на выходе, МПа
+            mode_params (Dict[str, float]): Остальные параметры Mode (t_in, r_value, k_value, 
+                press_conditonal, temp_conditonal)
+            pruned (bool, optional): Поиск по уровням количества агрегатов {default = False}
+            warm_start (bool, optional): Начальное приближение (p_in, частоты) из решения соседней 
+                ячейки с меньшим расходом {default = False}
+            skip_infeasible (bool, optional): Не считать ячейки, начиная с первой, недопустимой 
+                по производительности первой ступени (is_capacity_exceeded) {default = False}.
+                Недопустимость соседней ячейки по результату расчета не используется: решатель 
+                может не сойтись в допустимом режиме, а оценка is_capacity_exceeded доказывает 
+                недопустимость без расчета
+        Returns:
+            list: Итоговые режимы в порядке q_rates
+        """
+        warm = {} if warm_start else None
+        res = [None] * len(q_rates)
+        for ind in np.argsort(q_rates, kind='stable'):
+            mode = Mode(q_rate=q_rates[ind], p_in=None, p_target=p_target, **mode_params)
+            if skip_infeasible and self.is_capacity_exceeded(mode):
+                break
+            res[ind] = self.sync_get_min_value(mode, pruned, warm)
+        return res
+
+
+    def is_capacity_exceeded(self, mode:Mode, tol=1e-3) -> bool:
+        """Недопустимость режима по производительности первой ступени
+        
+        Объемный расход убывает с ростом давления на входе (p_in <= p_target в PressInSolver), 
+        поэтому при p_in = p_target, максимальном количестве агрегатов и максимальной частоте 
+        коэффициент расхода минимален. Если и он выше допустимого по udal, режим недопустим 
+        при любом сочетании, как и все режимы с большим расходом.
+        """
+        stage, cnt_gpa = self.stage_list[0]
+        bounds = self.solver.bound_dict[0].bounds
+        curr_mode = mode.clone()
+        curr_mode.p_in = mode.p_target
+        curr_mode.q_rate = mode.get_stage_q_rate(0, cnt_gpa)
+        u_val = stage.get_u_val(stage.diam, bounds.freq_dimm.max_value * stage.freq_nom)
+        koef_rash_ = stage.get_koef_rash_from_volume_rate(stage.diam, u_val, curr_mode.get_volume_rate)
+        udal = (koef_rash_ - stage.koef_rash.min()) / (stage.koef_rash.max() - stage.koef_rash.min()) * 100
+        return udal > bounds.udal.max_value + tol
+
+
+    def get_all_comp_grid(self, q_rates:List[float], p_targets:List[float], mode_params:Dict[str, float], 
+                          max_workers=1, pruned=False, warm_start=False, skip_infeasible=False, 
+                          known:Dict[int, Dict[Tuple[float, float], pd.DataFrame]]=None):
+        """Расчет таблицы VFP для всех компоновок: задача - столбец (компоновка, давление на выходе)
+        Args:
+            q_rates (List[float]): Расходы, млн. м3/сут
+            p_targets (List[float]): Давления на выходе, МПа
+            mode_params (Dict[str, float]): Остальные параметры Mode
+            max_workers (int, optional): Количество процессов; 1 - последовательный расчет, 
+                None - по числу ядер {default = 1}
+            pruned, warm_start, skip_infeasible: см. solve_column
+            known (Dict[int, Dict[Tuple[float, float], pd.DataFrame]], optional): Ранее рассчитанные 
+                ячейки {(q_rate, p_target): режим} по индексу компоновки, не пересчитываются {default = None}
+        Returns:
+            Dict[int, list]: Итоговые режимы по индексу компоновки в порядке product(q_rates, p_targets)
+        """
         solvers = [self] + self.add_solvers
+        known = {} if known is None else known
+        tasks = []
+        for solver_ind in range(len(solvers)):
+            solver_known = known.get(solver_ind, {})
+            for p_target in p_targets:
+                q_missing = [q_rate for q_rate in q_rates if (q_rate, p_target) not in solver_known]
+                if q_missing:
+                    tasks.append((solver_ind, q_missing, p_target, mode_params, pruned, warm_start, skip_infeasible))
+
+        if not tasks:
+            columns = []
+        elif max_workers == 1:
+            columns = [
+                solvers[solver_ind].solve_column(*task) 
+            for solver_ind, *task in tasks]
+        else:
+            max_workers = os.cpu_count() if max_workers is None else max_workers
+            with ProcessPoolExecutor(max_workers=max_workers, 
+                                     initializer=_init_worker, 
+                                     initargs=(solvers, [])) as pool:
+                columns = list(pool.map(_vfp_column_task, *zip(*tasks)))
+
+        cells = {solver_ind: dict(known.get(solver_ind, {})) for solver_ind in range(len(solvers))}
+        for (solver_ind, q_missing, p_target, *_), column in zip(tasks, columns):
+            cells[solver_ind].update(((q_rate, p_target), res) for q_rate, res in zip(q_missing, column))
+
         results = defaultdict(list)
-        for ind, solver in enumerate(solvers):
-            for mode in modes:
-                tasks = solver.sync_get_min_value(mode)
-                results[ind].append(tasks)
+        for solver_ind in range(len(solvers)):
+            results[solver_ind] = [
+                cells[solver_ind][q_rate, p_target]
+            for q_rate in q_rates 
+                for p_target in p_targets]
         return results
 
 
-
-def calc_table_vfp_param(conf_solv_obj: ConfGDHSolverVfp, table_params, bound_dict_arr):
-    table_param = list(product(*table_params.dict().values()))
-    extra_bounds = bound_dict_arr[0][0].dict()['extra_bounds']
-    modes = [Mode(  
-                q_rate=param[0],
-                p_in=None,
-                t_in=extra_bounds['t_in']['value'],
-                r_value=extra_bounds['r_value']['value'],
-                k_value=extra_bounds['k_value']['value'],
-                p_target=param[1],
-                press_conditonal=extra_bounds['press_conditonal']['value'],
-                temp_conditonal=extra_bounds['temp_conditonal']['value']
-            ) for param in table_param]
-    results = conf_solv_obj.get_all_comp(modes)
+def calc_table_vfp_param(conf_solv_obj: ConfGDHSolverVfp, table_params, bound_dict_arr, max_workers=1, pruned=False, 
+                         warm_start=False, skip_infeasible=False, known=None):
+    table_params = table_params.dict()
+    mode_params = get_vfp_mode_params(bound_dict_arr)
+    results = conf_solv_obj.get_all_comp_grid(table_params['q_rate'], table_params['p_out'], mode_params, 
+                                              max_workers, pruned, warm_start, skip_infeasible, known)
 
     return results
+
+
+def get_vfp_mode_params(bound_dict_arr) -> Dict[str, float]:
+    """Параметры Mode таблицы VFP (кроме расхода и давлений) из экстра параметров первой ступени"""
+    extra_bounds = bound_dict_arr[0][0].dict()['extra_bounds']
+    return {
+        name: extra_bounds[name]['value'] 
+    for name in ('t_in', 'r_value', 'k_value', 'press_conditonal', 'temp_conditonal')}
@@ -0,0 +1,75 @@
+import os
+from types import SimpleNamespace
+import pytest
+from app_name.DKS_math.gdhInstance import GdhInstance
+from app_name.DKS_math.mode import Mode
+from app_name.UI.api.schemas.schemas import BoundDictAll
+
+SPCH_DIR = os.path.join(os.path.dirname(__file__), 'spch_dimkoef')
+
+EXTRA_BOUNDS = {
+    'k_value': 1.31,
+    't_in': 288,
+    'r_value': 512,
+    'press_conditonal': 0.101325,
+    'temp_conditonal': 283,
+}
+
+BOUNDS = {
+    'p_out_diff': (0.1, 7.7, 0.1, 0),
+    'freq_dimm': (0.7, 1.05, 0.1, 2),
+    'power': (7000, 16000, 200, 0),
+    'comp': (1, 3.5, 0.01, 2),
+    'udal': (0, 100, 1, 0),
+}
+
+
+def get_gdh(name:str) -> GdhInstance:
+    return GdhInstance.create_by_csv(os.path.join(SPCH_DIR, f'{name}.csv'))
+
+
+def get_unit_record(gdh:GdhInstance, unit_id:int) -> SimpleNamespace:
+    """Запись в виде EqCompressorUnit (read_dict) по ГДХ"""
+    value = lambda val: SimpleNamespace(value=float(val))
+    return SimpleNamespace(
+        id=unit_id, name=gdh.name, k_value=float(gdh.k_value), r_value=float(gdh.r_value), 
+        t_in=float(gdh.t_in), diam=float(gdh.diam),
+        eq_compressor_type=SimpleNamespace(
+            eq_compressor_type_freq_nominal=value(gdh.freq_nom),
+            eq_compressor_type_pressure_out=value(gdh.p_out_nom),
+            eq_compressor_type_comp_ratio=value(gdh.comp_nom),
+            eq_compressor_type_power=value(gdh.power_nom)),
+        eq_compressor_perfomance_curve=[
+            SimpleNamespace(non_dim_rate=float(koef_rash), head=float(koef_nap), kpd=float(kpd))
+        for koef_rash, koef_nap, kpd in zip(gdh.koef_rash, gdh.koef_nap, gdh.kpd)]
+    )
+
+
+def get_bound_dict() -> BoundDictAll:
+    return BoundDictAll(
+        bounds={
+            name: {'name': name, 'short_name': name, 'dimen': None, 
+                   'min_value': min_value, 'max_value': max_value, 
+                   'sensitivity': sensitivity, 'precision': precision}
+            for name, (min_value, max_value, sensitivity, precision) in BOUNDS.items()
+        },
+        extra_bounds={
+            name: {'name': name, 'short_name': name, 'dimen': None, 'value': value}
+            for name, value in EXTRA_BOUNDS.items()
+        }
+    )
+
+
+@pytest.fixture
+def stage_list():
+    return [(get_gdh('ГПА16-56 2.2'), 3), (get_gdh('ГПА16-56 1.7'), 3)]
+
+
+@pytest.fixture
+def bound_dict(stage_list):
+    return [get_bound_dict() for _ in stage_list]
+
+
+@pytest.fixture
+def mode():
+    return Mode(q_rate=[30, 30], p_in=2.0, p_target=7.0, **EXTRA_BOUNDS)
@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+from app_name.DKS_math.baseFormulas import BaseFormulas
+from app_name.DKS_math.confGDH import ConfGDH, SUMMRY_DTYPE
+from app_name.DKS_math.mode import ModeBatch
+
+
+def test_summry_batch_equals_loop(stage_list, mode):
+    conf = ConfGDH(stage_list)
+    freq_bounds = conf.get_freq_bound_all(mode)
+    rng = np.random.default_rng(0)
+    freqs = np.column_stack([
+        rng.uniform(np.min(freq), np.max(freq), 20)
+    for freq in freq_bounds])
+
+    res = conf.get_summry_batch(mode, freqs)
+
+    assert res.shape == freqs.shape
+    for point, freq in zip(res, freqs):
+        for stage_res, stage_loop in zip(point, conf.get_summry_without_bound(mode, freq)):
+            for name in SUMMRY_DTYPE.names:
+                assert np.isclose(stage_res[name], stage_loop[name], rtol=1e-12)
+
+
+def test_summry_batch_mode_list(stage_list, mode):
+    conf = ConfGDH(stage_list)
+    modes = [mode.clone() for _ in range(3)]
+    for ind, curr_mode in enumerate(modes):
+        curr_mode.p_in = mode.p_in + 0.1 * ind
+        curr_mode.q_rate = 25 + ind
+    freqs = np.full((3, len(stage_list)), 4500.)
+
+    res = conf.get_summry_batch(modes, freqs)
+
+    for point, curr_mode in zip(res, modes):
+        loop = conf.get_summry_without_bound(curr_mode, freqs[0])
+        assert np.allclose(point['power'], [stage['power'] for stage in loop], rtol=1e-12, equal_nan=True)
+        assert np.allclose(point['p_out'], [stage['p_out'] for stage in loop], rtol=1e-12, equal_nan=True)
+
+
+def test_stage_kernel_equals_numpy(stage_list, mode):
+    stage = stage_list[0][0]
+    freqs = np.linspace(4000, 5500, 30)
+    args = (mode.q_rate[0], mode.p_in, mode.t_in)
+    stage_args = (stage.get_gas(mode), stage.t_in)
+
+    res = stage.kernel(*args, freqs, *stage_args)
+    res_numpy = stage.kernel._call_numpy(*args, freqs, *stage_args)
+    res_point = stage.kernel(*args, freqs[10], *stage_args)
+
+    for val, val_numpy, val_point in zip(res, res_numpy, res_point):
+        assert np.allclose(val, val_numpy, rtol=1e-10, equal_nan=True)
+        assert np.isclose(val_point, val[10], rtol=1e-12, equal_nan=True)
+
+
+def test_gas_conditions(mode):
+    mode = mode.clone()
+    mode.q_rate = 30.
+    gas = mode.gas
+    z_0 = BaseFormulas.get_z_val(mode.press_conditonal, mode.temp_conditonal)
+    pltn_0 = mode.press_conditonal / (z_0 * mode.r_value * mode.temp_conditonal)
+    pltn_1 = mode.p_in / (BaseFormulas.get_z_val(mode.p_in, mode.t_in) * mode.r_value * mode.t_in)
+
+    assert mode.clone().gas is gas
+    assert np.allclose(mode.get_volume_rate, mode.q_rate * 10**6 * pltn_0 / (24 * 60 * pltn_1), rtol=1e-12)
+    assert gas.k_koef == pytest.approx((mode.k_value - 1) / mode.k_value)
+
+
+def test_mode_batch(stage_list, mode):
+    conf = ConfGDH(stage_list)
+    modes = [mode.clone() for _ in range(3)]
+    for ind, curr_mode in enumerate(modes):
+        curr_mode.q_rate = [25 + ind, 24 + ind]
+        curr_mode.p_in = mode.p_in + 0.1 * ind
+    batch = ModeBatch.from_modes(modes)
+    freqs = np.full((3, len(stage_list)), 4500.)
+
+    assert not hasattr(mode, '__dict__')
+    assert len(batch) == 3 and batch.q_rate.shape == (3, 2)
+    assert batch[1].to_dict() == modes[1].to_dict()
+    assert np.array_equal(batch.get_stage_q_rate(1, 2), [12, 12.5, 13])
+    res_batch, res_list = conf.get_summry_batch(batch, freqs), conf.get_summry_batch(modes, freqs)
+    for name in SUMMRY_DTYPE.names:
+        assert np.array_equal(res_batch[name], res_list[name], equal_nan=True)
@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import time
+import pytest
+from app_name.application.calc_executor import CalcExecutor, CalcTimeout
+
+
+def _pool_children():
+    return [proc for proc in multiprocessing.active_children() if not proc.name.startswith('SyncManager')]
+
+
+def _wait_children(timeout=5.):
+    stop = time.monotonic() + timeout
+    while _pool_children() and time.monotonic() < stop:
+        time.sleep(0.05)
+    return _pool_children()
+
+
+def _slow_items(n, delay):
+    for ind in range(n):
+        yield ind
+        time.sleep(delay)
+
+
+def test_calc_executor_repeated_timeouts():
+    executor = CalcExecutor(max_workers=1, max_queue=2, timeout=0.5)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(CalcTimeout):
+                await executor.run(time.sleep, 30)
+            assert executor.pending == 0
+            assert _wait_children() == []
+        return await executor.run(abs, -3)
+
+    try:
+        assert asyncio.run(run()) == 3
+    finally:
+        executor.shutdown()
+
+
+def test_calc_executor_timeout_retries_other_calcs():
+    executor = CalcExecutor(max_workers=2, max_queue=2, timeout=10)
+
+    async def run():
+        stuck = executor.run(time.sleep, 30, timeout=0.5)
+        other = executor.run(time.sleep, 1.)
+        return await asyncio.gather(stuck, other, return_exceptions=True)
+
+    try:
+        stuck, other = asyncio.run(run())
+        assert isinstance(stuck, CalcTimeout)
+        assert other is None
+        assert executor.pending == 0
+    finally:
+        executor.shutdown()
+
+
+def test_calc_executor_stream_stops_stuck_generator():
+    executor = CalcExecutor(max_workers=1, max_queue=2, timeout=10)
+
+    async def run():
+        with pytest.raises(CalcTimeout):
+            async for _ in executor.stream(_slow_items, 2, 30, timeout=1.):
+                pass
+        assert executor.pending == 0 and _wait_children() == []
+
+        records = executor.stream(_slow_items, 2, 30)
+        assert await anext(records) == 0
+        await records.aclose()
+        assert executor.pending == 0 and _wait_children() == []
+        return [item async for item in executor.stream(_slow_items, 3, 0.)]
+
+    try:
+        assert asyncio.run(run()) == [0, 1, 2]
+    finally:
+        executor.shutdown()
@@ -0,0 +1,129 @@
+import pytest
+import numpy as np
+import pandas as pd
+from app_name.DKS_math.DKS import ConfGDHSolver, ModeQuantizer, calc_modes_warm, select_summry
+from app_name.DKS_math.confGDH import SUMMRY_DTYPE
+
+
+def assert_results_equal(res_1, res_2):
+    assert res_1.keys() == res_2.keys()
+    for ind in res_1:
+        for df_1, df_2 in zip(res_1[ind], res_2[ind]):
+            assert (df_1 is None) == (df_2 is None)
+            if df_1 is not None:
+                pd.testing.assert_frame_equal(df_1, df_2)
+
+
+def test_get_all_comp_pool(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([[(stage, 2) for stage, _ in stage_list]], [bound_dict])
+    mode_2 = mode.clone()
+    mode_2.p_in = 2.2
+    modes = [mode, mode_2]
+
+    assert_results_equal(conf.get_all_comp(modes), conf.get_all_comp(modes, max_workers=2))
+
+
+def test_iter_all_comp(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list, [(stage, 2) for stage, _ in stage_list]], [bound_dict, bound_dict])
+    mode_2 = mode.clone()
+    mode_2.p_in = 2.2
+    modes = [mode, mode_2]
+
+    items = list(conf.iter_all_comp(modes))
+    assert [(ind, mode_ind) for ind, mode_ind, _ in items] == [(0, 0), (1, 0), (0, 1), (1, 1)]
+    for ind, mode_ind, df in items:
+        expected = ([conf] + conf.add_solvers)[ind].sync_get_min_value(modes[mode_ind])
+        assert (df is None) == (expected is None)
+        if df is not None:
+            pd.testing.assert_frame_equal(df, expected)
+
+
+def test_get_all_comp_quantizer(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    modes = []
+    for p_in in [2.0, 2.002, 2.2]:
+        curr_mode = mode.clone()
+        curr_mode.p_in = p_in
+        modes.append(curr_mode)
+    quantizer = ModeQuantizer({'p_in': 0.01})
+
+    res = conf.get_all_comp(modes, quantizer=quantizer)[0]
+    assert quantizer.stats() == {'modes': 3, 'solved': 2, 'hits': 1, 'hit_rate': 1 / 3}
+    assert [df['p_in'].iloc[0] for df in res] == [2.0, 2.002, 2.2]
+    pd.testing.assert_frame_equal(res[0], conf.get_all_comp(modes[:1])[0][0])
+    pd.testing.assert_frame_equal(res[1].drop(columns='p_in'), res[0].drop(columns='p_in'))
+
+
+def test_list_conf_gdh_solver_shares_stages(stage_list, bound_dict):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    list_comp = conf.get_list_conf_gdh_solver()
+
+    assert [comp.counts for comp in list_comp] == conf.get_list_cnt()
+    for comp in list_comp:
+        assert all(stage is base_stage for (stage, _), (base_stage, _) in zip(comp.stage_list, conf.stage_list))
+        assert comp.solver.conf is comp
+        with pytest.raises(AttributeError):
+            comp.stage_list = conf.stage_list
+
+
+def test_get_min_value_pruned(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    modes = [mode]
+    for p_in, p_target in [(2.2, 7.0), (2.5, 6.0)]:
+        curr_mode = mode.clone()
+        curr_mode.p_in, curr_mode.p_target = p_in, p_target
+        modes.append(curr_mode)
+
+    assert_results_equal(conf.get_all_comp(modes), conf.get_all_comp(modes, pruned=True))
+
+
+def test_get_all_comp_warm_start(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    modes = []
+    for q_rate, p_in in [(30, 2.0), (30.5, 2.02), (31, 2.04)]:
+        curr_mode = mode.clone()
+        curr_mode.q_rate, curr_mode.p_in = [q_rate, q_rate], p_in
+        modes.append(curr_mode)
+
+    res_cold = conf.get_all_comp(modes)[0]
+    res_warm = conf.get_all_comp(modes, warm_start=True)[0]
+    for df_cold, df_warm in zip(res_cold, res_warm):
+        assert (df_cold['work_gpa'] == df_warm['work_gpa']).all()
+        assert df_warm['p_out'].iloc[-1] == pytest.approx(df_cold['p_out'].iloc[-1], abs=1e-3)
+
+
+def test_calc_modes_warm_chunks(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    modes = []
+    for q_rate, p_in in [(30, 2.0), (30.5, 2.02), (31, 2.04), (31.5, 2.06)]:
+        curr_mode = mode.clone()
+        curr_mode.q_rate, curr_mode.p_in = [q_rate, q_rate], p_in
+        modes.append(curr_mode)
+
+    res_warm = conf.get_all_comp(modes, warm_start=True)
+    res_1, warm_starts = calc_modes_warm(conf, modes[:2])
+    res_2, warm_starts = calc_modes_warm(conf, modes[2:], 2, warm_starts=warm_starts)
+    assert warm_starts[0]
+    assert_results_equal(res_warm, {0: res_1[0] + res_2[0]})
+
+
+def test_minimize_warm_start_fallback(stage_list, bound_dict, mode):
+    comp = ConfGDHSolver([stage_list], [bound_dict]).get_conf_gdh_solver((3, 3))
+    res = comp.solver.minimize(mode)
+    res_warm = comp.solver.minimize(mode, res.x)
+    res_bad = comp.solver.minimize(mode, [1., 1.])
+
+    assert res_warm.success and res_warm.warm_start
+    assert res_warm.nit <= res.nit
+    assert res_bad.success
+
+
+def test_select_summry():
+    summry = np.zeros((4, 2), dtype=SUMMRY_DTYPE)
+    summry['p_out'][:, -1] = [7.9, 7.2, 7.1, 7.3]
+    summry['work_gpa'] = [[1, 1], [2, 2], [2, 2], [3, 2]]
+    summry['power'] = [[1, 1], [5, 5], [4, 6], [1, 1]]
+
+    assert select_summry(summry, p_target=7.0) == 1
+    assert select_summry(summry) == 0
+    assert select_summry(summry, p_target=9.0) is None
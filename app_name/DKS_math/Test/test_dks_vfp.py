@@ -0,0 +1,63 @@
+from itertools import product
+import sqlite3
+import time
+from contextlib import closing
+from app_name.DKS_math.DKS_vfp import ConfGDHSolverVfp
+from app_name.DKS_math.mode import Mode
+from app_name.DKS_math.Test.conftest import EXTRA_BOUNDS
+from app_name.DKS_math.Test.test_dks import assert_results_equal
+from app_name.infrastructure.adapters.result_store import VfpCellStore
+
+
+def test_get_all_comp_grid(stage_list, bound_dict):
+    conf = ConfGDHSolverVfp([[(stage, 2) for stage, _ in stage_list]], [bound_dict])
+    q_rates, p_targets = [20., 10.], [5., 6.]
+    modes = [
+        Mode(q_rate=q_rate, p_in=None, p_target=p_target, **EXTRA_BOUNDS)
+    for q_rate, p_target in product(q_rates, p_targets)]
+
+    res = conf.get_all_comp_grid(q_rates, p_targets, EXTRA_BOUNDS, warm_start=False)
+
+    assert_results_equal(res, conf.get_all_comp(modes))
+
+
+def test_solve_column_skip_infeasible(stage_list, bound_dict):
+    conf = ConfGDHSolverVfp([[(stage, 1) for stage, _ in stage_list]], [bound_dict])
+    mode = Mode(q_rate=500., p_in=None, p_target=5., **EXTRA_BOUNDS)
+
+    assert conf.is_capacity_exceeded(mode)
+    assert conf.solve_column([500., 600.], 5., EXTRA_BOUNDS, skip_infeasible=True) == [None, None]
+
+
+def test_get_all_comp_grid_known(stage_list, bound_dict, tmp_path):
+    conf = ConfGDHSolverVfp([[(stage, 2) for stage, _ in stage_list]], [bound_dict])
+    q_rates, p_targets = [20., 10.], [5., 6.]
+    full = conf.get_all_comp_grid(q_rates, p_targets, EXTRA_BOUNDS, warm_start=False)
+    store = VfpCellStore(str(tmp_path / 'cells.db'))
+    store.put_cells('layout', {(20., 5.): full[0][0], (10., 6.): None})
+
+    known = store.get_cells('layout', q_rates, p_targets)
+    res = conf.get_all_comp_grid(q_rates, p_targets, EXTRA_BOUNDS, warm_start=False, known={0: known})
+
+    assert set(known) == {(20., 5.), (10., 6.)}
+    assert res[0][3] is None
+    assert_results_equal({0: res[0][:3]}, {0: full[0][:3]})
+
+
+def test_vfp_cell_store_lru(tmp_path):
+    path = str(tmp_path / 'cells.db')
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute(
+            'CREATE TABLE vfp_cell (layout_key TEXT NOT NULL, q_rate REAL NOT NULL, p_target REAL NOT NULL, '
+            'result BLOB, PRIMARY KEY (layout_key, q_rate, p_target))'
+        )
+        conn.execute("INSERT INTO vfp_cell VALUES ('layout', 10., 5., NULL)")
+    store = VfpCellStore(path, max_entries=3)
+    assert store.get_cells('layout', [10.], [5.]) == {(10., 5.): None}
+
+    store.put_cells('layout', {(20., 5.): None, (30., 5.): None})
+    time.sleep(0.02)
+    assert store.get_cells('layout', [10., 20.], [5., 6.]).keys() == {(10., 5.), (20., 5.)}
+    time.sleep(0.02)
+    store.put_cells('layout', {(40., 5.): None})
+    assert store.get_cells('layout', [10., 20., 30., 40.], [5.]).keys() == {(10., 5.), (20., 5.), (40., 5.)}
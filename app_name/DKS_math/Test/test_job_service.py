@@ -0,0 +1,144 @@
+import asyncio
+import json
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app_name.DKS_math.DKS import ConfGDHSolver, calc_modes_parall
+from app_name.DKS_math.shared.shared_calc import frame_to_record
+from app_name.application.calc_executor import CalcExecutor
+from app_name.application.job_service import CalcJobManager
+from app_name.infrastructure.repositories.compressor.database import Base
+from app_name.infrastructure.repositories.compressor.job_repository import CalcJobRepository
+import app_name.infrastructure.repositories.compressor.models.models_gdh  # noqa: F401 (таблицы в Base.metadata)
+
+
+async def _get_session_maker():
+    """Сессии к БД sqlite в памяти (одно соединение на все сессии)"""
+    engine = create_async_engine('sqlite+aiosqlite://', poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+async def _get_job(session_maker, job_id):
+    async with session_maker() as session:
+        return await CalcJobRepository(session).get_job(job_id)
+
+
+async def _get_results(session_maker, job_id, offset=0, limit=100):
+    async with session_maker() as session:
+        return await CalcJobRepository(session).get_results(job_id, offset, limit)
+
+
+async def _wait_job(manager, job_id, timeout=300.):
+    task = manager._tasks.get(job_id)
+    if task is not None:
+        await asyncio.wait_for(asyncio.shield(task), timeout)
+    return await _get_job(manager.session_maker, job_id)
+
+
+def _get_modes(mode, n):
+    modes = []
+    for ind in range(n):
+        curr_mode = mode.clone()
+        curr_mode.p_in = mode.p_in + 0.05 * ind
+        modes.append(curr_mode)
+    return modes
+
+
+def test_calc_job_chunks(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([[(stage, 2) for stage, _ in stage_list], stage_list], [bound_dict, bound_dict])
+    modes = _get_modes(mode, 5)
+    expected = calc_modes_parall(conf, modes)
+    executor = CalcExecutor(max_workers=1, max_queue=8, timeout=300)
+
+    async def run():
+        manager = CalcJobManager(await _get_session_maker(), executor, chunk_size=2)
+        job_id = await manager.submit_calc(conf, modes)
+        job = await _wait_job(manager, job_id)
+        items, total = await _get_results(manager.session_maker, job_id)
+        return job, items, total
+
+    try:
+        job, items, total = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert job.status == 'done'
+    assert job.progress_done == job.progress_total == 10
+    assert total == 10
+    #части по 2 режима: записи по компоновкам внутри части, номера режимов сквозные
+    assert [(item['layout'], item['mode']) for item in items] == [
+        (0, 0), (0, 1), (1, 0), (1, 1), (0, 2), (0, 3), (1, 2), (1, 3), (0, 4), (1, 4)]
+    assert any(item['result'] is not None for item in items)
+    for item in items:
+        assert item['result'] == json.loads(json.dumps(frame_to_record(expected[item['layout']][item['mode']])))
+
+
+def test_calc_job_cancel(stage_list, bound_dict, mode):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    modes = _get_modes(mode, 20)
+    executor = CalcExecutor(max_workers=1, max_queue=8, timeout=300)
+
+    async def run():
+        manager = CalcJobManager(await _get_session_maker(), executor, chunk_size=1)
+        job_id = await manager.submit_calc(conf, modes)
+        while (await _get_job(manager.session_maker, job_id)).progress_done == 0:
+            await asyncio.sleep(0.05)
+        assert await manager.cancel(job_id)
+        job = await _wait_job(manager, job_id)
+        _, total_cancel = await _get_results(manager.session_maker, job_id)
+        #часть, запущенная в процессе пула до отмены, дорабатывает без сохранения
+        while executor.pending:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        _, total = await _get_results(manager.session_maker, job_id)
+        return job, total_cancel, total, await manager.cancel(job_id)
+
+    try:
+        job, total_cancel, total, cancel_again = asyncio.run(run())
+    finally:
+        executor.shutdown()
+    assert job.status == 'cancelled'
+    assert job.finished_at is not None
+    assert 0 < total_cancel == job.progress_done < job.progress_total
+    assert total == total_cancel
+    assert not cancel_again
+
+
+def test_calc_job_recover():
+    async def run():
+        manager = CalcJobManager(await _get_session_maker(), chunk_size=2)
+        async with manager.session_maker() as session:
+            repo = CalcJobRepository(session)
+            running_id = await repo.create_job('calc', 4)
+            await repo.set_status(running_id, 'running')
+            done_id = await repo.create_job('calc', 4)
+            await repo.set_status(done_id, 'done')
+        count = await manager.recover()
+        return (count, await _get_job(manager.session_maker, running_id),
+                await _get_job(manager.session_maker, done_id))
+
+    count, running, done = asyncio.run(run())
+    assert count == 1
+    assert running.status == 'failed'
+    assert running.error
+    assert running.finished_at is not None
+    assert done.status == 'done'
+
+
+def test_calc_job_results_paging():
+    async def run():
+        session_maker = await _get_session_maker()
+        async with session_maker() as session:
+            repo = CalcJobRepository(session)
+            job_id = await repo.create_job('calc', 7)
+            #части сохраняются не по порядку - выдача по порядковому номеру
+            await repo.add_results(job_id, [{'mode': ind} for ind in range(4, 7)], start=4)
+            await repo.add_results(job_id, [{'mode': ind} for ind in range(4)])
+            other_id = await repo.create_job('calc', 1)
+            await repo.add_results(other_id, [{'mode': 0}])
+            return [await repo.get_results(job_id, offset, 3) for offset in (0, 3, 6, 9)]
+
+    pages = asyncio.run(run())
+    assert [total for _, total in pages] == [7, 7, 7, 7]
+    assert [[item['mode'] for item in items] for items, _ in pages] == [[0, 1, 2], [3, 4, 5], [6], []]
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+from app_name.DKS_math.shared.shared_calc import _create_pivot_middle_table, _create_table_vfp
+from app_name.DKS_math.gdhInstance import GdhInstance, GdhInstanceCache
+from app_name.DKS_math.Test.conftest import get_unit_record
+from app_name.infrastructure.adapters.result_store import ModeResultCache
+
+
+def test_create_pivot_middle_table():
+    pivot_table = pd.DataFrame(
+        [[3.0, np.nan, 4.0],
+         [np.nan, 2.5, np.nan],
+         [5.0, np.nan, 3.5]],
+        index=pd.Index([10, 20, 30], name='q_rate'), 
+        columns=pd.Index([5, 6, 7], name='p_target'))
+
+    res = _create_pivot_middle_table(pivot_table)
+
+    expected = pd.DataFrame(
+        [[2.5, 2.5, 3.5],
+         [2.5, 2.5, 3.5],
+         [3.5, 3.5, 3.5]],
+        index=pivot_table.index, columns=pivot_table.columns)
+    pd.testing.assert_frame_equal(res, expected)
+
+
+def test_create_table_vfp():
+    table_1 = pd.DataFrame([[2.0, None], [3.0, 1.0]], index=[10, 20], columns=[5, 6])
+    table_2 = pd.DataFrame([[1.5], [None]], index=[20, 30], columns=[6])
+
+    res = _create_table_vfp([('eq_1', table_1), ('eq_2', table_2)])
+
+    expected = pd.DataFrame(
+        [[2.0, np.nan],
+         [3.0, 1.0],
+         [np.nan, np.nan]], 
+        index=[10, 20, 30], columns=[5, 6])
+    pd.testing.assert_frame_equal(res, expected)
+
+
+def test_gdh_instance_cache(stage_list):
+    cache = GdhInstanceCache(maxsize=2)
+    record = get_unit_record(stage_list[0][0], 1)
+
+    gdh = cache.get_or_create(record, 4)
+    assert cache.get_or_create(record, 4) is gdh
+    assert np.allclose(gdh.f_nap_poly1d.coeffs, GdhInstance.read_dict(record, 4).f_nap_poly1d.coeffs)
+    assert cache.get_or_create(record, 3) is not gdh
+
+    record.eq_compressor_perfomance_curve[0].kpd += 0.01
+    assert cache.get_or_create(record, 4) is not gdh
+    stats = cache.stats()
+    assert (stats['size'], stats['hits'], stats['misses']) == (2, 1, 3)
+    assert stats['hit_rate'] == 0.25 and stats['memory_bytes'] > 0
+
+    cache.invalidate(1)
+    assert cache.stats()['size'] == 0
+
+
+def test_mode_result_cache(tmp_path, stage_list, bound_dict):
+    cache = ModeResultCache(str(tmp_path / 'modes.db'), max_entries=2)
+    record = get_unit_record(stage_list[0][0], 1)
+    key = cache.layout_key([record], [2], bound_dict, 4)
+    df = pd.DataFrame({'power': [1.0, 2.0]})
+
+    cache.put(key, {'a': df, 'b': None}, [1])
+    assert cache.get(key, ['a', 'c']).keys() == {'a'}
+    cache.put(key, {'c': df}, [1])
+    res = cache.get(key, ['a', 'b', 'c'])
+    assert res.keys() == {'a', 'c'}
+    pd.testing.assert_frame_equal(res['a'], df)
+    assert (cache.stats()['hits'], cache.stats()['misses']) == (3, 2)
+
+    record.eq_compressor_perfomance_curve[0].kpd += 0.01
+    assert cache.layout_key([record], [2], bound_dict, 4) != key
+    assert cache.invalidate_units([1]) == 2
+    assert cache.get(key, ['a', 'c']) == {}
+
+
+def test_mode_result_cache_batches(tmp_path):
+    cache = ModeResultCache(str(tmp_path / 'modes.db'))
+    results = {f'mode_{ind}': pd.DataFrame({'power': [float(ind)]}) for ind in range(1200)}
+    cache.put('layout', results, [1])
+    cache.put('other', {'mode_0': None}, [2])
+
+    res = cache.get('layout', list(results) + ['missing'])
+    assert res.keys() == results.keys()
+    assert res['mode_1100']['power'].iloc[0] == 1100.
+    assert cache.get('other', ['mode_0', 'mode_1']) == {'mode_0': None}
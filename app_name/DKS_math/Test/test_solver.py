@@ -0,0 +1,43 @@
+import numpy as np
+from app_name.DKS_math.confGDH import ConfGDH
+from app_name.DKS_math.solver.solver_p_out import Solver
+from app_name.DKS_math.solver.solver_p_in import PressInSolver
+
+
+def test_minimize_eval_cache(stage_list, bound_dict, mode):
+    solver = Solver(ConfGDH(stage_list), bound_dict)
+    res = solver.minimize(mode)
+
+    assert res.cache_info['hits'] > res.cache_info['misses']
+    assert solver.cache_info['misses'] == res.cache_info['misses']
+    assert np.isclose(solver.func_z(res.x, mode), res.fun)
+
+
+def test_summry_grad_finite_diff(stage_list, mode):
+    conf = ConfGDH(stage_list)
+    freqs = np.array([5000., 4000.])
+    names = ['power', 'comp', 'p_out', 'udal', 'freq_dimm', 'target', 'volume_rate']
+    _, grad = conf.get_summry_grad(mode, freqs, np.eye(2), np.zeros(2))
+
+    step = 1e-3
+    for ind in range(len(freqs)):
+        dx = np.eye(len(freqs))[ind] * step
+        res_plus = conf.get_summry_without_bound(mode, freqs + dx)
+        res_minus = conf.get_summry_without_bound(mode, freqs - dx)
+        for stage_ind, stage_grad in enumerate(grad):
+            for name in names:
+                diff = (res_plus[stage_ind][name] - res_minus[stage_ind][name]) / (2 * step)
+                assert np.isclose(stage_grad[name][ind], diff, rtol=1e-5, atol=1e-9)
+
+
+def test_press_in_solver_jac(stage_list, bound_dict, mode):
+    solver = PressInSolver(ConfGDH(stage_list), bound_dict)
+    x = np.array([2.0, 5000., 4000.])
+    jac = solver.get_bound_dict_constr_jac(x, mode, 1)
+
+    step = np.array([1e-6, 1e-3, 1e-3])
+    for ind in range(len(x)):
+        dx = np.eye(len(x))[ind] * step[ind]
+        diff = (np.array(solver.get_bound_dict_constr(x + dx, mode, 1)) - 
+                np.array(solver.get_bound_dict_constr(x - dx, mode, 1))) / (2 * step[ind])
+        assert np.allclose(jac[:, ind], diff, rtol=1e-5, atol=1e-9)
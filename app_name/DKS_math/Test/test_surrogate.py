@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from app_name.DKS_math.DKS import ConfGDHSolver
+from app_name.DKS_math.surrogate import LayoutSurrogate
+from app_name.DKS_math.Test.conftest import EXTRA_BOUNDS
+from app_name.infrastructure.adapters.result_store import SurrogateStore
+
+
+def test_layout_surrogate(stage_list, bound_dict):
+    conf = ConfGDHSolver([stage_list], [bound_dict])
+    surrogate = LayoutSurrogate.build(conf, [28, 32], [1.9, 2.1], [6.8, 7.2], EXTRA_BOUNDS)
+    assert surrogate.cell_error.shape == (1, 1, 1)
+
+    node = {'q_rate': 32., 'p_in': 1.9, 'p_target': 7.2}
+    outside = {'q_rate': 40., 'p_in': 2.0, 'p_target': 7.0}
+    res_node, res_outside = surrogate.query([node, outside])
+    exact = LayoutSurrogate._solve(conf, [(32., 1.9, 7.2)], EXTRA_BOUNDS)[0]
+    assert res_node['source'] == 'surrogate'
+    assert res_node['power'] == pytest.approx(exact['power'].tolist())
+    assert res_node['work_gpa'] == exact['work_gpa'].tolist()
+    assert res_outside['source'] is None and res_outside['error'] is None
+
+    res_fallback = surrogate.query([node], fallback=True, max_error=0.)[0]
+    assert res_fallback['source'] == 'exact'
+    assert res_fallback['power'] == pytest.approx(exact['power'].tolist())
+    assert np.isnan(surrogate.get_error([[40., 2.0, 7.0]])).all()
+
+
+def test_surrogate_store_lru(tmp_path):
+    path = str(tmp_path / 'surrogates.db')
+    store = SurrogateStore(path, max_loaded=2)
+    for ind in range(3):
+        store.put(f'layout_{ind}', {'model': ind}, [ind])
+    assert store.get_loaded('layout_0') is None and list(store._loaded) == ['layout_1', 'layout_2']
+
+    assert store.get('layout_0') == {'model': 0}
+    assert list(store._loaded) == ['layout_2', 'layout_0']
+    assert store.invalidate_units([0]) == 1
+    assert store.get_loaded('layout_0') is None and store.get('layout_0') is None
+    assert SurrogateStore(path).get('layout_1') == {'model': 1}
@@ -0,0 +1,61 @@
+import asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app_name.infrastructure.repositories.compressor.database import Base
+from app_name.infrastructure.repositories.compressor.models.models_gdh import (
+    Company, Dks, EqCompressorPerfomanceCurve, EqCompressorType, EqCompressorTypeCompRatio,
+    EqCompressorTypePower, EqCompressorTypePressureOut, EqCompressorUnit, Field)
+from app_name.infrastructure.repositories.compressor.unit_repository import CompressorUnitRepository
+
+
+def _get_unit(name, power=16000.):
+    return {
+        'sheet_name': name, 'pressure_out': 5.6, 'comp_ratio': 2.2, 'freq_nominal': 5300., 'power': power,
+        'k_value': 1.31, 'r_value': 512., 't_in': 288., 'diam': 0.5,
+        'perfomance_curves': [{'k_nap': 4.5 - ind, 'k_rash': 0.05 + 0.02 * ind, 'kpd': 0.8} for ind in range(3)],
+    }
+
+
+def test_create_compressor_units_bulk():
+    async def run():
+        engine = create_async_engine('sqlite+aiosqlite://', poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+        async with session_maker() as session:
+            session.add(Company(id=1, name='c', code='c'))
+            await session.flush()
+            session.add(Field(id=1, name='f', company_id=1, name_prefix='f'))
+            await session.flush()
+            session.add(Dks(id=1, name='d', field_id=1, name_prefix='d'))
+            await session.commit()
+
+            repo = CompressorUnitRepository(session)
+            dks_code = await session.scalar(select(Dks.code))
+            #второй вызов - с номиналами и типом, уже сохраненными первым
+            ids_1 = await repo.create_compressor_units_bulk(
+                dks_code, [_get_unit('a'), _get_unit('b', 25000.), _get_unit('c')])
+            ids_2 = await repo.create_compressor_units_bulk(dks_code, [_get_unit('d')])
+            names = dict((await session.execute(select(EqCompressorUnit.id, EqCompressorUnit.name))).all())
+            types = dict((await session.execute(select(EqCompressorUnit.name, EqCompressorUnit.type_id))).all())
+            counts = {
+                model: await session.scalar(select(func.count()).select_from(model))
+            for model in (EqCompressorType, EqCompressorTypePressureOut, EqCompressorTypeCompRatio,
+                          EqCompressorTypePower, EqCompressorPerfomanceCurve)}
+            curves = dict((await session.execute(
+                select(EqCompressorPerfomanceCurve.unit_id, func.count())
+                .group_by(EqCompressorPerfomanceCurve.unit_id))).all())
+        await engine.dispose()
+        return ids_1, ids_2, names, types, counts, curves
+
+    ids_1, ids_2, names, types, counts, curves = asyncio.run(run())
+    assert ids_1 == [1, 2, 3]
+    assert ids_2 == [4]
+    assert [names[unit_id] for unit_id in ids_1 + ids_2] == ['a', 'b', 'c', 'd']
+    assert types['a'] == types['c'] == types['d'] != types['b']
+    assert counts == {
+        EqCompressorType: 2, EqCompressorTypePressureOut: 1, EqCompressorTypeCompRatio: 1,
+        EqCompressorTypePower: 2, EqCompressorPerfomanceCurve: 12}
+    assert curves == {unit_id: 3 for unit_id in ids_1 + ids_2}
@@ -1,9 +1,11 @@
 """Основные формулы
 """
+from functools import lru_cache
 import numpy as np
 # from DKS_math.logger.wrapper import LoggerClass
 
 class BaseFormulas:
+    __slots__ = ()
     _PI_OVER_60 = np.pi / 60
 
 
@@ -24,6 +26,22 @@ class BaseFormulas:
         return 0.1 if z_val < 0 else z_val
     
 
+    @classmethod
+    def get_dz_dp(cls, p_in:np.ndarray, t_in:np.ndarray, t_krit=190, p_krit=4.6) -> np.ndarray: 
+        """Производная коэффициента сверхсжимаемости по давлению
+        Args:
+            p_in (np.ndarray): Давление, МПА
+            t_in (np.ndarray): Температура, К
+            t_krit (int, optional): Критич. Температура, К {default = 190}
+            p_krit (float, optional): Критич. Давление, МПа {default = 4.6}
+        Returns:
+            np.ndarray: dZ/dP, 1/МПа (0 там, где Z ограничен снизу)
+        """
+        dz_dp = -0.427 / p_krit * (t_in / t_krit)**(-3.688)
+        z_val = 1 + dz_dp * p_in
+        return np.where(z_val < 0, 0, dz_dp)
+    
+
     @classmethod 
     def get_pltn(cls, p_in:np.ndarray, t_in:np.ndarray, r_value:float, z:np.ndarray) -> np.ndarray: 
         """Расчет плотности
@@ -39,20 +57,20 @@ class BaseFormulas:
     
 
     @classmethod
-    def get_volume_rate_from_press_temp(cls, q_rate:np.ndarray, p_in:np.ndarray, t_in:np.ndarray, r_value:float, press_conditonal:float, temp_conditonal:float) -> np.ndarray:
+    def get_volume_rate_from_press_temp(cls, q_rate:np.ndarray, p_in:np.ndarray, t_in:np.ndarray, r_value:float, press_conditonal:float, temp_conditonal:float, 
+                                        gas:'GasConditions'=None) -> np.ndarray:
         """Расчет объемного расхода
         Args:
             pltn_0 (np.ndarray): Стандартная плотность, кг/м3
             q_rate (np.ndarray): Комерческий расход, млн. м3/сут
             pltn_1 (np.ndarray): Плотность, кг/м3
+            gas (GasConditions, optional): Константы стандартных условий
         Returns:
             np.ndarray: Возвращяет обьемный расход, при указанных условиях, м3/мин
         """
-        z_0 = cls.get_z_val(press_conditonal, temp_conditonal)
-        pltn_0 = press_conditonal  / (z_0 * r_value * temp_conditonal) 
+        gas = GasConditions.get(press_conditonal, temp_conditonal, r_value) if gas is None else gas
         z_1 = cls.get_z_val(p_in, t_in)
-        pltn_1 = p_in / (z_1 * r_value * t_in)
-        return q_rate * 10**6 * pltn_0 / (24 * 60 * pltn_1)  
+        return q_rate * gas.vol_koef * z_1 * t_in / p_in
     
 
     @classmethod 
@@ -93,23 +111,25 @@ class BaseFormulas:
     
 
     @classmethod       
-    def get_power(cls, q_rate:np.ndarray, dh:np.ndarray, kpd_:np.ndarray, r_value:float, press_conditonal:float, temp_conditonal:float) -> np.ndarray: 
+    def get_power(cls, q_rate:np.ndarray, dh:np.ndarray, kpd_:np.ndarray, r_value:float, press_conditonal:float, temp_conditonal:float, 
+                  gas:'GasConditions'=None) -> np.ndarray: 
         """Расчет мощности
         Args:
             dh (np.ndarray): Изменение энтальпии, дж/кг
             m (np.ndarray): Массовый расход, м3/с
             kpd_ (np.ndarray): Политропный кпд, д.ед
+            gas (GasConditions, optional): Константы стандартных условий
         Returns:
             np.ndarray: Мощность, кВт
         """
-        z_0 = cls.get_z_val(press_conditonal, temp_conditonal, t_krit=190, p_krit=4.6)
-        pltn_0 = cls.get_pltn(press_conditonal, temp_conditonal, r_value, z_0)
-        m = q_rate * pltn_0 * 10**6 / 24 / 60 / 60 
+        gas = GasConditions.get(press_conditonal, temp_conditonal, r_value) if gas is None else gas
+        m = q_rate * gas.mass_koef
         return dh * m / kpd_ / 10**3
     
 
     @classmethod
-    def get_comp_ratio(cls, p_in:np.ndarray, dh:np.ndarray, r_value:float, t_in:np.ndarray, k_value:float, kpd_:np.ndarray) -> np.ndarray:
+    def get_comp_ratio(cls, p_in:np.ndarray, dh:np.ndarray, r_value:float, t_in:np.ndarray, k_value:float, kpd_:np.ndarray, 
+                       gas:'GasConditions'=None) -> np.ndarray:
         """Расчет степени сжатия
         Args:
             m_t (np.ndarray): Дробь с политропным кпд и коэффициентом политропы
@@ -118,10 +138,11 @@ class BaseFormulas:
             k_value (float): Коэффициент политропы, д.ед
             z (np.ndarray): Сверхсжимаемость, д.ед
             t_in (np.ndarray): Температура на входе, К
+            gas (GasConditions, optional): Константы газа (показатель политропы)
         Returns:
             np.ndarray: Степень сжатия, д.ед
         """
-        m_t = (k_value - 1) / (k_value * kpd_)
+        m_t = ((k_value - 1) / k_value if gas is None else gas.k_koef) / kpd_
         z = cls.get_z_val(p_in, t_in, t_krit=190, p_krit=4.6)
         return (dh * m_t / (z * r_value * t_in) + 1)**(1 / m_t)
     
@@ -129,7 +150,8 @@ class BaseFormulas:
     @classmethod       
     def get_p_in(cls, q_rate:np.ndarray, kpd_:np.ndarray, r_value:float, 
                  press_conditonal:float, temp_conditonal:float, power:np.ndarray, 
-                 k_value:float, p_in:np.ndarray, t_in:np.ndarray, p_out:np.ndarray) -> np.ndarray: 
+                 k_value:float, p_in:np.ndarray, t_in:np.ndarray, p_out:np.ndarray, 
+                 gas:'GasConditions'=None) -> np.ndarray: 
         """Расчет давления
 
         Args:
@@ -144,18 +166,64 @@ class BaseFormulas:
             p_in (np.ndarray): Давление на входе, МПа
             t_in (np.ndarray): Температура на входе, К
             p_out (np.ndarray): Давление на выходе, МПа
+            gas (GasConditions, optional): Константы стандартных условий
 
         Returns:
             np.ndarray: Давление на входе, МПа
         """
-        z_0 = cls.get_z_val(press_conditonal, temp_conditonal, t_krit=190, p_krit=4.6)
-        pltn_0 = cls.get_pltn(press_conditonal, temp_conditonal, r_value, z_0)
+        gas = GasConditions.get(press_conditonal, temp_conditonal, r_value, k_value) if gas is None else gas
         z_1 = cls.get_z_val(p_in, t_in)
-        m = q_rate * pltn_0 * 10**6 / 24 / 60 / 60 
-        m_t = (k_value - 1) / (k_value)
+        m = q_rate * gas.mass_koef
+        m_t = gas.k_koef
         comp = ((power * 10**3 * kpd_ * m_t) / (m * z_1 * r_value * t_in) + 1)**(1 / m_t)
         return p_out / comp * 10
 
 
+class GasConditions:
+    """Константы стандартных условий и свойств газа
+
+    Не меняются в пределах расчета, поэтому считаются один раз на сочетание 
+    (press_conditonal, temp_conditonal, r_value, k_value) и переиспользуются формулами.
+    Attributes:
+        z_0: Сверхсжимаемость при стандартных условиях
+        pltn_0: Стандартная плотность, кг/м3
+        vol_koef: Множитель объемного расхода, q_rate * vol_koef * z * t / p - м3/мин
+        mass_koef: Множитель массового расхода, q_rate * mass_koef - кг/с
+        k_koef: Показатель (k - 1) / k
+    """
+    __slots__ = ('press_conditonal', 'temp_conditonal', 'r_value', 'k_value', 
+                 'z_0', 'pltn_0', 'vol_koef', 'mass_koef', 'k_koef')
+
+    def __init__(self, press_conditonal:float, temp_conditonal:float, r_value:float, k_value:float=None) -> None:
+        self.press_conditonal = press_conditonal
+        self.temp_conditonal = temp_conditonal
+        self.r_value = r_value
+        self.k_value = k_value
+        self.z_0 = BaseFormulas.get_z_val(press_conditonal, temp_conditonal)
+        self.pltn_0 = BaseFormulas.get_pltn(press_conditonal, temp_conditonal, r_value, self.z_0)
+        self.vol_koef = press_conditonal / (self.z_0 * temp_conditonal) * 10**6 / (24 * 60)
+        self.mass_koef = self.pltn_0 * 10**6 / 24 / 60 / 60
+        self.k_koef = None if k_value is None else (k_value - 1) / k_value
+
+
+    @classmethod
+    def get(cls, press_conditonal:float, temp_conditonal:float, r_value:float, k_value:float=None) -> 'GasConditions':
+        """Константы из кэша; для полей-массивов (пакетный расчет) считаются без кэша"""
+        if any(isinstance(value, np.ndarray) for value in (press_conditonal, temp_conditonal, r_value, k_value)):
+            return cls(press_conditonal, temp_conditonal, r_value, k_value)
+        return cls._get_cached(press_conditonal, temp_conditonal, r_value, k_value)
+
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _get_cached(cls, press_conditonal:float, temp_conditonal:float, r_value:float, k_value:float) -> 'GasConditions':
+        return cls(press_conditonal, temp_conditonal, r_value, k_value)
+
+
+    def __repr__(self) -> str:
+        return (f'GasConditions(press_conditonal={self.press_conditonal}, temp_conditonal={self.temp_conditonal}, '
+                f'r_value={self.r_value}, k_value={self.k_value})')
+
+
 if __name__ == '__main__':
     print(BaseFormulas.get_comp_ratio(2,2,2,2,2))
\ No newline at end of file
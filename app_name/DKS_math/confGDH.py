@@ -4,7 +4,37 @@ import numpy as np
 from typing import List, Dict, Tuple
 from app_name.DKS_math.baseFormulas import BaseFormulas
 from app_name.DKS_math.gdhInstance import GdhInstance
-from app_name.DKS_math.mode import Mode
+from app_name.DKS_math.mode import Mode, ModeBatch
+
+SUMMRY_DTYPE = np.dtype([
+    ('q_rate', np.float64),
+    ('p_in', np.float64),
+    ('p_target', np.float64),
+    ('power', np.float64),
+    ('comp', np.float64),
+    ('volume_rate', np.float64),
+    ('udal', np.float64),
+    ('freq', np.int64),
+    ('freq_dimm', np.float64),
+    ('p_out', np.float64),
+    ('p_out_diff', np.float64),
+    ('target', np.float64),
+    ('work_gpa', np.int64),
+])
+
+
+def summry_to_array(results:List[List[dict]]) -> np.ndarray:
+    """Результаты get_summry_without_bound по сочетаниям в структурированный массив
+    Args:
+        results (List[List[dict]]): Результаты по сочетаниям, в каждом - по ступеням
+    Returns:
+        np.ndarray: Структурированный массив (n_comb, n_stages) с полями SUMMRY_DTYPE
+    """
+    summry = np.empty((len(results), len(results[0])), dtype=SUMMRY_DTYPE)
+    for ind, result in enumerate(results):
+        summry[ind] = [tuple(stage[name] for name in SUMMRY_DTYPE.names) for stage in result]
+    return summry
+
 
 class ConfGDH(BaseFormulas):
 
@@ -23,10 +53,7 @@ class ConfGDH(BaseFormulas):
         res = []
 
         for ind, (stage, cnt_gpa) in enumerate(self.stage_list):
-            if isinstance(mode.q_rate, (int, float)):
-                curr_mode.q_rate = mode.q_rate / cnt_gpa
-            else: 
-                curr_mode.q_rate = mode.q_rate[ind] / cnt_gpa
+            curr_mode.q_rate = mode.get_stage_q_rate(ind, cnt_gpa)
 
             volume_rate_arr = curr_mode.get_volume_rate
             if ind == 0:
@@ -40,15 +67,13 @@ class ConfGDH(BaseFormulas):
         return res
     
     
-    def get_summry_without_bound(self, mode:Mode, freq:list, t_in=None):
+    def get_summry_without_bound(self, mode:Mode, freq:list, t_in=None, p_in=None):
         res = []
         curr_mode = mode.clone()
         curr_mode.t_in =  curr_mode.t_in  if t_in is None else t_in
+        curr_mode.p_in = curr_mode.p_in if p_in is None else p_in
         for ind, ((stage, cnt_gpa), freq) in enumerate(zip(self.stage_list, freq)):
-            if isinstance(mode.q_rate, (int, float)):
-                curr_mode.q_rate = mode.q_rate / cnt_gpa
-            else:
-                curr_mode.q_rate = mode.q_rate[ind] / cnt_gpa
+            curr_mode.q_rate = mode.get_stage_q_rate(ind, cnt_gpa)
 
             temp_res = stage.get_summry_stage(curr_mode, freq)
             temp_res['work_gpa'] = self.stage_list[ind][1]
@@ -58,6 +83,71 @@ class ConfGDH(BaseFormulas):
         return res
 
 
+    def get_summry_grad(self, mode:Mode, freq:list, dfreq:np.ndarray, dp_in:np.ndarray, t_in=None, p_in=None):
+        """Расчет цепочки ступеней с производными по вектору переменных оптимизатора
+        Args:
+            mode (Mode): Режим
+            freq (list): Частоты по ступеням, об/мин
+            dfreq (np.ndarray): Производные частот ступеней по переменным, размерность (n_stages, n_vars)
+            dp_in (np.ndarray): Производная давления на входе первой ступени по переменным, размерность (n_vars,)
+            t_in (float, optional): Температура на входе, К
+            p_in (float, optional): Давление на входе первой ступени вместо mode.p_in, МПа
+        Returns:
+            Tuple[list, list]: Результаты по ступеням (как get_summry_without_bound) и их градиенты
+        """
+        res, grad = [], []
+        curr_mode = mode.clone()
+        curr_mode.t_in =  curr_mode.t_in  if t_in is None else t_in
+        curr_mode.p_in = curr_mode.p_in if p_in is None else p_in
+        for ind, ((stage, cnt_gpa), freq) in enumerate(zip(self.stage_list, freq)):
+            curr_mode.q_rate = mode.get_stage_q_rate(ind, cnt_gpa)
+
+            temp_res, temp_grad = stage.get_summry_stage_grad(curr_mode, freq, dp_in, dfreq[ind])
+            temp_res['work_gpa'] = self.stage_list[ind][1]
+            res.append(temp_res)
+            grad.append(temp_grad)
+            curr_mode.p_in = temp_res['comp'] * curr_mode.p_in - self.avo_dp
+            dp_in = temp_grad['p_out']
+           
+        return res, grad
+
+
+    def get_summry_batch(self, modes:Mode|List[Mode], freqs:np.ndarray, t_in=None) -> np.ndarray:
+        """Пакетный расчет цепочки ступеней для набора режимов и частот
+        Args:
+            modes (Mode | List[Mode]): Режим, набор ModeBatch длины N или список из N режимов
+            freqs (np.ndarray): Частоты по ступеням, об/мин, размерность (N, n_stages)
+            t_in (float, optional): Температура на входе, К
+        Returns:
+            np.ndarray: Структурированный массив (N, n_stages) с полями SUMMRY_DTYPE
+        """
+        freqs = np.atleast_2d(np.asarray(freqs, dtype=float))
+        n_points, n_stages = freqs.shape
+        curr_mode = self._stack_modes(modes)
+        curr_mode.t_in = curr_mode.t_in if t_in is None else t_in
+        q_rate = np.broadcast_to(np.asarray(curr_mode.q_rate, dtype=float), (n_points, n_stages))
+        curr_mode.p_in = np.broadcast_to(np.asarray(curr_mode.p_in, dtype=float), (n_points,))
+        res = np.empty((n_points, n_stages), dtype=SUMMRY_DTYPE)
+
+        for ind, (stage, cnt_gpa) in enumerate(self.stage_list):
+            curr_mode.q_rate = q_rate[:, ind] / cnt_gpa
+            temp_res = stage.get_summry_stage(curr_mode, freqs[:, ind])
+            for name in SUMMRY_DTYPE.names[:-1]:
+                res[name][:, ind] = temp_res[name]
+            res['work_gpa'][:, ind] = cnt_gpa
+            curr_mode.p_in = temp_res['comp'] * curr_mode.p_in - self.avo_dp
+
+        return res
+
+
+    @staticmethod
+    def _stack_modes(modes:Mode|List[Mode]) -> Mode:
+        """Сборка списка режимов в один режим с полями-массивами"""
+        if isinstance(modes, Mode):
+            return modes.clone()
+        return ModeBatch.from_modes(modes)
+
+
     def get_summry_with_bound(self, mode:Mode, freq:np.ndarray, bound_dict:Dict[str,Tuple[np.ndarray,np.ndarray]]):
         df_smmry = self.get_summry_without_bound(mode, freq)
         curr_mode = mode.clone()
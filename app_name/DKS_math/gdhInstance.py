@@ -4,9 +4,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import math
-from app_name.DKS_math.baseFormulas import BaseFormulas
+from app_name.DKS_math.baseFormulas import BaseFormulas, GasConditions
 from app_name.DKS_math.mode import Mode
-from typing import Tuple
+from app_name.DKS_math.stageKernel import StageKernel
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
 
 class GdhInstance(BaseFormulas):
 
@@ -24,11 +28,23 @@ class GdhInstance(BaseFormulas):
         mgth = df['mgth'].to_numpy()
         stepen = df['stepen'].to_numpy()
         p_title = df['p_title'].to_numpy()
-        return cls(diam[0], koef_nap, koef_rash, kpd, freq_nom[0], t_in[0], r_value[0], k_value[0], mgth[0], stepen[0], p_title[0], deg=4, name=csv_path_str)
+        return cls(diam[0], freq_nom[0], t_in[0], r_value[0], kpd, koef_rash, koef_nap, csv_path_str, p_title[0], stepen[0], mgth[0], k_value[0], deg=4)
     
     @classmethod
     def read_dict(cls, param, deg):
         deg = cls.deg if deg is None else deg
+        return cls(*cls._read_params(param), deg=deg)
+
+
+    @classmethod
+    def read_dict_cached(cls, param, deg) -> "GdhInstance":
+        """read_dict через процессный кэш GDH_CACHE (без повторной аппроксимации ГДХ)"""
+        return GDH_CACHE.get_or_create(param, deg)
+
+
+    @classmethod
+    def _read_params(cls, param) -> tuple:
+        """Аргументы конструктора (кроме deg) из записи EqCompressorUnit"""
         r_value = param.r_value
         k_value = param.k_value
         freq_nom = param.eq_compressor_type.eq_compressor_type_freq_nominal.value
@@ -45,7 +61,8 @@ class GdhInstance(BaseFormulas):
         lst_kpd = [param.eq_compressor_perfomance_curve[i].kpd 
                    for i in range_param]        
         name = param.name
-        return cls(diam, freq_nom, t_in, r_value, np.array(lst_kpd), np.array(lst_koef_rash), np.array(lst_koef_nap), name, p_out_nom, comp_nom, power_nom, k_value, deg=deg)
+        return (diam, freq_nom, t_in, r_value, np.array(lst_kpd), np.array(lst_koef_rash), np.array(lst_koef_nap), 
+                name, p_out_nom, comp_nom, power_nom, k_value)
 
 
     def __init__(self, diam, freq_nom, t_in, r_value, kpd, koef_rash, koef_nap, name, p_out_nom, comp_nom, power_nom, k_value, deg): 
@@ -59,11 +76,16 @@ class GdhInstance(BaseFormulas):
         self.k_value = k_value
         self.f_nap_poly1d = np.poly1d(np.polyfit(koef_rash, koef_nap, deg))
         self.f_kpd_poly1d = np.poly1d(np.polyfit(koef_rash, kpd, deg))
+        self.f_nap_deriv_poly1d = self.f_nap_poly1d.deriv()
+        self.f_kpd_deriv_poly1d = self.f_kpd_poly1d.deriv()
         self.power_nom = power_nom
         self.comp_nom = comp_nom
         self.p_out_nom = p_out_nom
         self.name = name
         self._diam_cubed = np.pi**2 * diam**3 
+        self._koef_rash_min = koef_rash.min()
+        self._koef_rash_range = koef_rash.max() - self._koef_rash_min
+        self.kernel = StageKernel(diam, self.f_nap_poly1d, self.f_kpd_poly1d)
     
     def get_kpd(self, k_rash): return self.f_kpd_poly1d(k_rash)
     def get_nap(self, k_rash): return self.f_nap_poly1d(k_rash)
@@ -75,19 +97,28 @@ class GdhInstance(BaseFormulas):
         return freq_bound_arr
     
 
-    def get_summry_stage(self, mode:Mode, freq:float|np.ndarray, t_in=None, r_value=None, k_value=None) -> pd.Series:
+    def get_stage_values(self, mode:Mode, freq:float|np.ndarray, t_in=None, r_value=None, k_value=None) -> tuple:
+        """Расчет ступени ядром StageKernel
+        Returns:
+            tuple: (volume_rate, u_val, koef_rash, koef_nap, kpd, dh, power, comp)
+        """
         t_in = self.t_in if t_in is None else t_in
+        return self.kernel(mode.q_rate, mode.p_in, mode.t_in, freq, self.get_gas(mode, r_value, k_value), t_in)
+
+
+    def get_gas(self, mode:Mode, r_value=None, k_value=None) -> GasConditions:
+        """Константы стандартных условий режима с газовой постоянной и показателем политропы ступени"""
         r_value = self.r_value if r_value is None else r_value
         k_value = self.k_value if k_value is None else k_value
+        return GasConditions.get(mode.press_conditonal, mode.temp_conditonal, r_value, k_value)
+
 
-        volume_rate = mode.get_volume_rate
-        u_val = self.get_u_val(self.diam, freq)
-        koef_rash_ = self.get_koef_rash_from_volume_rate(self.diam, u_val, volume_rate)
-        koef_nap_ = self.get_nap(koef_rash_)
-        kpd_ = self.get_kpd(koef_rash_)
-        dh = self.get_dh(koef_nap_, u_val)
-        power = self.get_power(mode.q_rate, dh, kpd_, r_value, mode.press_conditonal, mode.temp_conditonal)
-        comp = self.get_comp_ratio(mode.p_in, dh, r_value, t_in, k_value, kpd_)
+    def get_summry_stage(self, mode:Mode, freq:float|np.ndarray, t_in=None, r_value=None, k_value=None) -> pd.Series:
+        return self._get_summry_stage(mode, freq, self.get_stage_values(mode, freq, t_in, r_value, k_value))
+
+
+    def _get_summry_stage(self, mode:Mode, freq:float|np.ndarray, stage_values:tuple) -> dict:
+        volume_rate, _, koef_rash_, _, _, _, power, comp = stage_values
         p_out = mode.p_in * comp
         res = {
             'q_rate': mode.q_rate,
@@ -96,8 +127,8 @@ class GdhInstance(BaseFormulas):
             'power': power,
             'comp': comp,
             'volume_rate': volume_rate,
-            'udal': (koef_rash_ - self.koef_rash.min()) / (self.koef_rash.max() - self.koef_rash.min()) * 100,
-            'freq': np.round(freq).astype(int),
+            'udal': (koef_rash_ - self._koef_rash_min) / self._koef_rash_range * 100,
+            'freq': np.rint(freq).astype(np.int64),
             'freq_dimm': freq / self.freq_nom,
             'p_in_result': mode.p_in,
             'p_out': p_out,
@@ -108,6 +139,62 @@ class GdhInstance(BaseFormulas):
         return res
       
 
+    def get_summry_stage_grad(self, mode:Mode, freq:float, dp_in:np.ndarray, dfreq:np.ndarray, 
+                              t_in=None, r_value=None, k_value=None) -> Tuple[dict, dict]:
+        """Расчет ступени вместе с производными по вектору переменных оптимизатора
+        Args:
+            mode (Mode): Режим на входе ступени
+            freq (float): Частота, об/мин
+            dp_in (np.ndarray): Производная давления на входе ступени по переменным
+            dfreq (np.ndarray): Производная частоты ступени по переменным
+        Returns:
+            Tuple[dict, dict]: Результат get_summry_stage и градиенты его параметров
+        """
+        t_in = self.t_in if t_in is None else t_in
+        gas = self.get_gas(mode, r_value, k_value)
+        r_value = gas.r_value
+        stage_values = self.kernel(mode.q_rate, mode.p_in, mode.t_in, freq, gas, t_in)
+        volume_rate, u_val, koef_rash_, koef_nap_, kpd_, dh, _, comp = stage_values
+        res = self._get_summry_stage(mode, freq, stage_values)
+        p_in = mode.p_in
+
+        z_1 = self.get_z_val(p_in, mode.t_in)
+        dvolume_rate = volume_rate * (self.get_dz_dp(p_in, mode.t_in) * dp_in / z_1 - dp_in / p_in)
+
+        du_val = self.get_u_val(self.diam, dfreq)
+        dkoef_rash = koef_rash_ * (dvolume_rate / volume_rate - du_val / u_val)
+
+        dkoef_nap = self.f_nap_deriv_poly1d(koef_rash_) * dkoef_rash
+        dkpd = self.f_kpd_deriv_poly1d(koef_rash_) * dkoef_rash
+
+        ddh = dkoef_nap * u_val**2 + 2 * koef_nap_ * u_val * du_val
+
+        mass_koef = self.get_power(mode.q_rate, 1, 1, r_value, mode.press_conditonal, mode.temp_conditonal, gas)
+        dpower = mass_koef * (ddh / kpd_ - dh * dkpd / kpd_**2)
+
+        z_in = self.get_z_val(p_in, t_in)
+        dz_in = self.get_dz_dp(p_in, t_in) * dp_in
+        m_t = gas.k_koef / kpd_
+        dm_t = -m_t / kpd_ * dkpd
+        base = dh * m_t / (z_in * r_value * t_in) + 1
+        dbase = ((ddh * m_t + dh * dm_t) / z_in - dh * m_t * dz_in / z_in**2) / (r_value * t_in)
+        dcomp = comp * (dbase / (base * m_t) - np.log(base) * dm_t / m_t**2)
+        dp_out = dp_in * comp + p_in * dcomp
+
+        grad = {
+            'p_in': dp_in,
+            'power': dpower,
+            'comp': dcomp,
+            'volume_rate': dvolume_rate,
+            'udal': dkoef_rash / self._koef_rash_range * 100,
+            'freq_dimm': dfreq / self.freq_nom,
+            'p_out': dp_out,
+            'p_out_diff': dp_out,
+            'target': np.sign(res['p_out'] - mode.p_target) * dp_out,
+        }
+        return res, grad
+      
+
     def __repr__(self) -> str:
         return f'{self.name}'
     
@@ -127,3 +214,74 @@ class GdhInstance(BaseFormulas):
         return ax, ax2
     
 
+
+
+class GdhInstanceCache:
+    """LRU-кэш аппроксимированных ГДХ процесса
+
+    Ключ - (id агрегата, степень полинома, контрольная сумма параметров и точек ГДХ), 
+    поэтому измененные в БД точки дают новый ключ, а устаревшая запись вытесняется.
+    """
+    def __init__(self, maxsize:int=256) -> None:
+        self.maxsize = maxsize
+        self._data:OrderedDict[tuple, GdhInstance] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    @staticmethod
+    def checksum(params:tuple) -> str:
+        """Контрольная сумма аргументов конструктора GdhInstance"""
+        digest = hashlib.sha1()
+        for value in params:
+            digest.update(np.asarray(value).tobytes() if isinstance(value, np.ndarray) else repr(value).encode())
+        return digest.hexdigest()
+
+
+    def get_or_create(self, param, deg:int) -> GdhInstance:
+        """ГДХ по записи EqCompressorUnit: из кэша или через аппроксимацию с сохранением"""
+        params = GdhInstance._read_params(param)
+        key = (param.id, deg, self.checksum(params))
+        with self._lock:
+            gdh = self._data.get(key)
+            if gdh is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return gdh
+            self.misses += 1
+        gdh = GdhInstance(*params, deg=deg)
+        with self._lock:
+            self._data[key] = gdh
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return gdh
+
+
+    def invalidate(self, unit_id:int=None) -> None:
+        """Удаление записей агрегата unit_id (всех записей при unit_id=None)"""
+        with self._lock:
+            for key in [key for key in self._data if unit_id is None or key[0] == unit_id]:
+                del self._data[key]
+
+
+    def stats(self) -> Dict[str, float]:
+        """Метрики кэша: размер, попадания, промахи, доля попаданий, память массивов ГДХ, байт"""
+        with self._lock:
+            calls = self.hits + self.misses
+            memory = sum(
+                value.nbytes if isinstance(value, np.ndarray) else value.coeffs.nbytes
+            for gdh in self._data.values() 
+                for value in vars(gdh).values() if isinstance(value, (np.ndarray, np.poly1d)))
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / calls if calls else 0.,
+                'memory_bytes': memory,
+            }
+
+
+GDH_CACHE = GdhInstanceCache()
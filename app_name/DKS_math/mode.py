@@ -1,8 +1,11 @@
 """ Входные данные
 """
-from app_name.DKS_math.baseFormulas import BaseFormulas
+import numpy as np
+from typing import List
+from app_name.DKS_math.baseFormulas import BaseFormulas, GasConditions
 
 class Mode(BaseFormulas):
+    __slots__ = ('q_rate', 'p_in', 't_in', 'r_value', 'k_value', 'p_target', 'press_conditonal', 'temp_conditonal')
 
     def __init__(self, q_rate:float, p_in:float, t_in:float, r_value:float, k_value:float, p_target:float, press_conditonal:float, temp_conditonal:float) -> None:
         self.q_rate = q_rate
@@ -16,25 +19,98 @@ class Mode(BaseFormulas):
     
     
     def to_dict(self):
-        return self.__dict__
+        return {name: getattr(self, name) for name in Mode.__slots__}
 
 
     def __repr__(self) -> str:
-        return f'{self.__dict__}'
+        return f'{self.to_dict()}'
     
 
     def clone(self):
-        return Mode(**self.__dict__)
+        res = object.__new__(type(self))
+        for name in Mode.__slots__:
+            setattr(res, name, getattr(self, name))
+        return res
+    
+
+    def get_stage_q_rate(self, ind:int, cnt_gpa:int=1):
+        """Расход на агрегат ступени
+        Args:
+            ind (int): Номер ступени
+            cnt_gpa (int, optional): Количество работающих агрегатов {default = 1}
+        Returns:
+            float: Комерческий расход на агрегат, млн. м3/сут
+        """
+        if isinstance(self.q_rate, (int, float)):
+            return self.q_rate / cnt_gpa
+        return self.q_rate[ind] / cnt_gpa
+    
+
+    @property
+    def gas(self) -> GasConditions:
+        """Константы стандартных условий режима (из кэша GasConditions)"""
+        return GasConditions.get(self.press_conditonal, self.temp_conditonal, self.r_value, self.k_value)
     
+
     @property
     def get_volume_rate(self):
-        return self.get_volume_rate_from_press_temp(self.q_rate, self.p_in, self.t_in, self.r_value, self.press_conditonal, self.temp_conditonal)
+        return self.get_volume_rate_from_press_temp(self.q_rate, self.p_in, self.t_in, self.r_value, self.press_conditonal, self.temp_conditonal, 
+                                                    gas=self.gas)
     
 
     def __truediv__(self,other):
         res = self.clone()
         res.q_rate /= other
         return res
+
+
+class ModeBatch(Mode):
+    """Набор режимов в виде массивов (структура массивов)
+
+    Поля - массивы длины N, q_rate - массив (N, n), где n = 1 при общем расходе 
+    или количество ступеней при расходе по ступеням.
+    """
+    __slots__ = ()
+
+    def __init__(self, q_rate, p_in, t_in, r_value, k_value, p_target, press_conditonal, temp_conditonal) -> None:
+        super().__init__(*(
+            None if value is None else np.asarray(value, dtype=float)
+        for value in (q_rate, p_in, t_in, r_value, k_value, p_target, press_conditonal, temp_conditonal)))
+        if self.q_rate.ndim < 2:
+            self.q_rate = self.q_rate.reshape((-1, 1))
+
+
+    @classmethod
+    def from_modes(cls, modes:List[Mode]) -> 'ModeBatch':
+        """Сборка списка режимов в один набор"""
+        values = {}
+        for name in Mode.__slots__:
+            column = [getattr(mode, name) for mode in modes]
+            if name == 'q_rate':
+                n_stages = max(np.size(value) for value in column)
+                column = [np.broadcast_to(value, (n_stages,)) for value in column]
+            elif any(value is None for value in column):
+                column = None
+            values[name] = column
+        return cls(**values)
+
+
+    def __len__(self) -> int:
+        return self.q_rate.shape[0]
+
+
+    def __getitem__(self, ind:int) -> Mode:
+        values = {
+            name: None if getattr(self, name) is None else getattr(self, name)[ind].item()
+        for name in Mode.__slots__ if name != 'q_rate'}
+        q_rate = self.q_rate[ind]
+        return Mode(q_rate=q_rate.item() if q_rate.size == 1 else q_rate.tolist(), **values)
+
+
+    def get_stage_q_rate(self, ind:int, cnt_gpa:int=1) -> np.ndarray:
+        if self.q_rate.shape[1] == 1:
+            return self.q_rate[:, 0] / cnt_gpa
+        return self.q_rate[:, ind] / cnt_gpa
     
     
 if __name__=='__main__':
@@ -1,8 +1,13 @@
+import asyncio
+from contextlib import aclosing
+from itertools import product
 from typing import Sequence
 from app_name.DKS_math.solver.solver_p_out import *
-from app_name.DKS_math.DKS_vfp import ConfGDHSolverVfp, calc_table_vfp_param
-from app_name.DKS_math.DKS import ConfGDHSolver, calc_modes_parall
+from app_name.DKS_math.DKS_vfp import ConfGDHSolverVfp, calc_table_vfp_param, get_vfp_mode_params
+from app_name.DKS_math.DKS import ConfGDHSolver, ModeQuantizer, calc_modes_parall
+from app_name.DKS_math.surrogate import LayoutSurrogate
 from app_name.infrastructure.repositories.compressor.models.models_gdh import EqCompressorUnit
+from app_name.infrastructure.adapters.result_store import ModeResultCache, VfpCellStore
 
 
 async def calc_vfp(
@@ -10,21 +15,63 @@ async def calc_vfp(
                 cnt_arr: List[list[int]],
                 table_params: Dict,
                 bound_dict: List[List[Dict]],
-                deg:int
+                deg:int,
+                max_workers:int = 1,
+                pruned:bool = False,
+                warm_start:bool = False,
+                skip_infeasible:bool = False,
+                store:VfpCellStore = None,
+                executor:'CalcExecutor' = None
                 ):
     
     #создаем экземпляр класса со всеми копоновками
-    conf_solv_obj = ConfGDHSolverVfp([
-        [
-            (GdhInstance.read_dict(params[0], deg), cnt)
-            for params, cnt in zip(lst_params_comp, lst_comp)
-        ] 
-            for lst_params_comp, lst_comp in zip(lst_params_all_comp, cnt_arr)
-    ],
-    bound_dict
-    ) 
-    #расчет всех режимов
-    results = calc_table_vfp_param(conf_solv_obj, table_params, bound_dict)
+    conf_solv_obj = create_conf(ConfGDHSolverVfp, lst_params_all_comp, cnt_arr, bound_dict, deg)
+    #ранее рассчитанные ячейки (запросы к sqlite - в потоке, вне цикла событий)
+    known, layout_keys = await asyncio.to_thread(get_known_cells, store, lst_params_all_comp, cnt_arr, 
+                                                 table_params, bound_dict, deg)
+    #расчет всех режимов и таблиц
+    results, dct = await _run(executor, sync_calc_vfp, conf_solv_obj, table_params, bound_dict, max_workers, 
+                              pruned, warm_start, skip_infeasible, known)
+    await asyncio.to_thread(put_new_cells, store, layout_keys, known, results, table_params)
+    return dct
+
+
+def get_known_cells(store:VfpCellStore, lst_params_all_comp, cnt_arr, table_params, bound_dict, deg):
+    """Ранее рассчитанные ячейки сетки VFP по компоновкам
+    Returns:
+        tuple: ({индекс компоновки: {(q_rate, p_target): режим}}, ключи компоновок); (None, None) без store
+    """
+    if store is None:
+        return None, None
+    mode_params = get_vfp_mode_params(bound_dict)
+    layout_keys = [
+        store.layout_key([params[0] for params in lst_params_comp], lst_comp, bounds, mode_params, deg)
+    for lst_params_comp, lst_comp, bounds in zip(lst_params_all_comp, cnt_arr, bound_dict)]
+    known = {
+        ind: store.get_cells(key, table_params.q_rate, table_params.p_out) 
+    for ind, key in enumerate(layout_keys)}
+    return known, layout_keys
+
+
+def put_new_cells(store:VfpCellStore, layout_keys, known, results, table_params):
+    """Сохранение в store рассчитанных ячеек, которых не было в known"""
+    if store is None:
+        return
+    cells = list(product(table_params.q_rate, table_params.p_out))
+    for ind, key in enumerate(layout_keys):
+        store.put_cells(key, {
+            cell: res 
+        for cell, res in zip(cells, results[ind]) if cell not in known[ind]})
+
+
+def sync_calc_vfp(conf_solv_obj:ConfGDHSolverVfp, table_params, bound_dict, max_workers=1, pruned=False, 
+                  warm_start=False, skip_infeasible=False, known=None):
+    """Расчет ячеек и таблиц VFP (выполняется в процессе пула CalcExecutor)
+    Returns:
+        tuple: (режимы по индексу компоновки, словарь с таблицами)
+    """
+    results = calc_table_vfp_param(conf_solv_obj, table_params, bound_dict, max_workers, pruned, 
+                                   warm_start, skip_infeasible, known)
     df_bif = [pd.concat(res) for res in results.values()]
 
     lst_with_df, lst_table_start, lst_table_middle = [], [], []
@@ -68,31 +115,14 @@ async def calc_vfp(
         'Table_middle': lst_table_middle,
         'Table_vfp': _format_table_dict('Table_vfp', df_vfp_clean)
     }
-    print(df_vfp)
-    return dct
+    return results, dct
 
 
 def _create_pivot_middle_table(pivot_table: pd.DataFrame) -> pd.DataFrame:
-    rows_len, columns_len = pivot_table.shape
-
-    pivot_table_middle = pd.DataFrame(np.full((rows_len, columns_len), np.nan), columns=pivot_table.columns, index=pivot_table.index)
-    pivot_table_middle.iloc[-1, -1] = pivot_table.iloc[-1, -1]
-    
-    for i in reversed(range(rows_len - 1)):
-        if pd.notna(pivot_table.iloc[i, -1]) or pd.notna(pivot_table_middle.iloc[i+1, -1]):
-            pivot_table_middle.iloc[i, -1] = np.nanmin([pivot_table.iloc[i, -1], 
-                                                    pivot_table_middle.iloc[i+1, -1]])
-        
-        for j in reversed(range(columns_len - 1)):
-            if pd.notna(pivot_table.iloc[-1, j]) or pd.notna(pivot_table_middle.iloc[-1, j+1]):
-                pivot_table_middle.iloc[-1, j]  = np.nanmin([pivot_table.iloc[-1, j], 
-                                                            pivot_table_middle.iloc[-1, j+1]])
-            
-            if pd.notna(pivot_table_middle.iloc[i+1, j]) or pd.notna(pivot_table_middle.iloc[i, j+1]) or pd.notna(pivot_table.iloc[i, j]):
-                pivot_table_middle.iloc[i, j] = np.nanmin([pivot_table_middle.iloc[i+1, j], 
-                                                        pivot_table_middle.iloc[i, j+1],
-                                                        pivot_table.iloc[i, j]])
-    return pivot_table_middle
+    """Монотонная таблица: в ячейке минимум (без NaN) по всем ячейкам с не меньшими q_rate и p_target"""
+    values = pivot_table.to_numpy(dtype=float)[::-1, ::-1]
+    values = np.fmin.accumulate(np.fmin.accumulate(values, axis=0), axis=1)[::-1, ::-1]
+    return pd.DataFrame(values, columns=pivot_table.columns, index=pivot_table.index)
 
 
 def _format_table_dict(df_name:str, df:pd.DataFrame)-> Dict:
@@ -104,21 +134,14 @@ def _format_table_dict(df_name:str, df:pd.DataFrame)-> Dict:
 
 
 def _create_table_vfp(lst_with_df: List[Tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """Таблица VFP: минимум (без NaN) по таблицам оборудования на объединении индексов и столбцов"""
     all_idx = sorted({idx for _, df in lst_with_df for idx in df.index})
     all_cols = sorted({idx for _, df in lst_with_df for idx in df.columns})
-    all_eq = [name for name, _ in lst_with_df]
 
-    vfp_table = pd.DataFrame(index=all_idx, columns=all_cols)
-    for press in all_cols:
-        df_press = pd.DataFrame(index=all_idx, columns=all_eq)
-        for eq_name, df in lst_with_df:
-            if press in df.columns:
-                for idx in all_idx:
-                    if idx in df.index:
-                        df_press.at[idx, eq_name] = df.at[idx, press]
-                        
-        vfp_table[press] = df_press.min(axis=1, skipna=True)
-    return vfp_table
+    values = np.stack([
+        df.reindex(index=all_idx, columns=all_cols).to_numpy(dtype=float)
+    for _, df in lst_with_df])
+    return pd.DataFrame(np.fmin.reduce(values, axis=0), index=all_idx, columns=all_cols)
 
 
 def calc_vfp_2(
@@ -145,22 +168,126 @@ async def calc_of_modes(
                 cnt_arr: List[list[int]],
                 modes: List[Dict],
                 bound_dict: List[List[Dict]],
-                deg: int
+                deg: int,
+                max_workers: int = 1,
+                pruned: bool = False,
+                warm_start: bool = False,
+                executor: 'CalcExecutor' = None,
+                cache: ModeResultCache = None,
+                quantizer: ModeQuantizer = None
                 ):
     #создаем экземпляр класса со всеми копоновками
+    conf_solv_obj = create_conf(ConfGDHSolver, lst_params_all_comp, cnt_arr, bound_dict, deg)
+    mode = [Mode(**mode.dict()) for mode in modes]
+    #округление и отбор уникальных режимов до передачи в пул, чтобы счетчики quantizer оставались здесь
+    solve_modes, inverse = (mode, None) if quantizer is None else quantizer.unique(mode)
+    #с теплым стартом режим зависит от предыдущих, поэтому кэш не используется
+    if cache is None or warm_start:
+        results = await _run(executor, calc_modes_parall, conf_solv_obj, solve_modes, max_workers, pruned, warm_start)
+    else:
+        results = await _calc_modes_cached(cache, executor, conf_solv_obj, solve_modes, lst_params_all_comp, 
+                                           cnt_arr, bound_dict, deg, max_workers, pruned)
+    if quantizer is not None:
+        results = quantizer.fan_out(results, mode, inverse)
+    return [pd.concat(res) for res in results.values()]
+
+
+async def _calc_modes_cached(cache:ModeResultCache, executor, conf_solv_obj:ConfGDHSolver, modes:List[Mode], 
+                             lst_params_all_comp, cnt_arr, bound_dict, deg, max_workers=1, pruned=False):
+    """Расчет режимов, отсутствующих в cache хотя бы одной компоновки; остальные берутся из cache
+    
+    Запросы к sqlite выполняются в потоке, чтобы не блокировать цикл событий.
+    """
+    layout_keys = [
+        cache.layout_key([params[0] for params in lst_params_comp], lst_comp, bounds, deg)
+    for lst_params_comp, lst_comp, bounds in zip(lst_params_all_comp, cnt_arr, bound_dict)]
+    mode_keys = [cache.mode_key(item.to_dict()) for item in modes]
+    known = [await asyncio.to_thread(cache.get, key, mode_keys) for key in layout_keys]
+    missing = {
+        key: ind 
+    for ind, key in enumerate(mode_keys) if any(key not in layout_known for layout_known in known)}
+    if missing:
+        results = await _run(executor, calc_modes_parall, conf_solv_obj, [modes[ind] for ind in missing.values()], 
+                             max_workers, pruned)
+        for ind, (layout_key, lst_params_comp) in enumerate(zip(layout_keys, lst_params_all_comp)):
+            new = dict(zip(missing, results[ind]))
+            await asyncio.to_thread(cache.put, layout_key, new, [params[0].id for params in lst_params_comp])
+            known[ind].update(new)
+    return {ind: [layout_known[key] for key in mode_keys] for ind, layout_known in enumerate(known)}
+
+
+async def stream_calc_of_modes(
+                lst_params_all_comp: List[list[Sequence[EqCompressorUnit]]],
+                cnt_arr: List[list[int]],
+                modes: List[Dict],
+                bound_dict: List[List[Dict]],
+                deg: int,
+                pruned: bool = False,
+                warm_start: bool = False,
+                executor: 'CalcExecutor' = None
+                ):
+    """Расчет режимов с выдачей записи на (компоновка, режим) сразу после решения"""
+    conf_solv_obj = create_conf(ConfGDHSolver, lst_params_all_comp, cnt_arr, bound_dict, deg)
+    mode = [Mode(**mode.dict()) for mode in modes]
+    if executor is None:
+        for record in iter_calc_of_modes(conf_solv_obj, mode, pruned, warm_start):
+            yield record
+        return
+    async with aclosing(executor.stream(iter_calc_of_modes, conf_solv_obj, mode, pruned, warm_start)) as records:
+        async for record in records:
+            yield record
+
+
+def iter_calc_of_modes(conf_solv_obj:ConfGDHSolver, modes:List[Mode], pruned=False, warm_start=False):
+    """Генератор записей {'layout', 'mode', 'result'} (выполняется в процессе пула CalcExecutor)"""
+    for layout, mode_ind, df in conf_solv_obj.iter_all_comp(modes, pruned, warm_start):
+        yield {'layout': layout, 'mode': mode_ind, 'result': frame_to_record(df)}
 
-    conf_solv_obj = ConfGDHSolver([
+
+def frame_to_record(df:pd.DataFrame) -> Dict | None:
+    """Итоговый режим в виде {столбец: список значений}, NaN заменяются на None"""
+    return None if df is None else df.where(pd.notna(df), None).to_dict('list')
+
+
+async def build_surrogate(
+                lst_params_comp: Sequence[Sequence[EqCompressorUnit]],
+                lst_comp: List[int],
+                bounds: List[Dict],
+                deg: int,
+                axes: List[List[float]],
+                mode_params: Dict[str, float],
+                max_workers: int = 1,
+                pruned: bool = False,
+                executor: 'CalcExecutor' = None
+                ) -> LayoutSurrogate:
+    """Суррогатная модель одной компоновки по узлам axes (q_rate, p_in, p_target)"""
+    conf_solv_obj = create_conf(ConfGDHSolver, [lst_params_comp], [lst_comp], [bounds], deg)
+    return await _run(executor, LayoutSurrogate.build, conf_solv_obj, *axes, mode_params, max_workers, pruned)
+
+
+async def query_surrogate(surrogate:LayoutSurrogate, points:List[Dict], fallback=False, max_error=0.01,
+                          executor:'CalcExecutor' = None) -> List[Dict]:
+    """Ответ суррогатной модели; с точным расчетом (fallback) - в пуле executor"""
+    if not fallback:
+        return surrogate.query(points)
+    return await _run(executor, surrogate.query, points, fallback, max_error)
+
+
+def create_conf(conf_cls, lst_params_all_comp, cnt_arr, bound_dict, deg):
+    """Экземпляр ConfGDHSolver(Vfp) со всеми компоновками из записей EqCompressorUnit"""
+    return conf_cls([
         [
-            (GdhInstance.read_dict(params[0], deg), cnt)
+            (GdhInstance.read_dict_cached(params[0], deg), cnt)
             for params, cnt in zip(lst_params_comp, lst_comp)
         ] 
             for lst_params_comp, lst_comp in zip(lst_params_all_comp, cnt_arr)
     ],
     bound_dict
     ) 
-    
-    mode = [Mode(**mode.dict()) for mode in modes]
-    results = calc_modes_parall(conf_solv_obj, mode)
-    df_bif = [pd.concat(res) for res in results.values()]
-    return df_bif
 
+
+async def _run(executor:'CalcExecutor', func, *args):
+    """Расчет в пуле executor или, без него, в текущем потоке"""
+    if executor is None:
+        return func(*args)
+    return await executor.run(func, *args)
@@ -0,0 +1,39 @@
+"""Кэш расчета цепочки ступеней для целевой функции и ограничений"""
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+import numpy as np
+
+
+class EvalCache:
+    """Мемоизация расчета по точному значению вектора переменных x
+    
+    Целевая функция и все ограничения SLSQP вызываются в одной и той же точке, 
+    поэтому цепочка ступеней считается один раз на точку.
+    """
+
+    def __init__(self, func:Callable[[np.ndarray], Any], maxsize=64) -> None:
+        self.func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+
+    def __call__(self, x:np.ndarray) -> Any:
+        key = np.asarray(x, dtype=float).tobytes()
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        res = self.func(x)
+        self._cache[key] = res
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return res
+
+
+    def info(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'currsize': len(self._cache)}
+
@@ -3,9 +3,8 @@ import matplotlib.pyplot as plt
 from typing import List, Dict, Tuple
 from scipy.optimize import minimize, Bounds, NonlinearConstraint
 from app_name.DKS_math.confGDH import *
+from app_name.DKS_math.solver.eval_cache import EvalCache
 import warnings
-from autograd import value_and_grad
-import autograd.numpy as anp
 warnings.filterwarnings("ignore")
 
 
@@ -14,40 +13,65 @@ class PressInSolver:
     def __init__(self, conf:ConfGDH, bound_dict:Dict[str,Tuple[np.ndarray,np.ndarray,float]]) -> None:
         self.conf = conf
         self.bound_dict = bound_dict
+        self.cache_info = {'hits': 0, 'misses': 0}
 
 
-    def func_z(self, x, mode:Mode):
-        p_in = x[0]
-        freqs = x[1:1+len(self.conf.stage_list)]
-        curr_mode = mode.clone()
-        curr_mode.p_in = p_in    
-        df_res = self.conf.get_summry_without_bound(curr_mode, freqs)
+    def get_summry(self, x, mode:Mode, summry:EvalCache=None):
+        if summry is not None:
+            return summry(x)[0]
+        return self.conf.get_summry_without_bound(mode, x[1:1+len(self.conf.stage_list)], p_in=x[0])
+
+
+    def get_summry_grad(self, x, mode:Mode, summry:EvalCache=None):
+        if summry is not None:
+            return summry(x)
+        num_stages = len(self.conf.stage_list)
+        dx = np.eye(num_stages + 1)
+        return self.conf.get_summry_grad(mode, x[1:1+num_stages], dx[1:], dx[0], p_in=x[0])
+
+
+    def func_z(self, x, mode:Mode, summry:EvalCache=None):
+        df_res = self.get_summry(x, mode, summry)
         target = df_res[-1]['p_in']
         return target
 
 
-    def get_p_out_constr(self, x, mode:Mode) -> List[NonlinearConstraint]:
-        p_in = x[0]
-        freqs = x[1:]
-        cur_mode = mode.clone()
-        cur_mode.p_in = p_in
-        res = self.conf.get_summry_without_bound(cur_mode, freqs)[-1]['p_out']
+    def func_z_jac(self, x, mode:Mode, summry:EvalCache=None):
+        _, grad = self.get_summry_grad(x, mode, summry)
+        return grad[-1]['p_in']
+
+
+    def get_p_out_constr(self, x, mode:Mode, summry:EvalCache=None) -> List[NonlinearConstraint]:
+        res = self.get_summry(x, mode, summry)[-1]['p_out']
         return res
 
 
-    def get_bound_dict_constr(self, x, mode:Mode, num_stage) -> List[NonlinearConstraint]:
-        p_in = x[0]
-        freqs = x[1:]
+    def get_p_out_constr_jac(self, x, mode:Mode, summry:EvalCache=None) -> np.ndarray:
+        _, grad = self.get_summry_grad(x, mode, summry)
+        return grad[-1]['p_out']
+
+
+    def get_bound_dict_constr(self, x, mode:Mode, num_stage, summry:EvalCache=None) -> List[NonlinearConstraint]:
         param_names = ['p_out_diff', 'freq_dimm', 'power', 'comp', 'udal']
-        
-        cur_mode = mode.clone()
-        cur_mode.p_in = p_in
-        stage_results = self.conf.get_summry_without_bound(cur_mode, freqs)[num_stage]
-        
+        stage_results = self.get_summry(x, mode, summry)[num_stage]
         return [stage_results[key] for key in param_names]
 
+
+    def get_bound_dict_constr_jac(self, x, mode:Mode, num_stage, summry:EvalCache=None) -> np.ndarray:
+        param_names = ['p_out_diff', 'freq_dimm', 'power', 'comp', 'udal']
+        _, grad = self.get_summry_grad(x, mode, summry)
+        return np.array([grad[num_stage][key] for key in param_names])
+
     
-    def minimize(self, mode:Mode):
+    def minimize(self, mode:Mode, x0:np.ndarray=None):
+        """Оптимизация давления на входе и частот ступеней
+        Args:
+            mode (Mode): Режим
+            x0 (np.ndarray, optional): Начальное приближение [p_in, частоты] (теплый старт); 
+                при неудаче расчет повторяется из середины границ {default = None}
+        Returns:
+            OptimizeResult: Результат SLSQP
+        """
         num_stages = len(self.conf.stage_list)
         param_names = ['p_out_diff', 'freq_dimm', 'power', 'comp', 'udal']
         bounds_array_staged = np.array([
@@ -63,14 +87,17 @@ class PressInSolver:
         p_in_lb = 0  
         p_in_ub = mode.p_target 
         bounds = Bounds([p_in_lb] + [-np.inf]*num_stages, [p_in_ub] + [np.inf]*num_stages)
+        summry = EvalCache(lambda x: self.get_summry_grad(x, mode))
         constraints = [
                 *[NonlinearConstraint(
-                            fun=lambda x, ns=num_stage: self.get_bound_dict_constr(x, mode, ns),
+                            fun=lambda x, ns=num_stage: self.get_bound_dict_constr(x, mode, ns, summry),
+                            jac=lambda x, ns=num_stage: self.get_bound_dict_constr_jac(x, mode, ns, summry),
                             lb=bounds_array_staged[num_stage][:, 1].tolist(), 
                             ub=bounds_array_staged[num_stage][:, 0].tolist()
                             ) for num_stage in range(num_stages)],
                 NonlinearConstraint(
-                            fun=lambda x: self.get_p_out_constr(x, mode),
+                            fun=lambda x: self.get_p_out_constr(x, mode, summry),
+                            jac=lambda x: self.get_p_out_constr_jac(x, mode, summry),
                             lb=mode.p_target, 
                             ub=bounds_array_staged[-1][0,0]
                             )    
@@ -78,14 +105,22 @@ class PressInSolver:
         p_in_0 = (p_in_lb + p_in_ub) / 2
         freq_b = [(lb + ub) / 2 for lb, ub in zip(lower_bounds, upper_bounds)]
 
-        x0 = np.array([p_in_0, *freq_b])
-        res = minimize(self.func_z, 
-                        x0=x0,
-                        args=(mode),
-                        method='SLSQP',
-                        bounds=bounds, 
-                        constraints=constraints,
-                        )
+        x_mid = np.array([p_in_0, *freq_b])
+        for x_start in ([] if x0 is None else [np.clip(x0, bounds.lb, bounds.ub)]) + [x_mid]:
+            res = minimize(self.func_z, 
+                            x0=x_start,
+                            args=(mode, summry),
+                            jac=self.func_z_jac,
+                            method='SLSQP',
+                            bounds=bounds, 
+                            constraints=constraints,
+                            )
+            if res.success:
+                break
+        res.warm_start = x0 is not None and x_start is not x_mid
+        res.cache_info = summry.info()
+        self.cache_info['hits'] += summry.hits
+        self.cache_info['misses'] += summry.misses
         return res
    
 
@@ -3,9 +3,8 @@ import matplotlib.pyplot as plt
 from typing import List, Dict, Tuple
 from scipy.optimize import minimize, Bounds, NonlinearConstraint
 from app_name.DKS_math.confGDH import *
+from app_name.DKS_math.solver.eval_cache import EvalCache
 import warnings
-from autograd import value_and_grad
-import autograd.numpy as anp
 warnings.filterwarnings("ignore")
 
 
@@ -14,12 +13,30 @@ class Solver:
     def __init__(self, conf:ConfGDH, bound_dict:Dict[str,Tuple[np.ndarray,np.ndarray,float]]) -> None:
         self.conf = conf
         self.bound_dict = bound_dict
+        self.cache_info = {'hits': 0, 'misses': 0}
 
 
-    def func_z(self, x, mode:Mode):    
-        df_res = self.conf.get_summry_without_bound(mode, x)
+    def get_summry(self, x, mode:Mode, summry:EvalCache=None):
+        if summry is None:
+            return self.conf.get_summry_without_bound(mode, x)
+        return summry(x)[0]
+
+
+    def get_summry_grad(self, x, mode:Mode, summry:EvalCache=None):
+        if summry is None:
+            return self.conf.get_summry_grad(mode, x, np.eye(len(x)), np.zeros(len(x)))
+        return summry(x)
+
+
+    def func_z(self, x, mode:Mode, summry:EvalCache=None):    
+        df_res = self.get_summry(x, mode, summry)
         target = df_res[-1]['target']
         return target 
+
+
+    def func_z_jac(self, x, mode:Mode, summry:EvalCache=None):    
+        _, grad = self.get_summry_grad(x, mode, summry)
+        return grad[-1]['target']
     
 
     def get_2stage_targer_surface(self, mode:Mode):
@@ -35,8 +52,7 @@ class Solver:
         dimens = np.array([50,50])
         x_arr = np.array(np.meshgrid(np.linspace(freq_rehsaped[0,0]-x_dop, freq_rehsaped[0,1]+x_dop, dimens[0]), 
                                      np.linspace(freq_rehsaped[1,1]-x_dop, freq_rehsaped[1,2]+x_dop, dimens[1]))).reshape(2,dimens[0]*dimens[1]).T
-        f_z = lambda x: self.conf.get_summry_without_bound(mode, x)
-        z_ar = [f_z(x) for x in x_arr]
+        z_ar = self.conf.get_summry_batch(mode, x_arr)
         freq1, freq2 = np.meshgrid(np.linspace(freq_rehsaped[0,0]-x_dop, freq_rehsaped[0,1]+x_dop, dimens[0]), 
                                    np.linspace(freq_rehsaped[1,1]-x_dop, freq_rehsaped[1,2]+x_dop, dimens[1]))
         freq1_1, freq2_1 = freq_rehsaped[0], freq_rehsaped[1]
@@ -50,7 +66,7 @@ class Solver:
         for ind, name in enumerate(list_names):
             for stage_ind in [0,1]:
                 ax = axs[ind,stage_ind]
-                z_curr = np.array([z_val[name].iloc[stage_ind] for z_val in z_ar])
+                z_curr = z_ar[name][:, stage_ind]
                 z_curr = z_curr.reshape(*dimens)
                 levels = np.linspace(
                         self.bound_dict[name][1][stage_ind],
@@ -69,25 +85,37 @@ class Solver:
         return ax
     
 
-    def get_freq_constr(self, freqs:np.ndarray, mode:Mode):
-        curr_mode = mode.clone()
-        curr_mode.q_rate = mode.q_rate[0] / self.conf.stage_list[0][1]
-        freq_min, freq_max = self.conf.stage_list[0][0].get_freq_bound(curr_mode.get_volume_rate)
-        res = [(freqs[0] - freq_min) / (freq_max - freq_min)]
-        for ind, (stage, cnt_gpa)  in list(enumerate(self.conf.stage_list))[1:]:
-            curr_mode.p_in = self.conf.stage_list[ind-1][0].get_summry_stage(curr_mode, freqs[ind-1])['p_out'] - self.conf.avo_dp
-            curr_mode.q_rate = mode.q_rate[ind] / cnt_gpa
-            freq_min, freq_max = stage.get_freq_bound(curr_mode.get_volume_rate)
+    def get_freq_constr(self, freqs:np.ndarray, mode:Mode, summry:EvalCache=None):
+        stage_res = self.get_summry(freqs, mode, summry)
+        res = []
+        for ind, (stage, _) in enumerate(self.conf.stage_list):
+            freq_min, freq_max = stage.get_freq_bound(stage_res[ind]['volume_rate'])
             res.append((freqs[ind] - freq_min) / (freq_max - freq_min))  
         return res
 
 
-    def get_comp_constr(self, freqs:np.ndarray, mode:Mode):
-        res = self.conf.get_summry_without_bound(mode, freqs)
+    def get_freq_constr_jac(self, freqs:np.ndarray, mode:Mode, summry:EvalCache=None):
+        stage_res, stage_grad = self.get_summry_grad(freqs, mode, summry)
+        dfreqs = np.eye(len(freqs))
+        res = []
+        for ind, (stage, _) in enumerate(self.conf.stage_list):
+            volume_rate = stage_res[ind]['volume_rate']
+            freq_min, freq_max = stage.get_freq_bound(volume_rate)
+            res.append((dfreqs[ind] - freqs[ind] * stage_grad[ind]['volume_rate'] / volume_rate) / (freq_max - freq_min))
+        return np.array(res)
+
+
+    def get_comp_constr(self, freqs:np.ndarray, mode:Mode, summry:EvalCache=None):
+        res = self.get_summry(freqs, mode, summry)
         return [stage['comp'] for stage in res]
+
+
+    def get_comp_constr_jac(self, freqs:np.ndarray, mode:Mode, summry:EvalCache=None):
+        _, grad = self.get_summry_grad(freqs, mode, summry)
+        return np.array([stage['comp'] for stage in grad])
     
 
-    def get_bound_dict_constr(self, mode:Mode, num_stage) -> List[NonlinearConstraint]:
+    def get_bound_dict_constr(self, mode:Mode, num_stage, summry:EvalCache=None) -> List[NonlinearConstraint]:
         param_names = ['p_out_diff', 'freq_dimm', 'power', 'comp', 'udal']
         bounds_array_staged = np.array([
             [
@@ -98,17 +126,28 @@ class Solver:
             for stage in self.bound_dict
         ]
         )
-        fun = lambda x: [self.conf.get_summry_without_bound(mode, x)[num_stage][key] 
+        fun = lambda x: [self.get_summry(x, mode, summry)[num_stage][key] 
                         for key in param_names]
+        jac = lambda x: np.array([self.get_summry_grad(x, mode, summry)[1][num_stage][key] 
+                                  for key in param_names])
         constr_obj = NonlinearConstraint(
                                 fun=fun, 
+                                jac=jac,
                                 lb=bounds_array_staged[num_stage][:, 1].tolist(), 
                                 ub=bounds_array_staged[num_stage][:, 0].tolist()
                                 )
         return constr_obj
     
 
-    def minimize(self, mode:Mode):
+    def minimize(self, mode:Mode, x0:np.ndarray=None):
+        """Оптимизация частот ступеней
+        Args:
+            mode (Mode): Режим
+            x0 (np.ndarray, optional): Начальное приближение частот (теплый старт); 
+                при неудаче расчет повторяется из середины границ {default = None}
+        Returns:
+            OptimizeResult: Результат SLSQP
+        """
         num_stages = len(self.conf.stage_list)
         freq_bounds = self.conf.get_freq_bound_all(mode)
         freq_rehsaped = np.array([
@@ -119,27 +158,39 @@ class Solver:
         lower_bounds = [min(freq_rehsaped[i]) for i in range(num_stages)]
         upper_bounds = [max(freq_rehsaped[i]) for i in range(num_stages)]
         bounds = Bounds(lower_bounds, upper_bounds)
+        dfreqs, dp_in = np.eye(num_stages), np.zeros(num_stages)
+        summry = EvalCache(lambda x: self.conf.get_summry_grad(mode, x, dfreqs, dp_in))
         constraints = [
-                NonlinearConstraint(lambda x: self.get_freq_constr(x, mode), 
+                NonlinearConstraint(lambda x: self.get_freq_constr(x, mode, summry), 
                                     lb=np.zeros(num_stages), 
-                                    ub=np.ones(num_stages)),
-                NonlinearConstraint(lambda x: self.get_comp_constr(x, mode), 
+                                    ub=np.ones(num_stages),
+                                    jac=lambda x: self.get_freq_constr_jac(x, mode, summry)),
+                NonlinearConstraint(lambda x: self.get_comp_constr(x, mode, summry), 
                                     lb=1, 
-                                    ub=np.inf),
+                                    ub=np.inf,
+                                    jac=lambda x: self.get_comp_constr_jac(x, mode, summry)),
                 *[
-                    self.get_bound_dict_constr(mode, ind)
+                    self.get_bound_dict_constr(mode, ind, summry)
                 for ind, _ in enumerate(self.conf.stage_list)
                 ]
             ] 
         
-        x0 = np.array((bounds.lb + bounds.ub) / 2)  
-        res = minimize(self.func_z, 
-                        x0=x0,
-                        args=(mode),
-                        method='SLSQP',
-                        bounds=bounds, 
-                        constraints=constraints
-                        )
+        x_mid = np.array((bounds.lb + bounds.ub) / 2)  
+        for x_start in ([] if x0 is None else [np.clip(x0, bounds.lb, bounds.ub)]) + [x_mid]:
+            res = minimize(self.func_z, 
+                            x0=x_start,
+                            args=(mode, summry),
+                            jac=self.func_z_jac,
+                            method='SLSQP',
+                            bounds=bounds, 
+                            constraints=constraints
+                            )
+            if res.success:
+                break
+        res.warm_start = x0 is not None and x_start is not x_mid
+        res.cache_info = summry.info()
+        self.cache_info['hits'] += summry.hits
+        self.cache_info['misses'] += summry.misses
         return res
 
     
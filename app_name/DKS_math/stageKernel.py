@@ -0,0 +1,124 @@
+"""Ядро расчета ступени
+
+Расчет ступени (объемный расход -> угловая скорость -> коэффициент расхода ->
+напор/кпд -> dh -> мощность/степень сжатия) одной функцией. При наличии numba
+функция компилируется, иначе используется расчет через BaseFormulas на numpy.
+"""
+import numpy as np
+from app_name.DKS_math.baseFormulas import BaseFormulas, GasConditions
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+
+def _is_array(value) -> bool:
+    return isinstance(value, (np.ndarray, list, tuple))
+
+
+def _njit(func):
+    return numba.njit(cache=True, error_model='numpy')(func) if NUMBA_AVAILABLE else func
+
+
+_PI_OVER_60 = np.pi / 60
+
+
+@_njit
+def _horner(coefs, x):
+    res = 0.0
+    for coef in coefs:
+        res = res * x + coef
+    return res
+
+
+@_njit
+def _z_val(p_in, t_in):
+    z_val = 1 - 0.427 * p_in / 4.6 * (t_in / 190)**(-3.688)
+    return 0.1 if z_val < 0 else z_val
+
+
+@_njit
+def _stage_point(q_rate, p_in, mode_t_in, freq, diam, nap_coefs, kpd_coefs,
+                 r_value, t_in, k_koef, vol_koef, mass_koef):
+    volume_rate = q_rate * vol_koef * _z_val(p_in, mode_t_in) * mode_t_in / p_in
+    u_val = freq * diam * _PI_OVER_60
+    koef_rash_ = 4 * volume_rate / (np.pi * diam**2 * u_val * 60)
+    koef_nap_ = _horner(nap_coefs, koef_rash_)
+    kpd_ = _horner(kpd_coefs, koef_rash_)
+    dh = koef_nap_ * u_val**2
+    power = dh * (q_rate * mass_koef) / kpd_ / 10**3
+    m_t = k_koef / kpd_
+    comp = (dh * m_t / (_z_val(p_in, t_in) * r_value * t_in) + 1)**(1 / m_t)
+    return volume_rate, u_val, koef_rash_, koef_nap_, kpd_, dh, power, comp
+
+
+@_njit
+def _stage_array(q_rate, p_in, mode_t_in, freq, diam, nap_coefs, kpd_coefs,
+                 r_value, t_in, k_koef, vol_koef, mass_koef):
+    res = np.empty((8, q_rate.shape[0]))
+    for i in range(q_rate.shape[0]):
+        vals = _stage_point(q_rate[i], p_in[i], mode_t_in[i], freq[i], diam, nap_coefs, kpd_coefs,
+                            r_value, t_in, k_koef, vol_koef[i], mass_koef[i])
+        for j in range(8):
+            res[j, i] = vals[j]
+    return res
+
+
+class StageKernel:
+    """Расчет ступени ГДХ с полиномами в схеме Горнера
+
+    Коэффициенты полиномов считаются один раз, множители стандартных условий 
+    берутся из GasConditions.
+    Возвращает кортеж (volume_rate, u_val, koef_rash, koef_nap, kpd, dh, power, comp).
+    """
+
+    def __init__(self, diam:float, f_nap_poly1d:np.poly1d, f_kpd_poly1d:np.poly1d, compiled:bool=None) -> None:
+        self.diam = float(diam)
+        self.nap_coefs = np.ascontiguousarray(f_nap_poly1d.coeffs, dtype=np.float64)
+        self.kpd_coefs = np.ascontiguousarray(f_kpd_poly1d.coeffs, dtype=np.float64)
+        self.compiled = NUMBA_AVAILABLE if compiled is None else compiled and NUMBA_AVAILABLE
+
+
+    def __call__(self, q_rate, p_in, mode_t_in, freq, gas:GasConditions, t_in) -> tuple:
+        """Расчет ступени
+        Args:
+            q_rate: Комерческий расход на агрегат, млн. м3/сут
+            p_in: Давление на входе, МПа
+            mode_t_in: Температура режима (для объемного расхода), К
+            freq: Частота, об/мин
+            gas (GasConditions): Константы стандартных условий и газа ступени
+            t_in: Температура на входе ступени, К
+        Returns:
+            tuple: (volume_rate, u_val, koef_rash, koef_nap, kpd, dh, power, comp)
+        """
+        if not self.compiled:
+            return self._call_numpy(q_rate, p_in, mode_t_in, freq, gas, t_in)
+
+        args = (q_rate, p_in, mode_t_in, freq, gas.vol_koef, gas.mass_koef)
+        if not any(map(_is_array, args)):
+            return _stage_point(*map(float, args[:4]), self.diam, self.nap_coefs, self.kpd_coefs,
+                                float(gas.r_value), float(t_in), float(gas.k_koef), *map(float, args[4:]))
+
+        args = np.broadcast_arrays(*(np.asarray(arg, dtype=np.float64) for arg in args))
+        shape = args[0].shape
+        q_rate, p_in, mode_t_in, freq, vol_koef, mass_koef = (np.ascontiguousarray(arg).reshape(-1) for arg in args)
+        res = _stage_array(q_rate, p_in, mode_t_in, freq, self.diam, self.nap_coefs, self.kpd_coefs,
+                           float(gas.r_value), float(t_in), float(gas.k_koef), vol_koef, mass_koef)
+        return tuple(val.reshape(shape) for val in res)
+
+
+    def _call_numpy(self, q_rate, p_in, mode_t_in, freq, gas:GasConditions, t_in) -> tuple:
+        r_value, k_value = gas.r_value, gas.k_value
+        volume_rate = BaseFormulas.get_volume_rate_from_press_temp(q_rate, p_in, mode_t_in, r_value,
+                                                                   gas.press_conditonal, gas.temp_conditonal, gas)
+        u_val = BaseFormulas.get_u_val(self.diam, freq)
+        koef_rash_ = BaseFormulas.get_koef_rash_from_volume_rate(self.diam, u_val, volume_rate)
+        koef_nap_ = np.polyval(self.nap_coefs, koef_rash_)
+        kpd_ = np.polyval(self.kpd_coefs, koef_rash_)
+        dh = BaseFormulas.get_dh(koef_nap_, u_val)
+        power = BaseFormulas.get_power(q_rate, dh, kpd_, r_value, gas.press_conditonal, gas.temp_conditonal, gas)
+        comp = BaseFormulas.get_comp_ratio(p_in, dh, r_value, t_in, k_value, kpd_, gas)
+        return volume_rate, u_val, koef_rash_, koef_nap_, kpd_, dh, power, comp
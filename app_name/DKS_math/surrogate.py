@@ -0,0 +1,153 @@
+"""Суррогатная модель компоновки: интерполяция итоговых режимов по сетке (q_rate, p_in, p_target)"""
+from itertools import product
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+from scipy.interpolate import RegularGridInterpolator
+from app_name.DKS_math.DKS import ConfGDHSolver
+from app_name.DKS_math.mode import Mode
+
+SURROGATE_AXES = ('q_rate', 'p_in', 'p_target')
+#work_gpa - целое, интерполируется по ближайшему узлу
+SURROGATE_FIELDS = {'power': 'linear', 'freq': 'linear', 'work_gpa': 'nearest'}
+
+
+class LayoutSurrogate:
+    """Интерполяция мощности, частот и количества работающих агрегатов ступеней одной компоновки
+
+    Узлы сетки рассчитываются точным решателем ConfGDHSolver. Оценка погрешности -
+    относительное отклонение суммарной мощности в центре каждой ячейки сетки от точного расчета
+    (inf, если интерполяция дает режим, а точный расчет - нет). Ячейки с недопустимым узлом
+    дают NaN (нет ответа суррогата).
+    """
+    def __init__(self, conf:ConfGDHSolver, axes:Dict[str, np.ndarray], values:Dict[str, np.ndarray],
+                 mode_params:Dict[str, float], cell_error:np.ndarray=None) -> None:
+        self.conf = conf
+        self.axes = axes
+        self.values = values
+        self.mode_params = mode_params
+        self.cell_error = cell_error
+        grid = tuple(axes[name] for name in SURROGATE_AXES)
+        self._interp = {
+            name: RegularGridInterpolator(grid, values[name], method=method, bounds_error=False, fill_value=np.nan)
+        for name, method in SURROGATE_FIELDS.items()}
+
+
+    @classmethod
+    def build(cls, conf:ConfGDHSolver, q_rates:Sequence[float], p_ins:Sequence[float], p_targets:Sequence[float],
+              mode_params:Dict[str, float], max_workers=1, pruned=False, validate=True) -> 'LayoutSurrogate':
+        """Расчет узлов сетки (и центров ячеек при validate) точным решателем
+        Args:
+            conf (ConfGDHSolver): Компоновка (без дополнительных компоновок)
+            q_rates, p_ins, p_targets (Sequence[float]): Узлы сетки по осям (возрастающие, не менее 2)
+            mode_params (Dict[str, float]): Остальные параметры Mode
+            max_workers (int, optional): Количество процессов get_all_comp {default = 1}
+            pruned (bool, optional): Поиск по уровням количества агрегатов {default = False}
+            validate (bool, optional): Оценка погрешности по центрам ячеек {default = True}
+        """
+        axes = {
+            name: np.asarray(sorted(values), dtype=float)
+        for name, values in zip(SURROGATE_AXES, (q_rates, p_ins, p_targets))}
+        n_stages = len(conf.stage_list)
+        frames = cls._solve(conf, product(*axes.values()), mode_params, max_workers, pruned)
+        values = {
+            name: arr.reshape(tuple(len(axis) for axis in axes.values()) + (n_stages,))
+        for name, arr in _frames_to_arrays(frames, n_stages).items()}
+        surrogate = cls(conf, axes, values, mode_params)
+        if validate:
+            centers = [(axis[1:] + axis[:-1]) / 2 for axis in axes.values()]
+            points = list(product(*centers))
+            exact = _frames_to_arrays(cls._solve(conf, points, mode_params, max_workers, pruned), n_stages)
+            approx = surrogate.interpolate(points)
+            exact_power, approx_power = exact['power'].sum(axis=1), approx['power'].sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                error = np.abs(approx_power - exact_power) / exact_power
+            error[np.isnan(exact_power) & ~np.isnan(approx_power)] = np.inf
+            surrogate.cell_error = error.reshape(tuple(len(center) for center in centers))
+        return surrogate
+
+
+    @staticmethod
+    def _solve(conf:ConfGDHSolver, points, mode_params:Dict[str, float], max_workers=1, pruned=False) -> List:
+        modes = [
+            Mode(q_rate=q_rate, p_in=p_in, p_target=p_target, **mode_params)
+        for q_rate, p_in, p_target in points]
+        return conf.get_all_comp(modes, max_workers, pruned)[0]
+
+
+    def interpolate(self, points:Sequence[Sequence[float]]) -> Dict[str, np.ndarray]:
+        """Значения полей SURROGATE_FIELDS в точках (q_rate, p_in, p_target), массивы (N, число ступеней)"""
+        points = np.asarray(points, dtype=float).reshape((-1, len(SURROGATE_AXES)))
+        res = {name: interp(points) for name, interp in self._interp.items()}
+        #ближайший узел work_gpa не имеет смысла в ячейке с недопустимым узлом
+        res['work_gpa'][np.isnan(res['power'])] = np.nan
+        return res
+
+
+    def get_error(self, points:Sequence[Sequence[float]]) -> np.ndarray:
+        """Оценка относительной погрешности мощности по ячейке сетки; NaN вне сетки или без проверки"""
+        points = np.asarray(points, dtype=float).reshape((-1, len(SURROGATE_AXES)))
+        if self.cell_error is None:
+            return np.full(len(points), np.nan)
+        inds, inside = [], np.ones(len(points), dtype=bool)
+        for col, axis in enumerate(self.axes.values()):
+            inside &= (points[:, col] >= axis[0]) & (points[:, col] <= axis[-1])
+            inds.append(np.clip(np.searchsorted(axis, points[:, col], side='right') - 1, 0, len(axis) - 2))
+        return np.where(inside, self.cell_error[tuple(inds)], np.nan)
+
+
+    def query(self, points:Sequence[Dict[str, float]], fallback=False, max_error:float=0.01) -> List[Dict]:
+        """Итоговые режимы в точках {'q_rate', 'p_in', 'p_target'}
+        Args:
+            fallback (bool, optional): Точный расчет, если суррогат не дает ответа
+                или оценка погрешности больше max_error {default = False}
+            max_error (float, optional): Допустимая относительная погрешность мощности {default = 0.01}
+        Returns:
+            List[Dict]: Точка, поля SURROGATE_FIELDS по ступеням, error, source ('surrogate', 'exact' или None)
+        """
+        coords = [[point[name] for name in SURROGATE_AXES] for point in points]
+        values = self.interpolate(coords)
+        errors = self.get_error(coords)
+        records = []
+        for ind, point in enumerate(points):
+            record = {name: float(point[name]) for name in SURROGATE_AXES}
+            error = errors[ind]
+            feasible = not np.isnan(values['power'][ind]).any()
+            if fallback and (not feasible or not error <= max_error):
+                df = self._solve(self.conf, [coords[ind]], self.mode_params)[0]
+                exact = _frames_to_arrays([df], len(self.conf.stage_list))
+                record.update({name: _to_list(exact[name][0]) for name in SURROGATE_FIELDS})
+                record.update(error=0. if df is not None else None, source='exact' if df is not None else None)
+            else:
+                record.update({name: _to_list(values[name][ind]) for name in SURROGATE_FIELDS})
+                record.update(error=None if np.isnan(error) else float(error), source='surrogate' if feasible else None)
+            records.append(record)
+        return records
+
+
+    def summary(self) -> Dict:
+        """Сетка и сводка оценки погрешности"""
+        res = {name: axis.tolist() for name, axis in self.axes.items()}
+        res['feasible_share'] = float(np.mean(~np.isnan(self.values['power']).any(axis=-1)))
+        if self.cell_error is not None:
+            finite = self.cell_error[np.isfinite(self.cell_error)]
+            res.update(
+                error_max=float(finite.max()) if finite.size else None,
+                error_mean=float(finite.mean()) if finite.size else None,
+                error_inf_cells=int(np.isinf(self.cell_error).sum())
+            )
+        return res
+
+
+def _frames_to_arrays(frames:List[pd.DataFrame], n_stages:int) -> Dict[str, np.ndarray]:
+    """Поля SURROGATE_FIELDS итоговых режимов в массивы (N, число ступеней); None - NaN"""
+    res = {name: np.full((len(frames), n_stages), np.nan) for name in SURROGATE_FIELDS}
+    for ind, df in enumerate(frames):
+        if df is not None:
+            for name in SURROGATE_FIELDS:
+                res[name][ind] = df[name].to_numpy(dtype=float)
+    return res
+
+
+def _to_list(arr:np.ndarray) -> List:
+    return [None if np.isnan(value) else float(value) for value in arr]
@@ -5,6 +5,7 @@ from app_name.infrastructure.repositories.compressor.database import async_sessi
 from app_name.infrastructure.repositories.base_repository import BaseRepository
 from app_name.infrastructure.repositories.compressor.unit_repository import CompressorUnitRepository
 from app_name.application.compressor_unit_service import CompressorUnitServise
+from app_name.application.calc_executor import CALC_EXECUTOR
 
 async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
@@ -19,4 +20,4 @@ async def get_unit_repo(session: AsyncSession = Depends(get_db_session)):
     yield CompressorUnitRepository(session)
 
 async def get_unit_service(session: AsyncSession = Depends(get_db_session)):
-    yield CompressorUnitServise(session)
\ No newline at end of file
+    yield CompressorUnitServise(session, executor=CALC_EXECUTOR)
\ No newline at end of file
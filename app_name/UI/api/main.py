@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from sqladmin import Admin
@@ -7,8 +8,17 @@ from app_name.UI.api.v1.router import router
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from app_name.infrastructure.repositories.compressor.database import engine
+from app_name.application.calc_executor import CALC_EXECUTOR
+from app_name.application.job_service import JOB_MANAGER
 
-app_name = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await JOB_MANAGER.recover()
+    yield
+    CALC_EXECUTOR.shutdown()
+
+
+app_name = FastAPI(lifespan=lifespan)
 
 app_name.include_router(router)
 
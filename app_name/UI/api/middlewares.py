@@ -2,6 +2,9 @@ from functools import wraps
 import logging
 from fastapi import HTTPException
 from typing import Any, Callable
+from app_name.application.calc_executor import CalcQueueFull, CalcTimeout
+from app_name.application.job_service import JobNotFound, JobNotFinished
+from app_name.application.compressor_unit_service import SurrogateGridTooLarge, SurrogateNotFound
 
 
 
@@ -10,6 +13,16 @@ def handle_errors(func: Callable) -> Callable:
     async def wrapper(*args: Any, **kwargs: Any) -> Any:
         try:
             return await func(*args, **kwargs)
+        except CalcQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except CalcTimeout as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except (JobNotFound, SurrogateNotFound) as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except JobNotFinished as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except SurrogateGridTooLarge as e:
+            raise HTTPException(status_code=422, detail=str(e))
         except Exception as e:
             logging.error(f'Error in {func.__name__}: {str(e)}')
             return  HTTPException(status_code=400, 
@@ -1,5 +1,9 @@
-from pydantic import BaseModel, field_serializer, field_validator
-from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, field_serializer, field_validator, model_validator
+from datetime import datetime
+from typing import Any, List, Literal, Optional
+
+#узлов сетки суррогатных моделей на запрос (с центрами ячеек - около 2x точных расчетов)
+SURROGATE_MAX_NODES = 512
 
 
 class DataPoint(BaseModel):
@@ -231,3 +235,93 @@ class Calc(ModeParam):
     udal: List[float]
     volume_rate: List[float]
 
+
+
+class JobSubmit(BaseModel):
+    """
+    Схема ответа на постановку фонового расчета
+
+    """
+    job_id: int
+
+
+class JobStatus(BaseModel):
+    """
+    Схема статуса фонового расчета
+    
+    """
+    id: int
+    kind: Literal['calc', 'calc_vfp']
+    status: Literal['queued', 'running', 'done', 'failed', 'cancelled']
+    progress_done: int
+    progress_total: int
+    error: str | None = None
+    created_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    model_config = {'from_attributes': True}
+
+
+class JobResultsPage(BaseModel):
+    """
+    Схема страницы результатов фонового расчета
+
+    """
+    job_id: int
+    offset: int
+    limit: int
+    total: int
+    items: List[Any]
+
+
+class SurrogateAxis(BaseModel):
+    """
+    Схема оси сетки суррогатной модели (равномерные узлы)
+
+    """
+    min_value: float
+    max_value: float
+    n_points: int = Field(5, ge=2, le=16)
+
+
+class SurrogateDomain(BaseModel):
+    """
+    Схема области суррогатной модели
+
+    """
+    q_rate: SurrogateAxis
+    p_in: SurrogateAxis
+    p_target: SurrogateAxis
+
+    @property
+    def n_nodes(self) -> int:
+        return self.q_rate.n_points * self.p_in.n_points * self.p_target.n_points
+
+    @model_validator(mode='after')
+    def check_n_nodes(self):
+        if self.n_nodes > SURROGATE_MAX_NODES:
+            raise ValueError(f'Узлов сетки {self.n_nodes}, допустимо не более {SURROGATE_MAX_NODES}')
+        return self
+
+
+class SurrogatePoint(BaseModel):
+    """
+    Схема точки запроса к суррогатной модели
+
+    """
+    q_rate: float
+    p_in: float
+    p_target: float
+
+
+class SurrogateResult(SurrogatePoint):
+    """
+    Схема ответа суррогатной модели по ступеням
+
+    """
+    power: List[float | None]
+    freq: List[float | None]
+    work_gpa: List[float | None]
+    error: float | None = None
+    source: Literal['surrogate', 'exact'] | None = None
+
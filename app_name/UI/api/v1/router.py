@@ -1,9 +1,13 @@
 """Модуль с эндпойтами-обработчиками запросов от клиентов"""
-from typing import Literal, List
-from fastapi import APIRouter, Depends, Query, UploadFile, File
+import json
+import logging
+from typing import AsyncIterator, Literal, List
+from fastapi import APIRouter, Depends, Query, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from app_name.infrastructure.repositories.base_repository import BaseRepository
 from app_name.application.compressor_unit_service import CompressorUnitServise
 from app_name.application.menu_service import _build_tree
+from app_name.DKS_math.DKS import ModeQuantizer
 from app_name.UI.api.dependencies import *
 from app_name.UI.api.middlewares import handle_errors
 from app_name.infrastructure.repositories.compressor.models.models_gdh  import *
@@ -67,6 +71,35 @@ async def save_excel_file(
                                   dks_code)
 
 
+@router.post("/save/{filetype}/commit_all/",
+            operation_id = "save_all",
+            name = "save_all"
+            )
+@handle_errors
+async def save_excel_file_all(
+    filetype: Literal['normal','flowrate'],
+    dks_code:str,
+    sheet_names: List[str] | None = Query(None),
+    deg: int = 4,
+    k_value: float = 1.31,
+    press_conditonal: float = 0.101325,
+    temp_conditonal: float = 283,
+    file: UploadFile = File(...),
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт сохранения всех (или выбранных) листов книги ГДХ в БД одной транзакцией\n"""
+
+    dct_df = await serv.get_df_by_xlsx(file,
+                                    deg=deg,
+                                    k_value=k_value,
+                                    press_conditonal=press_conditonal,
+                                    temp_conditonal=temp_conditonal
+                                    )
+    return await serv.create_units(dct_df, 
+                                   dks_code,
+                                   sheet_names)
+
+
 @router.post("/calc/",
             response_model = List[Calc],
             name="calc",
@@ -77,22 +110,91 @@ async def get_calc(
     conf_gdh: List[Conf],
     mode: List[ModeParamAll],
     bound_dict: List[List[BoundDictAll]],
+    response: Response,
     deg: int = Query(4, gt=0),
+    q_rate_step: float | None = Query(None, gt=0),
+    p_in_step: float | None = Query(None, gt=0),
+    p_target_step: float | None = Query(None, gt=0),
+    pruned: bool = True,
+    warm_start: bool = False,
     serv: CompressorUnitServise = Depends(get_unit_service)
     ):
-    """Эндпойнт получения таблицы с итоговыми режимами\n"""
+    """Эндпойнт получения таблицы с итоговыми режимами\n
+    \tПри заданном шаге (q_rate_step, p_in_step, p_target_step) режимы, совпадающие после округления, 
+    \tрассчитываются один раз; доля таких режимов - в заголовке X-Quantize-Hit-Rate;
+    \tpruned=false - полный перебор сочетаний количества агрегатов вместо поиска по уровням;
+    \twarm_start=true - начальное приближение из решения предыдущего режима (кэш режимов не используется)"""
+
+    steps = {'q_rate': q_rate_step, 'p_in': p_in_step, 'p_target': p_target_step}
+    quantizer = ModeQuantizer(steps) if any(steps.values()) else None
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
+    result = await serv.calc_of_modes(
+        lst_param_all_gdh,
+        [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
+        mode,
+        bound_dict,
+        deg,
+        quantizer,
+        pruned=pruned,
+        warm_start=warm_start
+    )
+    if quantizer is not None:
+        response.headers['X-Quantize-Hit-Rate'] = f"{quantizer.stats()['hit_rate']:.4f}"
+    return result
 
-    lst_param_all_gdh = []
-    for conf in conf_gdh:
-        lst = [await serv.get_gdh_by_unit_id(stage.id) for stage in conf.stage_list]
-        lst_param_all_gdh.append(lst)
-    return await serv.calc_of_modes(
+
+@router.post("/calc/stream/",
+            name="calc_stream",
+            operation_id = "calc_stream",
+            )
+@handle_errors
+async def get_calc_stream(
+    conf_gdh: List[Conf],
+    mode: List[ModeParamAll],
+    bound_dict: List[List[BoundDictAll]],
+    deg: int = Query(4, gt=0),
+    fmt: Literal['ndjson', 'sse'] = 'ndjson',
+    pruned: bool = True,
+    warm_start: bool = False,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт потоковой выдачи итоговых режимов\n
+    \tЗапись {"layout", "mode", "result"} на каждую пару (компоновка, режим) сразу после расчета;
+    \tfmt=ndjson - строка JSON на запись, fmt=sse - server-sent events с событием end в конце"""
+
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
+    records = serv.stream_calc_of_modes(
         lst_param_all_gdh,
         [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
         mode,
         bound_dict,
-        deg
+        deg,
+        pruned=pruned,
+        warm_start=warm_start
     )
+    #первая запись до ответа: ошибки очереди и расчета возвращаются кодом статуса
+    first = await anext(records, None)
+    media_type = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    return StreamingResponse(_format_stream(first, records, fmt), media_type=media_type)
+
+
+async def _format_stream(first, records: AsyncIterator[dict], fmt: str) -> AsyncIterator[str]:
+    def line(record):
+        data = json.dumps(record, ensure_ascii=False)
+        return f'data: {data}\n\n' if fmt == 'sse' else f'{data}\n'
+
+    try:
+        if first is not None:
+            yield line(first)
+            async for record in records:
+                yield line(record)
+    except Exception as e:
+        logging.error(f'Error in calc_stream: {str(e)}')
+        yield line({'error': str(e)})
+    finally:
+        await records.aclose()
+    if fmt == 'sse':
+        yield 'event: end\ndata: {}\n\n'
 
 
 @router.post("/calc_vfp/",
@@ -106,21 +208,202 @@ async def get_calc_vfp(
     table_params: TableParam,
     bound_dict: List[List[BoundDictAll]],
     deg: int = Query(4, gt=0),
+    pruned: bool = True,
+    warm_start: bool = False,
+    skip_infeasible: bool = False,
     serv: CompressorUnitServise = Depends(get_unit_service)
     ):
-    """Эндпойнт получения таблицы vfp\n"""
+    """Эндпойнт получения таблицы vfp\n
+    \twarm_start=true - начальное приближение из ячейки с меньшим расходом того же столбца;
+    \tskip_infeasible=true - ячейки столбца, начиная с недопустимой по производительности первой ступени, 
+    \tне рассчитываются"""
     
-    lst_param_all_gdh = []
-    for conf in conf_gdh:
-        lst = [await serv.get_gdh_by_unit_id(stage.id) for stage in conf.stage_list]
-        lst_param_all_gdh.append(lst)
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
     return await serv.calc_vfp(
         lst_param_all_gdh,
         [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
         table_params,
         bound_dict,
-        deg
+        deg,
+        pruned=pruned,
+        warm_start=warm_start,
+        skip_infeasible=skip_infeasible
+    )
+
+
+@router.post("/surrogate/build/",
+            name="surrogate_build",
+            operation_id = "surrogate_build",
+            )
+@handle_errors
+async def build_surrogate(
+    conf_gdh: List[Conf],
+    bound_dict: List[List[BoundDictAll]],
+    domain: SurrogateDomain,
+    deg: int = Query(4, gt=0),
+    pruned: bool = True,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт построения суррогатных моделей компоновок\n
+    \tУзлы сетки (q_rate, p_in, p_target) и центры ячеек рассчитываются точно; 
+    \tв ответе - ключ модели каждой компоновки и сводка оценки погрешности мощности"""
+
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
+    return await serv.build_surrogates(
+        lst_param_all_gdh,
+        [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
+        bound_dict,
+        deg,
+        domain,
+        pruned
+    )
+
+
+@router.get("/surrogate/{layout_key}/",
+            name="surrogate_detail",
+            operation_id = "surrogate_detail",
+            )
+@handle_errors
+async def get_surrogate(
+    layout_key: str,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт получения сетки и сводки погрешности суррогатной модели\n"""
+
+    surrogate = await serv.get_surrogate(layout_key)
+    return surrogate.summary()
+
+
+@router.post("/surrogate/{layout_key}/query/",
+            response_model = List[SurrogateResult],
+            name="surrogate_query",
+            operation_id = "surrogate_query",
+            )
+@handle_errors
+async def query_surrogate(
+    layout_key: str,
+    points: List[SurrogatePoint],
+    fallback: bool = False,
+    max_error: float = Query(0.01, gt=0),
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт расчета режимов по суррогатной модели\n
+    \terror - оценка относительной погрешности мощности по ячейке сетки;
+    \tfallback=true - точный расчет точек вне сетки, без ответа или с error > max_error"""
+
+    return await serv.query_surrogate(layout_key, points, fallback, max_error)
+
+
+@router.post("/jobs/calc/",
+            response_model = JobSubmit,
+            name="job_calc",
+            operation_id = "job_calc",
+            )
+@handle_errors
+async def submit_calc_job(
+    conf_gdh: List[Conf],
+    mode: List[ModeParamAll],
+    bound_dict: List[List[BoundDictAll]],
+    deg: int = Query(4, gt=0),
+    pruned: bool = True,
+    warm_start: bool = False,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт постановки фонового расчета режимов\n
+    \tПрогресс - количество рассчитанных режимов по всем компоновкам;
+    \twarm_start=true - теплый старт цепочкой по всем режимам, в том числе между частями расчета"""
+
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
+    job_id = await serv.submit_calc_job(
+        lst_param_all_gdh,
+        [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
+        mode,
+        bound_dict,
+        deg,
+        pruned,
+        warm_start
+    )
+    return {'job_id': job_id}
+
+
+@router.post("/jobs/calc_vfp/",
+            response_model = JobSubmit,
+            name="job_calc_vfp",
+            operation_id = "job_calc_vfp",
+            )
+@handle_errors
+async def submit_vfp_job(
+    conf_gdh: List[Conf],
+    table_params: TableParam,
+    bound_dict: List[List[BoundDictAll]],
+    deg: int = Query(4, gt=0),
+    pruned: bool = True,
+    warm_start: bool = False,
+    skip_infeasible: bool = False,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт постановки фонового расчета таблицы vfp\n
+    \tПрогресс - количество рассчитанных ячеек по всем компоновкам; warm_start, skip_infeasible - как в /calc_vfp/"""
+
+    lst_param_all_gdh = await serv.get_gdh_by_conf(conf_gdh)
+    job_id = await serv.submit_vfp_job(
+        lst_param_all_gdh,
+        [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
+        table_params,
+        bound_dict,
+        deg,
+        pruned,
+        warm_start,
+        skip_infeasible
     )
+    return {'job_id': job_id}
+
+
+@router.get("/jobs/{job_id}/",
+            response_model = JobStatus,
+            name="job_status",
+            operation_id = "job_status",
+            )
+@handle_errors
+async def get_job_status(
+    job_id: int,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт получения статуса и прогресса фонового расчета\n"""
+
+    return await serv.get_job(job_id)
+
+
+@router.post("/jobs/{job_id}/cancel/",
+            name="job_cancel",
+            operation_id = "job_cancel",
+            )
+@handle_errors
+async def cancel_job(
+    job_id: int,
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт отмены фонового расчета\n"""
+
+    return await serv.cancel_job(job_id)
+
+
+@router.get("/jobs/{job_id}/results/",
+            response_model = JobResultsPage,
+            name="job_results",
+            operation_id = "job_results",
+            )
+@handle_errors
+async def get_job_results(
+    job_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, gt=0, le=1000),
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт получения страницы результатов завершенного фонового расчета\n
+    \tcalc - запись на (компоновка, режим), calc_vfp - запись на таблицу"""
+
+    return await serv.get_job_results(job_id, offset, limit)
 
 
 @router.delete("/delete/",
@@ -223,6 +506,32 @@ async def get_gdh_by_id(
     return await serv.get_param_for_gdh(result)
 
 
+@router.get("/cache/gdh/",
+            operation_id = "gdh_cache",
+            name="gdh_cache"
+            )
+@handle_errors
+async def get_gdh_cache_stats(
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт получения метрик кэша аппроксимированных ГДХ\n"""
+
+    return await serv.get_gdh_cache_stats()
+
+
+@router.get("/cache/modes/",
+            operation_id = "mode_cache",
+            name="mode_cache"
+            )
+@handle_errors
+async def get_mode_cache_stats(
+    serv: CompressorUnitServise = Depends(get_unit_service)
+    ):
+    """Эндпойнт получения метрик кэша итоговых режимов /calc/\n"""
+
+    return await serv.get_mode_cache_stats()
+
+
 @router.get("/default_bound/",
             response_model = BoundDictAll,
             operation_id = "default_bound",
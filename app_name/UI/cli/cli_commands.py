@@ -195,9 +195,40 @@ def save_to_db(
     return result
 
 
+@cli_handle_errors
+def save_all_to_db(
+    dks_code: str = typer.Option(..., help="Код ДКС из базы данных"),
+    sheet_name: List[str] = typer.Option(None, help="Имена листов (по умолчанию: все листы книги)"),
+    deg: int = typer.Option(None, help="Степень полинома (по умолчанию: 4)"),
+    k_value: float = typer.Option(None, help="Коэффициент политропы (по умолчанию: 1.31)"),
+    press_conditional: float = typer.Option(None, help="Стандартная давление (по умолчанию: 0.101325)"),
+    temp_conditional: float = typer.Option(None, help="Стандартная температура (по умолчанию: 283)"),
+    file: Path = typer.Argument(..., help="Путь к файлу с оцифрованными СПЧ"),
+):
+    """Сохранить все листы книги СПЧ в базу данных одной транзакцией"""
+    
+    async def run():
+        async with cli_service_context() as servise:
+            return await servise.save_all_to_db(
+            dks_code, file, sheet_name or None, deg, k_value, press_conditional, temp_conditional
+        )
+
+    result = asyncio.run(run())
+
+    if result:
+        typer.echo(f"✅ Добавлено СПЧ в базу данных: {len(result)}", err=True)
+    else:
+        typer.echo(f"❌ Не удалось сохранить", err=True)
+        
+    return result
+
+
 @cli_handle_errors
 def calc_modes(
     deg: int = typer.Option(None, help="Степень полинома (по умолчанию: 4)"),
+    max_workers: int = typer.Option(None, min=1, help="Количество процессов расчета (по умолчанию: 1)"),
+    pruned: bool = typer.Option(True, "--pruned/--full-search", help="Поиск по уровням количества агрегатов или полный перебор"),
+    warm_start: bool = typer.Option(False, help="Начальное приближение из решения предыдущего режима"),
     conf_file: Path = typer.Argument(..., help="Путь к файлу компоновками"),
     modes_file: Path = typer.Argument(..., help="Путь к файлу с режимами (давления входа/выхода, расходы)"),
     bounds_file: Path = typer.Argument(..., help="Путь к файлу с граничными условиями"),
@@ -208,7 +239,7 @@ def calc_modes(
     async def run():
         async with cli_service_context() as servise:
             return await servise.calculate_modes(
-                conf_file, modes_file, bounds_file, deg
+                conf_file, modes_file, bounds_file, deg, max_workers, pruned, warm_start
             )
         
     result = asyncio.run(run())
@@ -225,6 +256,10 @@ def calc_modes(
 @cli_handle_errors
 def calc_vfp(
     deg: int = typer.Option(None, help="Степень полинома (по умолчанию: 4)"),
+    max_workers: int = typer.Option(None, min=1, help="Количество процессов расчета (по умолчанию: 1)"),
+    pruned: bool = typer.Option(True, "--pruned/--full-search", help="Поиск по уровням количества агрегатов или полный перебор"),
+    warm_start: bool = typer.Option(False, help="Начальное приближение из ячейки с меньшим расходом"),
+    skip_infeasible: bool = typer.Option(False, help="Не считать ячейки, недопустимые по производительности первой ступени"),
     conf_file: Path = typer.Argument(..., help="Путь к файлу компоновками"),
     table_params_file: Path = typer.Argument(..., help="Путь к файлу с режимами (давления выхода, расходы)"),
     bounds_file: Path = typer.Argument(..., help="Путь к файлу с граничными условиями"),
@@ -235,7 +270,7 @@ def calc_vfp(
     async def run():
         async with cli_service_context() as servise:
             return await servise.calculate_vfp(
-                conf_file, table_params_file, bounds_file, deg
+                conf_file, table_params_file, bounds_file, deg, max_workers, pruned, warm_start, skip_infeasible
             )
         
     result = asyncio.run(run())
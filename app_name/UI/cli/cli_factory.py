@@ -8,6 +8,7 @@ def create_cli_app():
     )
     app.command('upload_excel')(cli_commands.upload_excel)
     app.command('save_to_db')(cli_commands.save_to_db)
+    app.command('save_all_to_db')(cli_commands.save_all_to_db)
     app.command('calc_modes')(cli_commands.calc_modes)
     app.command('calc_vfp')(cli_commands.calc_vfp)
     app.command('get_gdh')(cli_commands.get_gdh)
@@ -72,26 +72,53 @@ class CLIService:
         return results
     
 
+    async def save_all_to_db(self,
+            dks_code: str,
+            file: Path,
+            sheet_names: List[str] = None,
+            deg: int = None,
+            k_value: float = None,
+            press_conditional: float = None,
+            temp_conditional: float = None,
+        ):
+
+        """Сохранение всех (или выбранных) листов книги в базу данных одной транзакцией"""
+
+        dct_df = await self.compressor_service.get_df_by_xlsx(
+                                                file,
+                                                deg,
+                                                k_value,
+                                                press_conditional,
+                                                temp_conditional)
+        results = await self.compressor_service.create_units(dct_df, 
+                                  dks_code,
+                                  sheet_names)
+        return results
+    
+
     async def calculate_modes(self,
             conf_gdh: List[Conf],
             mode: List[ModeParamAll],
             bound_dict: List[List[BoundDictAll]],
-            deg: int = None
+            deg: int = None,
+            max_workers: int = None,
+            pruned: bool = True,
+            warm_start: bool = False
         ) -> List[pd.DataFrame]:
         
         """Расчет прогнозных режимов ДКС"""
 
-        lst_param_all_gdh = []
-        for conf in conf_gdh:
-            lst = [await self.compressor_service.get_gdh_by_unit_id(stage.id) for stage in conf.stage_list]
-            lst_param_all_gdh.append(lst)
+        lst_param_all_gdh = await self.compressor_service.get_gdh_by_conf(conf_gdh)
 
         result = await self.compressor_service.calc_of_modes(
             lst_param_all_gdh,
             [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
             mode,
             bound_dict,
-            deg
+            deg,
+            max_workers=max_workers,
+            pruned=pruned,
+            warm_start=warm_start
         )
         return result
 
@@ -100,22 +127,27 @@ class CLIService:
             conf_gdh: List[Conf],
             table_params: TableParam,
             bound_dict: List[List[BoundDictAll]],
-            deg: int = None
+            deg: int = None,
+            max_workers: int = None,
+            pruned: bool = True,
+            warm_start: bool = False,
+            skip_infeasible: bool = False
         ) -> List[pd.DataFrame]:
         
         """Расчет таблицы VFP"""
 
-        lst_param_all_gdh = []
-        for conf in conf_gdh:
-            lst = [await self.compressor_service.get_gdh_by_unit_id(stage.id) for stage in conf.stage_list]
-            lst_param_all_gdh.append(lst)
+        lst_param_all_gdh = await self.compressor_service.get_gdh_by_conf(conf_gdh)
 
         result = await self.compressor_service.calc_vfp(
             lst_param_all_gdh,
             [[stage.count_GPA for stage in conf.stage_list] for conf in conf_gdh],
             table_params,
             bound_dict,
-            deg
+            deg,
+            max_workers=max_workers,
+            pruned=pruned,
+            warm_start=warm_start,
+            skip_infeasible=skip_infeasible
         )
         return result
     
@@ -0,0 +1,222 @@
+"""Пул процессов для расчетов (SLSQP) вне цикла событий FastAPI"""
+import asyncio
+import configparser
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from app_name.infrastructure.repositories.compressor.database import SETTING_PATH
+
+DEFAULT_EXECUTOR_SETTINGS = {
+    'max_workers': '2',
+    'max_queue': '8',
+    'timeout': '600',
+    'calc_workers': '1',
+}
+
+
+class CalcQueueFull(Exception):
+    """Очередь расчетов заполнена"""
+
+
+class CalcTimeout(Exception):
+    """Расчет не завершился за отведенное время"""
+
+
+def _stream_worker(items:queue.Queue, stop, func, args):
+    """Выполнение генератора func(*args) в процессе пула с передачей элементов через очередь"""
+    try:
+        for item in func(*args):
+            if stop.is_set():
+                break
+            items.put(('item', item))
+        items.put(('done', None))
+    except Exception as e:
+        items.put(('error', e))
+
+
+class CalcExecutor:
+    """Ограниченный пул процессов для расчетов
+
+    Одновременно принимается не более max_queue расчетов (выполняемые и ожидающие процесса),
+    остальные сразу отклоняются CalcQueueFull. Ожидание результата ограничено timeout, с.
+    Расчет в процессе нельзя прервать, поэтому по таймауту процессы пула завершаются,
+    новые расчеты направляются в новый пул. Число процессов не превышает max_workers.
+    calc_workers - количество процессов get_all_comp внутри одного расчета (max_workers
+    calc_modes_parall, calc_table_vfp_param); при calc_workers > 1 процессы пула запускают свои.
+    """
+    def __init__(self, max_workers:int=2, max_queue:int=8, timeout:float=600, calc_workers:int=1) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.calc_workers = calc_workers
+        self._pool:ProcessPoolExecutor = None
+        self._manager = None
+        self._pending = 0
+
+
+    @classmethod
+    def from_settings(cls, setting_path:str=SETTING_PATH) -> 'CalcExecutor':
+        """Параметры из секции [executor] setting.ini и переменных DKS_EXECUTOR_<KEY>"""
+        config = configparser.ConfigParser()
+        config.read_dict({'executor': DEFAULT_EXECUTOR_SETTINGS})
+        config.read(setting_path, encoding='utf-8')
+        section = config['executor']
+        for key in DEFAULT_EXECUTOR_SETTINGS:
+            env_value = os.environ.get(f'DKS_EXECUTOR_{key.upper()}')
+            if env_value is not None:
+                section[key] = env_value
+        return cls(section.getint('max_workers'), section.getint('max_queue'), section.getfloat('timeout'),
+                   section.getint('calc_workers'))
+
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+
+    async def run(self, func, *args, timeout:float=None, **kwargs):
+        """Выполнение func(*args, **kwargs) в процессе пула
+        Args:
+            func (Callable): Функция уровня модуля (передается в процесс через pickle)
+            timeout (float, optional): Время ожидания, с {default = self.timeout}
+        Raises:
+            CalcQueueFull: Уже принято max_queue расчетов
+            CalcTimeout: Расчет не завершился за timeout
+        """
+        if self._pending >= self.max_queue:
+            raise CalcQueueFull(f'Очередь расчетов заполнена ({self.max_queue}), повторите запрос позже')
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        release = True
+        try:
+            while True:
+                pool = self._get_pool()
+                future = pool.submit(partial(func, *args, **kwargs))
+                wrapped = asyncio.wrap_future(future)
+                try:
+                    done, _ = await asyncio.wait({wrapped}, timeout=max(deadline - loop.time(), 0))
+                except asyncio.CancelledError:
+                    #запущенный расчет дорабатывает и занимает место в очереди до завершения
+                    if not future.cancel():
+                        release = False
+                        wrapped.add_done_callback(lambda _: self._release())
+                    raise
+                if not done:
+                    if not future.cancel():
+                        self._terminate(pool)
+                    raise CalcTimeout(f'Расчет не завершился за {timeout} с')
+                if future.cancelled() or isinstance(future.exception(), BrokenProcessPool):
+                    if pool is not self._pool and loop.time() < deadline:
+                        #пул завершен по таймауту другого расчета - повтор в новом пуле
+                        continue
+                    self._terminate(pool)
+                return future.result()
+        finally:
+            if release:
+                self._release()
+
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+
+    async def stream(self, func, *args, timeout:float=None, poll:float=0.5):
+        """Выполнение генератора func(*args) в процессе пула с выдачей элементов по мере готовности
+
+        Элементы передаются через очередь multiprocessing.Manager. При закрытии потока
+        (отключение клиента), ошибке или таймауте генератор останавливается перед следующим элементом;
+        если он не остановился за poll (завис в элементе), процессы пула завершаются, как в run.
+        Место в очереди освобождается после завершения расчета в процессе.
+        Args:
+            func (Callable): Генераторная функция уровня модуля
+            timeout (float, optional): Время расчета целиком, с {default = self.timeout}
+            poll (float, optional): Период проверки таймаута при ожидании элемента, с {default = 0.5}
+        Raises:
+            CalcQueueFull: Уже принято max_queue расчетов
+            CalcTimeout: Генератор не завершился за timeout
+        """
+        if self._pending >= self.max_queue:
+            raise CalcQueueFull(f'Очередь расчетов заполнена ({self.max_queue}), повторите запрос позже')
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        manager = self._get_manager()
+        items, stop = manager.Queue(), manager.Event()
+        pool = self._get_pool()
+        future = pool.submit(_stream_worker, items, stop, func, args)
+        wrapped = asyncio.wrap_future(future)
+        try:
+            while True:
+                if loop.time() > deadline:
+                    raise CalcTimeout(f'Расчет не завершился за {timeout} с')
+                try:
+                    kind, value = await loop.run_in_executor(None, partial(items.get, timeout=poll))
+                except queue.Empty:
+                    if future.cancelled():
+                        raise BrokenProcessPool('Пул расчетов перезапущен')
+                    if future.done():
+                        future.result()
+                    continue
+                if kind == 'item':
+                    yield value
+                elif kind == 'error':
+                    raise value
+                else:
+                    break
+            await wrapped
+        finally:
+            stop.set()
+            if not future.done() and not future.cancel():
+                done, _ = await asyncio.wait({wrapped}, timeout=poll)
+                if not done:
+                    self._terminate(pool)
+            self._release()
+
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+        return self._manager
+
+
+    def _terminate(self, pool:ProcessPoolExecutor) -> None:
+        """Замена пула с завершением его процессов
+
+        Зависший расчет иначе продолжает занимать процесс, а каждый таймаут добавлял бы новый пул.
+        Расчеты, прерванные вместе с пулом, run повторяет в новом пуле в пределах своего timeout.
+        """
+        if self._pool is pool:
+            self._pool = None
+        terminate_workers = getattr(pool, 'terminate_workers', None)
+        if terminate_workers is not None:
+            terminate_workers()
+            return
+        #до Python 3.14 у ProcessPoolExecutor нет публичного способа завершить процессы
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+CALC_EXECUTOR = CalcExecutor.from_settings()
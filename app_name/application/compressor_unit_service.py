@@ -1,14 +1,105 @@
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from app_name.UI.api.schemas.schemas import *
 from app_name.infrastructure.repositories.compressor.unit_repository import CompressorUnitRepository
+import time
+import numpy as np
+from contextlib import aclosing
 from io import BytesIO
 from app_name.DKS_math.shared.shared_gdh import BaseGDH, get_df_by_excel, get_param
-from app_name.DKS_math.shared.shared_calc import calc_vfp, calc_of_modes
+from app_name.DKS_math.shared.shared_calc import (calc_vfp, calc_of_modes, create_conf, get_known_cells, 
+                                                  stream_calc_of_modes, build_surrogate, query_surrogate)
+from app_name.DKS_math.DKS import ConfGDHSolver, ModeQuantizer
+from app_name.DKS_math.DKS_vfp import ConfGDHSolverVfp, get_vfp_mode_params
+from app_name.DKS_math.mode import Mode
+from app_name.infrastructure.adapters.result_store import ModeResultCache, SurrogateStore, VfpCellStore
+from app_name.DKS_math.gdhInstance import GDH_CACHE
+from app_name.application.calc_executor import CalcExecutor
+from app_name.application.job_service import JOB_MANAGER, JobNotFound, JobNotFinished
+from app_name.infrastructure.repositories.compressor.job_repository import CalcJobRepository
+
+VFP_STORE_PATH = 'vfp_cells.db'
+VFP_STORE_MAX_ENTRIES = 100000
+MODE_CACHE_PATH = 'mode_results.db'
+MODE_CACHE_MAX_ENTRIES = 100000
+SURROGATE_STORE_PATH = 'surrogates.db'
+SURROGATE_STORE_MAX_LOADED = 32
+EXTRA_PARAMS = ['k_value', 't_in', 'r_value', 'press_conditonal', 'temp_conditonal']
+BOUND_PARAMS = ['p_out_diff', 'freq_dimm', 'power', 'comp', 'udal']
+
+
+class SurrogateNotFound(Exception):
+    """Суррогатная модель с указанным ключом не найдена"""
+
+
+class SurrogateGridTooLarge(Exception):
+    """Узлов сетки суррогатных моделей в запросе больше SURROGATE_MAX_NODES"""
+
+
+class BoundMetaCache:
+    """Кэш метаданных граничных условий (UOM и размерности) со временем жизни ttl, с"""
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._value = None
+        self._expires = 0.
+
+
+    def get(self):
+        if self._value is not None and time.monotonic() < self._expires:
+            return self._value
+        return None
+
+
+    def set(self, value):
+        self._value = value
+        self._expires = time.monotonic() + self.ttl
+
+
+    def invalidate(self):
+        self._value = None
+
+
+BOUND_META_CACHE = BoundMetaCache()
+_vfp_store: VfpCellStore = None
+
+
+def get_vfp_store() -> VfpCellStore:
+    """Хранилище ячеек VFP (создается при первом обращении, общее для запросов и фоновых расчетов)"""
+    global _vfp_store
+    if _vfp_store is None:
+        _vfp_store = VfpCellStore(VFP_STORE_PATH, VFP_STORE_MAX_ENTRIES)
+    return _vfp_store
+
+
+_mode_cache: ModeResultCache = None
+
+
+def get_mode_cache() -> ModeResultCache:
+    """Кэш режимов /calc/ (создается при первом обращении, счетчики попаданий общие для запросов)"""
+    global _mode_cache
+    if _mode_cache is None:
+        _mode_cache = ModeResultCache(MODE_CACHE_PATH, MODE_CACHE_MAX_ENTRIES)
+    return _mode_cache
+
+
+_surrogate_store: SurrogateStore = None
+
+
+def get_surrogate_store() -> SurrogateStore:
+    """Хранилище суррогатных моделей (создается при первом обращении, загруженные модели - в памяти)"""
+    global _surrogate_store
+    if _surrogate_store is None:
+        _surrogate_store = SurrogateStore(SURROGATE_STORE_PATH, SURROGATE_STORE_MAX_LOADED)
+    return _surrogate_store
 
 
 class CompressorUnitServise(CompressorUnitRepository):
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, executor: CalcExecutor = None):
         self.repository = CompressorUnitRepository(session)
+        self.job_repository = CalcJobRepository(session)
+        self.executor = executor
+        #процессов get_all_comp на расчет: [executor] calc_workers, без пула - последовательно
+        self.calc_workers = executor.calc_workers if executor is not None else 1
 
 
     async def get_gdh_by_unit_id(self, id: int):
@@ -16,6 +107,14 @@ class CompressorUnitServise(CompressorUnitRepository):
         return result
     
 
+    async def get_gdh_by_conf(self, conf_gdh: List[Conf]):
+        """ГДХ ступеней всех компоновок: уникальные id загружаются одним запросом"""
+        result = await self.repository.read_data_by_ids(
+            stage.id for conf in conf_gdh for stage in conf.stage_list
+        )
+        return [[result.get(stage.id, []) for stage in conf.stage_list] for conf in conf_gdh]
+
+
     async def get_param_for_gdh(self, result):
         param = BaseGDH.read_dict(result[0]) 
         res = param.get_param()    
@@ -55,7 +154,7 @@ class CompressorUnitServise(CompressorUnitRepository):
                             }
                             for i in range(len(df['k_nap']))
                             ]
-        return await self.repository.create_compressor_unit(
+        unit = await self.repository.create_compressor_unit(
                         sheet_name=sheet_name,
                         dks_code=dks_code,
                         pressure_out=df['p_title'][0],
@@ -68,6 +167,51 @@ class CompressorUnitServise(CompressorUnitRepository):
                         diam=df['diam'][0],
                         perfomance_curves=perfomance_curves
                     )
+        GDH_CACHE.invalidate(unit.id)
+        await asyncio.to_thread(get_mode_cache().invalidate_units, [unit.id])
+        await asyncio.to_thread(get_surrogate_store().invalidate_units, [unit.id])
+        return unit
+
+
+    async def create_units(self, dct_df, dks_code, sheet_names=None):
+        """Сохранение листов книги (по умолчанию всех) одной транзакцией"""
+        sheet_names = list(dct_df) if sheet_names is None else sheet_names
+        units = []
+        for sheet_name in sheet_names:
+            df = dct_df[sheet_name]
+            units.append({
+                'sheet_name': sheet_name,
+                'pressure_out': float(df['p_title'][0]),
+                'comp_ratio': float(df['stepen'][0]),
+                'freq_nominal': float(df['fnom'][0]),
+                'power': float(df['mgth'][0]),
+                'k_value': float(df['k'][0]),
+                'r_value': float(df['R'][0]),
+                't_in': float(df['temp'][0]),
+                'diam': float(df['diam'][0]),
+                'perfomance_curves': [
+                            {
+                            'k_nap' : float(k_nap),
+                            'k_rash' : float(k_rash),
+                            'kpd' : float(kpd),
+                            }
+                            for k_nap, k_rash, kpd in zip(df['k_nap'], df['k_rash'], df['kpd'])
+                            ]
+            })
+        unit_ids = await self.repository.create_compressor_units_bulk(dks_code, units)
+        for unit_id in unit_ids:
+            GDH_CACHE.invalidate(unit_id)
+        await asyncio.to_thread(get_mode_cache().invalidate_units, unit_ids)
+        await asyncio.to_thread(get_surrogate_store().invalidate_units, unit_ids)
+        return dict(zip(sheet_names, unit_ids))
+
+
+    async def get_gdh_cache_stats(self):
+        return GDH_CACHE.stats()
+
+
+    async def get_mode_cache_stats(self):
+        return await asyncio.to_thread(get_mode_cache().stats)
 
 
     async def get_param(self, dct_df):
@@ -75,16 +219,18 @@ class CompressorUnitServise(CompressorUnitRepository):
         return curves
     
 
+    async def get_bound_meta(self):
+        """Наименования и размерности параметров граничных условий (из кэша BOUND_META_CACHE)"""
+        meta = BOUND_META_CACHE.get()
+        if meta is None:
+            meta = await self.repository.read_uom_with_dimen(EXTRA_PARAMS + BOUND_PARAMS)
+            BOUND_META_CACHE.set(meta)
+        return meta
+
+
     async def get_extra_param(self):
-        result = await self.repository.uom_repo.get_data()
+        meta = await self.get_bound_meta()
         output = {}
-        all_param = [
-                'k_value',                
-                't_in', 
-                'r_value', 
-                'press_conditonal', 
-                'temp_conditonal'
-                ]
         values = {
             'k_value': {"value": 1.31},
             't_in': {"value": 288},
@@ -92,14 +238,11 @@ class CompressorUnitServise(CompressorUnitRepository):
             'press_conditonal': {"value": 0.101325},
             'temp_conditonal': {"value": 283},
         }
-        for param in all_param:
-            item = next((x for x in result if x.uom_code == param), None)
-            dimen = await self.repository.read_data_by_id_uom(item.dimen_id)
+        for param in EXTRA_PARAMS:
+            item = meta.get(param)
             if item is not None:
                 output[param] = {
-                        "name": item.name,
-                        "short_name": item.short_name,
-                        "dimen": dimen,
+                        **item,
                         "disable": False,
                         "value": values[param]['value']
                     }
@@ -107,24 +250,13 @@ class CompressorUnitServise(CompressorUnitRepository):
     
 
     async def read_data_uom(self):
-        result = await self.repository.uom_repo.get_data()
+        meta = await self.get_bound_meta()
         output = {}
-        all_param = [
-                'p_out_diff',
-                'freq_dimm',                
-                'power', 
-                'comp', 
-                'udal', 
-                ]
-        
-        for param in all_param:
-            item = next((x for x in result if x.uom_code == param), None)
-            dimen = await self.repository.read_data_by_id_uom(item.dimen_id)
+        for param in BOUND_PARAMS:
+            item = meta.get(param)
             if item is not None:
                 output[param] = {
-                        "name": item.name,
-                        "short_name": item.short_name,
-                        "dimen": dimen,
+                        **item,
                         "disable": False,
                         "min_value": DefaultBoundValues.get_defaults(param)['min_value'],
                         "max_value": DefaultBoundValues.get_defaults(param)['max_value'],
@@ -139,34 +271,182 @@ class CompressorUnitServise(CompressorUnitRepository):
                             lst_cnt,
                             mode,
                             bound_dict,
-                            deg):
+                            deg,
+                            quantizer: ModeQuantizer = None,
+                            max_workers: int = None,
+                            pruned: bool = True,
+                            warm_start: bool = False):
         result = await calc_of_modes(
                             lst_params,
                             lst_cnt,
                             mode,
                             bound_dict,
-                            deg
+                            deg,
+                            max_workers=max_workers or self.calc_workers,
+                            pruned=pruned,
+                            warm_start=warm_start,
+                            executor=self.executor,
+                            cache=get_mode_cache(),
+                            quantizer=quantizer
                             )
         return [res.to_dict('list') for res in result]
 
     
 
+    async def stream_calc_of_modes(self, 
+                            lst_params,
+                            lst_cnt,
+                            mode,
+                            bound_dict,
+                            deg,
+                            pruned: bool = True,
+                            warm_start: bool = False):
+        """Записи {'layout', 'mode', 'result'}; result - столбцы схемы Calc, как в calc_of_modes"""
+        async with aclosing(stream_calc_of_modes(
+                            lst_params,
+                            lst_cnt,
+                            mode,
+                            bound_dict,
+                            deg,
+                            pruned=pruned,
+                            warm_start=warm_start,
+                            executor=self.executor
+                            )) as records:
+            async for record in records:
+                if record['result'] is not None:
+                    record['result'] = Calc(**record['result']).dict()
+                yield record
+    
+
     async def calc_vfp(self, 
                         lst_params,
                         lst_cnt,
                         table_params,
                         bound_dict,
-                        deg):
+                        deg,
+                        max_workers: int = None,
+                        pruned: bool = True,
+                        warm_start: bool = False,
+                        skip_infeasible: bool = False):
         result = await calc_vfp(
                             lst_params,
                             lst_cnt,
                             table_params,
                             bound_dict,
-                            deg
+                            deg,
+                            max_workers=max_workers or self.calc_workers,
+                            pruned=pruned,
+                            warm_start=warm_start,
+                            skip_infeasible=skip_infeasible,
+                            store=get_vfp_store(),
+                            executor=self.executor
                             )
         return result
     
 
+    async def build_surrogates(self, 
+                            lst_params,
+                            lst_cnt,
+                            bound_dict,
+                            deg,
+                            domain: SurrogateDomain,
+                            pruned: bool = True):
+        """Суррогатная модель для каждой компоновки; параметры Mode - экстра параметры первой ступени
+        
+        Компоновки строятся последовательно в пуле executor, поэтому узлов сетки на запрос 
+        (по всем компоновкам) не более SURROGATE_MAX_NODES.
+        """
+        n_nodes = domain.n_nodes * len(lst_params)
+        if n_nodes > SURROGATE_MAX_NODES:
+            raise SurrogateGridTooLarge(f'Узлов сетки по всем компоновкам {n_nodes}, допустимо не более {SURROGATE_MAX_NODES}')
+        axes = [
+            np.linspace(axis.min_value, axis.max_value, axis.n_points).tolist() 
+        for axis in (domain.q_rate, domain.p_in, domain.p_target)]
+        store = get_surrogate_store()
+        output = []
+        for lst_params_comp, lst_comp, bounds in zip(lst_params, lst_cnt, bound_dict):
+            mode_params = get_vfp_mode_params([bounds])
+            surrogate = await build_surrogate(lst_params_comp, lst_comp, bounds, deg, axes, mode_params,
+                                              max_workers=self.calc_workers, pruned=pruned, executor=self.executor)
+            units = [params[0] for params in lst_params_comp]
+            layout_key = store.layout_key(units, lst_comp, bounds, mode_params, deg)
+            await asyncio.to_thread(store.put, layout_key, surrogate, [unit.id for unit in units])
+            output.append({'layout_key': layout_key, **surrogate.summary()})
+        return output
+    
+
+    async def get_surrogate(self, layout_key: str):
+        store = get_surrogate_store()
+        #загрузка из sqlite (распаковка модели с решателем) - в потоке, вне цикла событий
+        surrogate = store.get_loaded(layout_key) or await asyncio.to_thread(store.get, layout_key)
+        if surrogate is None:
+            raise SurrogateNotFound(f'Суррогатная модель {layout_key} не найдена')
+        return surrogate
+    
+
+    async def query_surrogate(self, layout_key: str, points: List[SurrogatePoint], fallback: bool, max_error: float):
+        surrogate = await self.get_surrogate(layout_key)
+        return await query_surrogate(surrogate, [point.dict() for point in points], fallback, max_error, 
+                                     executor=self.executor)
+    
+
+    async def submit_calc_job(self, 
+                            lst_params,
+                            lst_cnt,
+                            mode,
+                            bound_dict,
+                            deg,
+                            pruned: bool = True,
+                            warm_start: bool = False):
+        conf_solv_obj = create_conf(ConfGDHSolver, lst_params, lst_cnt, bound_dict, deg)
+        modes = [Mode(**item.dict()) for item in mode]
+        return await JOB_MANAGER.submit_calc(conf_solv_obj, modes, pruned, warm_start)
+    
+
+    async def submit_vfp_job(self, 
+                            lst_params,
+                            lst_cnt,
+                            table_params,
+                            bound_dict,
+                            deg,
+                            pruned: bool = True,
+                            warm_start: bool = False,
+                            skip_infeasible: bool = False):
+        conf_solv_obj = create_conf(ConfGDHSolverVfp, lst_params, lst_cnt, bound_dict, deg)
+        store = get_vfp_store()
+        known, layout_keys = await asyncio.to_thread(get_known_cells, store, lst_params, lst_cnt, table_params, 
+                                                     bound_dict, deg)
+        return await JOB_MANAGER.submit_vfp(conf_solv_obj, table_params, bound_dict, pruned, warm_start, 
+                                            skip_infeasible, store=store, known=known, layout_keys=layout_keys)
+    
+
+    async def get_job(self, job_id: int):
+        job = await self.job_repository.get_job(job_id)
+        if job is None:
+            raise JobNotFound(f'Расчет {job_id} не найден')
+        return job
+    
+
+    async def cancel_job(self, job_id: int):
+        job = await self.get_job(job_id)
+        cancelled = await JOB_MANAGER.cancel(job_id)
+        return {'job_id': job.id, 'cancelled': cancelled}
+    
+
+    async def get_job_results(self, job_id: int, offset: int, limit: int):
+        job = await self.get_job(job_id)
+        if job.status != 'done':
+            raise JobNotFinished(f'Расчет {job_id} не завершен (статус {job.status})')
+        items, total = await self.job_repository.get_results(job_id, offset, limit)
+        return {
+            'job_id': job_id,
+            'offset': offset,
+            'limit': limit,
+            'total': total,
+            'items': items
+        }
+    
+
 class DefaultBoundValues:
     DEFAULT = { 
         "p_out_diff": 
@@ -0,0 +1,166 @@
+"""Фоновые расчеты /calc/ и /calc_vfp/ с прогрессом, отменой и постраничной выдачей результата"""
+import asyncio
+import logging
+from itertools import product
+from typing import Dict, List
+from app_name.DKS_math.DKS import ConfGDHSolver, calc_modes_parall, calc_modes_warm
+from app_name.DKS_math.DKS_vfp import ConfGDHSolverVfp, get_vfp_mode_params
+from app_name.DKS_math.mode import Mode
+from app_name.DKS_math.shared.shared_calc import frame_to_record, put_new_cells, sync_calc_vfp
+from app_name.application.calc_executor import CALC_EXECUTOR, CalcExecutor, CalcQueueFull
+from app_name.infrastructure.adapters.result_store import VfpCellStore
+from app_name.infrastructure.repositories.compressor.database import async_session_maker
+from app_name.infrastructure.repositories.compressor.job_repository import CalcJobRepository
+
+QUEUE_RETRY_DELAY = 1.
+
+
+class JobNotFound(Exception):
+    """Расчет с указанным id не найден"""
+
+
+class JobNotFinished(Exception):
+    """Результаты запрошены до завершения расчета"""
+
+
+class CalcJobManager:
+    """Запуск фоновых расчетов частями в пуле CalcExecutor
+
+    Расчет режимов делится на части по chunk_size режимов (с теплым стартом решения последнего
+    режима части передаются следующей), расчет VFP - на столбцы (давление на выходе). После каждой части обновляется прогресс, между частями
+    проверяется отмена. Статус и результаты хранятся в таблицах CALC_JOB, CALC_JOB_RESULT.
+    """
+    def __init__(self, session_maker=async_session_maker, executor: CalcExecutor = CALC_EXECUTOR,
+                 chunk_size: int = 16):
+        self.session_maker = session_maker
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+
+    async def recover(self) -> int:
+        """Незавершенные при остановке сервиса расчеты помечаются failed"""
+        async with self.session_maker() as session:
+            return await CalcJobRepository(session).mark_interrupted()
+
+
+    async def submit_calc(self, conf_solv_obj: ConfGDHSolver, modes: List[Mode],
+                          pruned=False, warm_start=False) -> int:
+        total = len(modes) * (1 + len(conf_solv_obj.add_solvers))
+        job_id = await self._create_job('calc', total)
+        self._start(job_id, self._run_calc(job_id, conf_solv_obj, modes, pruned, warm_start))
+        return job_id
+
+
+    async def submit_vfp(self, conf_solv_obj: ConfGDHSolverVfp, table_params, bound_dict,
+                         pruned=False, warm_start=False, skip_infeasible=False,
+                         store: VfpCellStore = None, known=None, layout_keys=None) -> int:
+        n_layouts = 1 + len(conf_solv_obj.add_solvers)
+        total = len(table_params.q_rate) * len(table_params.p_out) * n_layouts
+        job_id = await self._create_job('calc_vfp', total)
+        self._start(job_id, self._run_vfp(job_id, conf_solv_obj, table_params, bound_dict, pruned, warm_start,
+                                          skip_infeasible, store, known, layout_keys))
+        return job_id
+
+
+    async def cancel(self, job_id: int) -> bool:
+        """Отмена расчета; запущенная в процессе пула часть дорабатывает, но ее результат не сохраняется"""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+
+    async def _create_job(self, kind: str, total: int) -> int:
+        async with self.session_maker() as session:
+            return await CalcJobRepository(session).create_job(kind, total)
+
+
+    def _start(self, job_id: int, coro):
+        task = asyncio.create_task(self._run_job(job_id, coro))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+
+    async def _run_job(self, job_id: int, coro):
+        async with self.session_maker() as session:
+            repo = CalcJobRepository(session)
+            try:
+                await repo.set_status(job_id, 'running')
+                await coro(repo)
+                await repo.set_status(job_id, 'done')
+            except asyncio.CancelledError:
+                await repo.set_status(job_id, 'cancelled')
+            except Exception as e:
+                logging.error(f'Error in job {job_id}: {str(e)}')
+                await repo.set_status(job_id, 'failed', str(e))
+
+
+    async def _execute(self, func, *args):
+        """Выполнение части в пуле; при заполненной очереди - ожидание места"""
+        while True:
+            try:
+                return await self.executor.run(func, *args)
+            except CalcQueueFull:
+                await asyncio.sleep(QUEUE_RETRY_DELAY)
+
+
+    def _run_calc(self, job_id, conf_solv_obj, modes, pruned, warm_start):
+        async def run(repo: CalcJobRepository):
+            n_layouts = 1 + len(conf_solv_obj.add_solvers)
+            done = 0
+            warm_starts = None
+            for start in range(0, len(modes), self.chunk_size):
+                chunk = modes[start:start + self.chunk_size]
+                if warm_start:
+                    results, warm_starts = await self._execute(calc_modes_warm, conf_solv_obj, chunk, 
+                                                               self.executor.calc_workers, pruned, warm_starts)
+                else:
+                    results = await self._execute(calc_modes_parall, conf_solv_obj, chunk, self.executor.calc_workers, 
+                                                  pruned)
+                await repo.add_results(job_id, [
+                    {'layout': layout, 'mode': start + ind, 'result': frame_to_record(df)}
+                for layout in range(n_layouts)
+                    for ind, df in enumerate(results[layout])], start=start * n_layouts)
+                done += len(chunk) * n_layouts
+                await repo.set_progress(job_id, done)
+        return run
+
+
+    def _run_vfp(self, job_id, conf_solv_obj, table_params, bound_dict, pruned, warm_start, skip_infeasible,
+                 store, known, layout_keys):
+        async def run(repo: CalcJobRepository):
+            n_layouts = 1 + len(conf_solv_obj.add_solvers)
+            mode_params = get_vfp_mode_params(bound_dict)
+            cells = {ind: dict(known.get(ind, {})) if known else {} for ind in range(n_layouts)}
+            done = sum(len(layout_cells) for layout_cells in cells.values())
+            await repo.set_progress(job_id, done)
+            for p_target in table_params.p_out:
+                q_missing = [
+                    q_rate for q_rate in table_params.q_rate
+                if any((q_rate, p_target) not in cells[ind] for ind in range(n_layouts))]
+                if not q_missing:
+                    continue
+                column_known = {
+                    ind: {cell: res for cell, res in cells[ind].items() if cell[1] == p_target} 
+                for ind in range(n_layouts)}
+                results = await self._execute(conf_solv_obj.get_all_comp_grid, q_missing, [p_target], mode_params,
+                                              self.executor.calc_workers, pruned, warm_start, skip_infeasible, 
+                                              column_known)
+                for ind in range(n_layouts):
+                    cells[ind].update(zip(product(q_missing, [p_target]), results[ind]))
+                done = sum(len(layout_cells) for layout_cells in cells.values())
+                await repo.set_progress(job_id, done)
+
+            results, dct = await self._execute(sync_calc_vfp, conf_solv_obj, table_params, bound_dict, 
+                                               self.executor.calc_workers, pruned, warm_start, skip_infeasible, 
+                                               cells)
+            await asyncio.to_thread(put_new_cells, store, layout_keys, known, results, table_params)
+            await repo.add_results(job_id, [
+                {'table': name, 'data': value}
+            for name, value in dct.items()])
+        return run
+
+
+JOB_MANAGER = CalcJobManager()
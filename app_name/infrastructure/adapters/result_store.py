@@ -0,0 +1,350 @@
+"""Хранилища рассчитанных ячеек таблиц VFP, режимов /calc/ и суррогатных моделей компоновок"""
+import hashlib
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from itertools import product
+from typing import Dict, List, Sequence, Tuple
+import pandas as pd
+from app_name.infrastructure.repositories.compressor.models.models_gdh import EqCompressorUnit
+
+#параметров в запросе ... IN (...) (ограничение sqlite - 999 параметров на запрос)
+QUERY_BATCH_SIZE = 500
+
+
+def _batches(items:Sequence, size:int=QUERY_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def unit_checksum(unit:EqCompressorUnit) -> str:
+    """Контрольная сумма ГДХ: параметры агрегата, номиналы и точки безразмерной характеристики"""
+    comp_type = unit.eq_compressor_type
+    data = [
+        unit.id, unit.k_value, unit.r_value, unit.t_in, unit.diam,
+        comp_type.eq_compressor_type_freq_nominal.value,
+        comp_type.eq_compressor_type_pressure_out.value,
+        comp_type.eq_compressor_type_comp_ratio.value,
+        comp_type.eq_compressor_type_power.value,
+        [(curve.non_dim_rate, curve.head, curve.kpd) for curve in unit.eq_compressor_perfomance_curve]
+    ]
+    return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
+
+class VfpCellStore:
+    """Ячейки таблиц VFP в sqlite с вытеснением давно не использованных (LRU)
+
+    Ключ компоновки - хэш (ГДХ ступеней с контрольными суммами, количества агрегатов,
+    граничные условия, параметры Mode, степень полинома), ячейка - (q_rate, p_target).
+    Хранятся и допустимые режимы, и отсутствие решения (None), не более max_entries ячеек.
+    """
+    def __init__(self, path:str='vfp_cells.db', max_entries:int=100000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS vfp_cell ('
+                'layout_key TEXT NOT NULL, q_rate REAL NOT NULL, p_target REAL NOT NULL, result BLOB, '
+                'accessed REAL NOT NULL DEFAULT 0, PRIMARY KEY (layout_key, q_rate, p_target))'
+            )
+            #хранилища, созданные до вытеснения, - без столбца accessed
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(vfp_cell)')]
+            if 'accessed' not in columns:
+                conn.execute('ALTER TABLE vfp_cell ADD COLUMN accessed REAL NOT NULL DEFAULT 0')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_vfp_cell_accessed ON vfp_cell (accessed)')
+
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+
+    @staticmethod
+    def layout_key(units:Sequence[EqCompressorUnit], counts:Sequence[int], bound_dict:Sequence,
+                   mode_params:Dict[str, float], deg:int) -> str:
+        """Ключ компоновки
+        Args:
+            units (Sequence[EqCompressorUnit]): ГДХ ступеней
+            counts (Sequence[int]): Количество агрегатов по ступеням
+            bound_dict (Sequence[BoundDictAll]): Граничные условия по ступеням
+            mode_params (Dict[str, float]): Параметры Mode (t_in, r_value, k_value, ...)
+            deg (int): Степень полинома ГДХ
+        Returns:
+            str: sha1 канонического json
+        """
+        data = {
+            'units': [unit_checksum(unit) for unit in units],
+            'counts': list(counts),
+            'bounds': [bound.dict() if hasattr(bound, 'dict') else bound for bound in bound_dict],
+            'mode': mode_params,
+            'deg': deg,
+        }
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+    def get_cells(self, layout_key:str, q_rates:List[float],
+                  p_targets:List[float]) -> Dict[Tuple[float, float], pd.DataFrame]:
+        """Сохраненные ячейки сетки product(q_rates, p_targets); найденные отмечаются использованными"""
+        cells = list(dict.fromkeys(product(q_rates, p_targets)))
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            for batch in _batches(cells, QUERY_BATCH_SIZE // 2):
+                rows = conn.execute(
+                    f'SELECT q_rate, p_target, result FROM vfp_cell WHERE layout_key = ? '
+                    f'AND (q_rate, p_target) IN (VALUES {", ".join(["(?, ?)"] * len(batch))})', 
+                    [layout_key, *(value for cell in batch for value in cell)]
+                )
+                found.update(
+                    ((q_rate, p_target), None if result is None else pickle.loads(result))
+                for q_rate, p_target, result in rows)
+            conn.executemany(
+                'UPDATE vfp_cell SET accessed = ? WHERE layout_key = ? AND q_rate = ? AND p_target = ?',
+                [(time.time(), layout_key, q_rate, p_target) for q_rate, p_target in found]
+            )
+        return found
+
+
+    def put_cells(self, layout_key:str, cells:Dict[Tuple[float, float], pd.DataFrame]) -> None:
+        """Сохранение ячеек {(q_rate, p_target): режим или None} и вытеснение сверх max_entries"""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO vfp_cell (layout_key, q_rate, p_target, result, accessed) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (layout_key, q_rate, p_target, None if res is None else pickle.dumps(res), time.time())
+                for (q_rate, p_target), res in cells.items()]
+            )
+            conn.execute(
+                'DELETE FROM vfp_cell WHERE rowid IN '
+                '(SELECT rowid FROM vfp_cell ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+            )
+
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM vfp_cell')
+
+
+class ModeResultCache:
+    """Итоговые режимы /calc/ в sqlite с вытеснением давно не использованных (LRU)
+
+    Ключ компоновки - хэш (ГДХ ступеней с контрольными суммами, количества агрегатов,
+    граничные условия, степень полинома), ключ режима - хэш параметров ModeParamAll.
+    Изменение точек ГДХ меняет контрольную сумму и ключ; записи компоновок с агрегатом 
+    удаляются invalidate_units. Хранится не более max_entries режимов.
+    """
+    def __init__(self, path:str='mode_results.db', max_entries:int=100000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS mode_result ('
+                'layout_key TEXT NOT NULL, mode_key TEXT NOT NULL, result BLOB, accessed REAL NOT NULL, '
+                'PRIMARY KEY (layout_key, mode_key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_mode_result_accessed ON mode_result (accessed)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS mode_result_unit ('
+                'layout_key TEXT NOT NULL, unit_id INTEGER NOT NULL, PRIMARY KEY (layout_key, unit_id))'
+            )
+
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+
+    @staticmethod
+    def layout_key(units:Sequence[EqCompressorUnit], counts:Sequence[int], bound_dict:Sequence, deg:int) -> str:
+        """Ключ компоновки (sha1 канонического json)"""
+        data = {
+            'units': [unit_checksum(unit) for unit in units],
+            'counts': list(counts),
+            'bounds': [bound.dict() if hasattr(bound, 'dict') else bound for bound in bound_dict],
+            'deg': deg,
+        }
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+    @staticmethod
+    def mode_key(mode) -> str:
+        """Ключ режима по параметрам ModeParamAll (или словарю)"""
+        data = mode.dict() if hasattr(mode, 'dict') else mode
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+    def get(self, layout_key:str, mode_keys:Sequence[str]) -> Dict[str, pd.DataFrame]:
+        """Сохраненные режимы компоновки {ключ режима: режим или None}; найденные отмечаются использованными"""
+        mode_keys = list(dict.fromkeys(mode_keys))
+        found = {}
+        with closing(self._connect()) as conn, conn:
+            for batch in _batches(mode_keys):
+                rows = conn.execute(
+                    f'SELECT mode_key, result FROM mode_result WHERE layout_key = ? '
+                    f'AND mode_key IN ({", ".join("?" * len(batch))})', [layout_key, *batch]
+                )
+                found.update(
+                    (mode_key, None if result is None else pickle.loads(result))
+                for mode_key, result in rows)
+            conn.executemany(
+                'UPDATE mode_result SET accessed = ? WHERE layout_key = ? AND mode_key = ?',
+                [(time.time(), layout_key, mode_key) for mode_key in found]
+            )
+        self.hits += len(found)
+        self.misses += len(mode_keys) - len(found)
+        return found
+
+
+    def put(self, layout_key:str, results:Dict[str, pd.DataFrame], unit_ids:Sequence[int]) -> None:
+        """Сохранение режимов {ключ режима: режим или None} и вытеснение сверх max_entries"""
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO mode_result (layout_key, mode_key, result, accessed) VALUES (?, ?, ?, ?)',
+                [
+                    (layout_key, mode_key, None if res is None else pickle.dumps(res), time.time())
+                for mode_key, res in results.items()]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO mode_result_unit (layout_key, unit_id) VALUES (?, ?)',
+                [(layout_key, unit_id) for unit_id in set(unit_ids)]
+            )
+            evicted = conn.execute(
+                'DELETE FROM mode_result WHERE rowid IN '
+                '(SELECT rowid FROM mode_result ORDER BY accessed DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+            ).rowcount
+            if evicted:
+                conn.execute(
+                    'DELETE FROM mode_result_unit WHERE layout_key NOT IN (SELECT layout_key FROM mode_result)'
+                )
+
+
+    def invalidate_units(self, unit_ids:Sequence[int]) -> int:
+        """Удаление режимов компоновок с агрегатами unit_ids
+        Returns:
+            int: Количество удаленных режимов
+        """
+        placeholders = ', '.join('?' * len(unit_ids))
+        with closing(self._connect()) as conn, conn:
+            layout_query = f'SELECT layout_key FROM mode_result_unit WHERE unit_id IN ({placeholders})'
+            deleted = conn.execute(
+                f'DELETE FROM mode_result WHERE layout_key IN ({layout_query})', list(unit_ids)
+            ).rowcount
+            conn.execute(f'DELETE FROM mode_result_unit WHERE layout_key IN ({layout_query})', list(unit_ids))
+        return deleted
+
+
+    def stats(self) -> Dict[str, float]:
+        with closing(self._connect()) as conn:
+            size = conn.execute('SELECT COUNT(*) FROM mode_result').fetchone()[0]
+        requests = self.hits + self.misses
+        return {
+            'size': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / requests if requests else 0.,
+        }
+
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM mode_result')
+            conn.execute('DELETE FROM mode_result_unit')
+
+
+class SurrogateStore:
+    """Суррогатные модели компоновок (LayoutSurrogate) в sqlite с кэшем загруженных моделей в памяти
+
+    Ключ - ключ компоновки VfpCellStore.layout_key (параметры Mode - постоянные параметры модели).
+    В памяти хранится не более max_loaded моделей (LRU). Методы с обращением к sqlite 
+    можно вызывать из потоков (asyncio.to_thread): кэш в памяти защищен блокировкой.
+    """
+    def __init__(self, path:str='surrogates.db', max_loaded:int=32) -> None:
+        self.path = path
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS surrogate ('
+                'layout_key TEXT PRIMARY KEY, model BLOB NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS surrogate_unit ('
+                'layout_key TEXT NOT NULL, unit_id INTEGER NOT NULL, PRIMARY KEY (layout_key, unit_id))'
+            )
+
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path)
+
+
+    @staticmethod
+    def layout_key(units:Sequence[EqCompressorUnit], counts:Sequence[int], bound_dict:Sequence,
+                   mode_params:Dict[str, float], deg:int) -> str:
+        return VfpCellStore.layout_key(units, counts, bound_dict, mode_params, deg)
+
+
+    def get_loaded(self, layout_key:str):
+        """Модель из кэша в памяти (без обращения к sqlite) или None"""
+        with self._lock:
+            surrogate = self._loaded.get(layout_key)
+            if surrogate is not None:
+                self._loaded.move_to_end(layout_key)
+            return surrogate
+
+
+    def get(self, layout_key:str):
+        """Модель по ключу или None"""
+        surrogate = self.get_loaded(layout_key)
+        if surrogate is None:
+            with closing(self._connect()) as conn:
+                row = conn.execute('SELECT model FROM surrogate WHERE layout_key = ?', (layout_key,)).fetchone()
+            if row is None:
+                return None
+            surrogate = pickle.loads(row[0])
+            self._remember(layout_key, surrogate)
+        return surrogate
+
+
+    def _remember(self, layout_key:str, surrogate) -> None:
+        with self._lock:
+            self._loaded[layout_key] = surrogate
+            self._loaded.move_to_end(layout_key)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+
+    def put(self, layout_key:str, surrogate, unit_ids:Sequence[int]) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO surrogate (layout_key, model, created_at) VALUES (?, ?, ?)',
+                (layout_key, pickle.dumps(surrogate), time.time())
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO surrogate_unit (layout_key, unit_id) VALUES (?, ?)',
+                [(layout_key, unit_id) for unit_id in set(unit_ids)]
+            )
+        self._remember(layout_key, surrogate)
+
+
+    def invalidate_units(self, unit_ids:Sequence[int]) -> int:
+        """Удаление моделей компоновок с агрегатами unit_ids
+        Returns:
+            int: Количество удаленных моделей
+        """
+        placeholders = ', '.join('?' * len(unit_ids))
+        with closing(self._connect()) as conn, conn:
+            keys = [row[0] for row in conn.execute(
+                f'SELECT DISTINCT layout_key FROM surrogate_unit WHERE unit_id IN ({placeholders})', list(unit_ids)
+            )]
+            conn.executemany('DELETE FROM surrogate WHERE layout_key = ?', [(key,) for key in keys])
+            conn.executemany('DELETE FROM surrogate_unit WHERE layout_key = ?', [(key,) for key in keys])
+        with self._lock:
+            for key in keys:
+                self._loaded.pop(key, None)
+        return len(keys)
@@ -1,19 +1,88 @@
 """Модуль с инициализацией ORM БД"""
-
+import configparser
+import os
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 
-# DATABASE_URL = settings.get_db_url()
-DATABASE_URL = "sqlite+aiosqlite:///test_dks.db"
+SETTING_PATH = os.environ.get('DKS_SETTING_PATH', 'setting.ini')
 
-engine = create_async_engine(url=DATABASE_URL, echo=True) 
+DEFAULT_DB_SETTINGS = {
+    'url': 'sqlite+aiosqlite:///test_dks.db',
+    'echo': 'false',
+    'pool_size': '10',
+    'max_overflow': '20',
+    'pool_timeout': '30',
+    'pool_recycle': '1800',
+    'pool_pre_ping': 'true',
+    'sqlite_wal': 'true',
+    'sqlite_busy_timeout': '5000',
+}
 
-async_session_maker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)  # объект генерирующий сессии подключения к БД
 
-class Base(DeclarativeBase):
-    pass
+def get_db_settings(setting_path:str=SETTING_PATH) -> dict:
+    """Настройки подключения: значения по умолчанию < секция [database] setting.ini < переменные DKS_DB_<KEY>"""
+    config = configparser.ConfigParser()
+    config.read_dict({'database': DEFAULT_DB_SETTINGS})
+    config.read(setting_path, encoding='utf-8')
+    section = config['database']
+    for key in DEFAULT_DB_SETTINGS:
+        env_value = os.environ.get(f'DKS_DB_{key.upper()}')
+        if env_value is not None:
+            section[key] = env_value
+    return {
+        'url': section['url'],
+        'echo': section.getboolean('echo'),
+        'pool_size': section.getint('pool_size'),
+        'max_overflow': section.getint('max_overflow'),
+        'pool_timeout': section.getint('pool_timeout'),
+        'pool_recycle': section.getint('pool_recycle'),
+        'pool_pre_ping': section.getboolean('pool_pre_ping'),
+        'sqlite_wal': section.getboolean('sqlite_wal'),
+        'sqlite_busy_timeout': section.getint('sqlite_busy_timeout'),
+    }
+
+
+def create_engine_from_settings(settings:dict=None) -> AsyncEngine:
+    """Асинхронный движок по настройкам get_db_settings
 
+    PostgreSQL (asyncpg) - пул соединений с pool_size, max_overflow, pool_pre_ping и pool_recycle.
+    SQLite (aiosqlite) - журнал WAL и synchronous=NORMAL, чтобы читатели не блокировались писателем.
+    """
+    settings = get_db_settings() if settings is None else settings
+    url = settings['url']
+    if url.startswith('sqlite'):
+        engine = create_async_engine(url, echo=settings['echo'])
+        if settings['sqlite_wal'] and ':memory:' not in url:
+            _set_sqlite_pragma(engine, settings['sqlite_busy_timeout'])
+        return engine
+    return create_async_engine(
+        url,
+        echo=settings['echo'],
+        pool_size=settings['pool_size'],
+        max_overflow=settings['max_overflow'],
+        pool_timeout=settings['pool_timeout'],
+        pool_recycle=settings['pool_recycle'],
+        pool_pre_ping=settings['pool_pre_ping'],
+    )
 
 
+def _set_sqlite_pragma(engine:AsyncEngine, busy_timeout:int) -> None:
+    @event.listens_for(engine.sync_engine, 'connect')
+    def set_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.close()
 
 
+DB_SETTINGS = get_db_settings()
+DATABASE_URL = DB_SETTINGS['url']
+
+engine = create_engine_from_settings(DB_SETTINGS)
+
+async_session_maker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)  # объект генерирующий сессии подключения к БД
+
+class Base(DeclarativeBase):
+    pass
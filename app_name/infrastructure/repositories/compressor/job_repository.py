@@ -0,0 +1,82 @@
+import json
+from datetime import datetime
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app_name.infrastructure.repositories.compressor.models.models_gdh import CalcJob, CalcJobResult
+from app_name.infrastructure.repositories.base_repository import BaseRepository
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class CalcJobRepository(BaseRepository[CalcJob]):
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, CalcJob)
+
+
+    async def create_job(self, kind: str, progress_total: int) -> int:
+        job = CalcJob(kind=kind, status='queued', progress_done=0, progress_total=progress_total)
+        self.session.add(job)
+        await self.session.commit()
+        return job.id
+
+
+    async def get_job(self, job_id: int) -> CalcJob | None:
+        return await self.session.get(CalcJob, job_id, populate_existing=True)
+
+
+    async def set_status(self, job_id: int, status: str, error: str = None):
+        values = {'status': status, 'error': error}
+        if status not in ACTIVE_STATUSES:
+            values['finished_at'] = datetime.now()
+        await self.session.execute(
+            update(CalcJob)
+            .where(CalcJob.id == job_id)
+            .values(**values)
+        )
+        await self.session.commit()
+
+
+    async def set_progress(self, job_id: int, progress_done: int):
+        await self.session.execute(
+            update(CalcJob)
+            .where(CalcJob.id == job_id)
+            .values(progress_done=progress_done)
+        )
+        await self.session.commit()
+
+
+    async def add_results(self, job_id: int, records: list, start: int = 0):
+        """Сохранение записей результата (json) с порядковыми номерами от start"""
+        if records:
+            await self.session.execute(insert(CalcJobResult), [
+                {'job_id': job_id, 'ind': start + ind, 'data': json.dumps(record)}
+            for ind, record in enumerate(records)])
+            await self.session.commit()
+
+
+    async def get_results(self, job_id: int, offset: int = 0, limit: int = 100) -> tuple[list, int]:
+        """Страница записей результата и общее количество записей"""
+        total = await self.session.scalar(
+            select(func.count(CalcJobResult.id))
+            .where(CalcJobResult.job_id == job_id)
+        )
+        result = await self.session.execute(
+            select(CalcJobResult.data)
+            .where(CalcJobResult.job_id == job_id)
+            .order_by(CalcJobResult.ind)
+            .offset(offset)
+            .limit(limit)
+        )
+        return [json.loads(data) for data in result.scalars().all()], total
+
+
+    async def mark_interrupted(self) -> int:
+        """Незавершенные расчеты (после перезапуска) переводятся в failed"""
+        result = await self.session.execute(
+            update(CalcJob)
+            .where(CalcJob.status.in_(ACTIVE_STATUSES))
+            .values(status='failed', error='Расчет прерван перезапуском сервиса', finished_at=datetime.now())
+        )
+        await self.session.commit()
+        return result.rowcount
@@ -1,11 +1,12 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Float
+from sqlalchemy import Column, String, Integer, ForeignKey, Float, DateTime, Text, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from app_name.infrastructure.repositories.compressor.database import Base
 from app_name.infrastructure.repositories.compressor.mixin.mixin import FullCodeMixin
 
 class EqCompressorTypePressureOut(Base):
     __tablename__ = 'EQ_COMPRESSOR_TYPE_PRESSURE_OUT'
-    __table_args__ = {'comment':'Таблица номинальных значений выходных давлений'}
+    __table_args__ = (UniqueConstraint('value', name='uq_EQ_COMPRESSOR_TYPE_PRESSURE_OUT_value'),
+                      {'comment':'Таблица номинальных значений выходных давлений'})
 
     id = Column(Integer, primary_key=True)
     value = Column(Float)
@@ -19,7 +20,8 @@ class EqCompressorTypePressureOut(Base):
 
 class EqCompressorTypeCompRatio(Base):
     __tablename__ = 'EQ_COMPRESSOR_TYPE_COMP_RATIO'
-    __table_args__ = {'comment':'Таблица номинальных значений степеней сжатия'}
+    __table_args__ = (UniqueConstraint('value', name='uq_EQ_COMPRESSOR_TYPE_COMP_RATIO_value'),
+                      {'comment':'Таблица номинальных значений степеней сжатия'})
 
     id = Column(Integer, primary_key=True)
     value = Column(Float)
@@ -33,7 +35,8 @@ class EqCompressorTypeCompRatio(Base):
 
 class EqCompressorTypeFreqNomimal(Base):
     __tablename__ = 'EQ_COMPRESSOR_TYPE_FREQ_NOMINAL'
-    __table_args__ = {'comment':'Таблица номинальных значений частот'}
+    __table_args__ = (UniqueConstraint('value', name='uq_EQ_COMPRESSOR_TYPE_FREQ_NOMINAL_value'),
+                      {'comment':'Таблица номинальных значений частот'})
 
 
     id = Column(Integer, primary_key=True)
@@ -48,7 +51,8 @@ class EqCompressorTypeFreqNomimal(Base):
 
 class EqCompressorTypePower(Base):
     __tablename__ = 'EQ_COMPRESSOR_TYPE_POWER'
-    __table_args__ = {'comment':'Таблица номинальных значений мощностей'}
+    __table_args__ = (UniqueConstraint('value', name='uq_EQ_COMPRESSOR_TYPE_POWER_value'),
+                      {'comment':'Таблица номинальных значений мощностей'})
 
 
     id = Column(Integer, primary_key=True)
@@ -63,7 +67,9 @@ class EqCompressorTypePower(Base):
 
 class EqCompressorType(Base):
     __tablename__ = 'EQ_COMPRESSOR_TYPE'
-    __table_args__ = {'comment':'Таблица номиналов СПЧ'}
+    __table_args__ = (UniqueConstraint('press_out_id', 'comp_ratio_id', 'freq_nominal_id', 'power_id', 
+                                       name='uq_EQ_COMPRESSOR_TYPE_nominals'),
+                      {'comment':'Таблица номиналов СПЧ'})
 
 
     id = Column(Integer, primary_key=True)
@@ -250,3 +256,37 @@ class EqCompressorUnit(Base):
 
     def __str__(self):
         return f'{self.name}'   
+
+
+
+class CalcJob(Base):
+    __tablename__ = 'CALC_JOB'
+    __table_args__ = {'comment':'Таблица фоновых расчетов'}
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, comment='Тип расчета: calc, calc_vfp')
+    status = Column(String, comment='Статус: queued, running, done, failed, cancelled')
+    progress_done = Column(Integer, default=0, comment='Рассчитано режимов/ячеек')
+    progress_total = Column(Integer, default=0, comment='Всего режимов/ячеек')
+    error = Column(Text, comment='Текст ошибки')
+    created_at = Column(DateTime, server_default=func.now())
+    finished_at = Column(DateTime)
+
+    calc_job_result = relationship('CalcJobResult',
+                         back_populates='calc_job',
+                         cascade="all, delete-orphan"
+                         )
+
+
+class CalcJobResult(Base):
+    __tablename__ = 'CALC_JOB_RESULT'
+    __table_args__ = {'comment':'Таблица результатов фоновых расчетов'}
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey('CALC_JOB.id', ondelete='CASCADE'), index=True)
+    ind = Column(Integer, comment='Порядковый номер записи результата')
+    data = Column(Text, comment='Запись результата, json')
+
+    calc_job = relationship('CalcJob',
+                         back_populates='calc_job_result'
+                         )
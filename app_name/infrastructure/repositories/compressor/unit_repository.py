@@ -1,4 +1,5 @@
-from sqlalchemy import select
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from app_name.infrastructure.repositories.compressor.models.models_gdh import *
 from sqlalchemy.orm import selectinload
@@ -12,8 +13,9 @@ class CompressorUnitRepository(BaseRepository[EqCompressorUnit]):
         self.uom_repo = BaseRepository(session, UOM)
 
 
-    async def read_data_by_id(self, id):
-        result = await self.session.execute(
+    @staticmethod
+    def _select_units_with_curves():
+        return (
             select(EqCompressorUnit)
             .options(selectinload(EqCompressorUnit.eq_compressor_perfomance_curve),
                      selectinload(EqCompressorUnit.eq_compressor_type)
@@ -25,11 +27,26 @@ class CompressorUnitRepository(BaseRepository[EqCompressorUnit]):
                      selectinload(EqCompressorUnit.eq_compressor_type)
                      .selectinload(EqCompressorType.eq_compressor_type_power)
                      )
+        )
+
+
+    async def read_data_by_id(self, id):
+        result = await self.session.execute(
+            self._select_units_with_curves()
             .where(EqCompressorUnit.id == id)
         )
         return result.scalars().all()
     
 
+    async def read_data_by_ids(self, ids) -> dict[int, list[EqCompressorUnit]]:
+        """ГДХ с точками и номиналами для набора id одним запросом (по одному на связь selectinload)"""
+        result = await self.session.execute(
+            self._select_units_with_curves()
+            .where(EqCompressorUnit.id.in_(set(ids)))
+        )
+        return {unit.id: [unit] for unit in result.scalars().all()}
+    
+
     async def read_data_by_id_uom(self, id):
         result = await self.session.execute(
             select(Dimension.dimen)
@@ -40,6 +57,23 @@ class CompressorUnitRepository(BaseRepository[EqCompressorUnit]):
         return result.scalar_one()
     
 
+    async def read_uom_with_dimen(self, uom_codes) -> dict[str, dict]:
+        """Наименования и размерности параметров по кодам UOM одним запросом"""
+        result = await self.session.execute(
+            select(UOM.uom_code, UOM.name, UOM.short_name, Dimension.dimen)
+            .outerjoin(Dimension, UOM.dimen_id == Dimension.id)
+            .where(UOM.uom_code.in_(list(uom_codes)))
+        )
+        output = {}
+        for item in result.mappings().all():
+            output.setdefault(item['uom_code'], {
+                "name": item['name'],
+                "short_name": item['short_name'],
+                "dimen": item['dimen'],
+            })
+        return output
+    
+
     async def read_data(self):
         result = await self.session.execute(
             select(
@@ -135,4 +169,99 @@ class CompressorUnitRepository(BaseRepository[EqCompressorUnit]):
             self.session.add(perf_curve)
         
         await self.session.commit()
-        return unit
\ No newline at end of file
+        return unit
+
+
+    def _insert_ignore(self, model, index_elements):
+        """INSERT ... ON CONFLICT DO NOTHING по уникальному ключу index_elements"""
+        dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(self.session.get_bind().dialect.name)
+        if dialect is None:
+            raise NotImplementedError(f'Пакетная вставка справочников не поддерживается для {self.session.get_bind().dialect.name}')
+        return dialect.insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+
+    async def _upsert_ids(self, model, columns, keys) -> dict:
+        """id записей справочника по уникальному ключу columns
+
+        Недостающие записи вставляются с ON CONFLICT DO NOTHING (параллельная загрузка 
+        не создает дублей и не падает на ограничении), затем id выбираются повторно.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        names = [column.key for column in columns]
+        await self.session.execute(
+            self._insert_ignore(model, names),
+            [dict(zip(names, key)) for key in keys]
+        )
+        result = await self.session.execute(
+            select(*columns, model.id)
+            .where(tuple_(*columns).in_(keys))
+        )
+        return {tuple(row[:-1]): row[-1] for row in result.all()}
+
+
+    async def create_compressor_units_bulk(self, dks_code: str, units: list[dict]) -> list[int]:
+        """Сохранение набора СПЧ (например, всех листов книги) одной транзакцией
+
+        Справочники номиналов и типов разрешаются одним запросом на таблицу, 
+        агрегаты и точки ГДХ вставляются пакетно (executemany).
+        Args:
+            dks_code (str): Код ДКС
+            units (list[dict]): Параметры create_compressor_unit (sheet_name, pressure_out, ..., perfomance_curves)
+        Returns:
+            list[int]: id созданных агрегатов в порядке units
+        """
+        dks_id = await self.session.scalar(
+                                    select(Dks.id)
+                                    .where(Dks.code == dks_code)
+                                    )    
+        type_params = [
+                    (EqCompressorTypePressureOut, 'pressure_out', 'press_out_id'),
+                    (EqCompressorTypeCompRatio, 'comp_ratio', 'comp_ratio_id'),
+                    (EqCompressorTypeFreqNomimal, 'freq_nominal', 'freq_nominal_id'),
+                    (EqCompressorTypePower, 'power', 'power_id')
+                    ]
+        type_rows = [{} for _ in units]
+        for model, param, id_param in type_params:
+            ids = await self._upsert_ids(model, [model.value], {(unit[param],) for unit in units})
+            for row, unit in zip(type_rows, units):
+                row[id_param] = ids[(unit[param],)]
+
+        id_params = [id_param for *_, id_param in type_params]
+        id_columns = [getattr(EqCompressorType, id_param) for id_param in id_params]
+        type_ids = await self._upsert_ids(
+            EqCompressorType, id_columns, {tuple(row[id_param] for id_param in id_params) for row in type_rows}
+        )
+
+        result = await self.session.execute(
+            insert(EqCompressorUnit).returning(EqCompressorUnit.id, sort_by_parameter_order=True),
+            [
+                {
+                'name': unit['sheet_name'],
+                'dks_id': dks_id,
+                'type_id': type_ids[tuple(row[id_param] for id_param in id_params)],
+                'k_value': unit['k_value'],
+                'r_value': unit['r_value'],
+                't_in': unit['t_in'],
+                'diam': unit['diam'],
+                }
+            for unit, row in zip(units, type_rows)]
+        )
+        #id сопоставляются по позиции: RETURNING упорядочен по параметрам вставки
+        unit_ids = result.scalars().all()
+
+        await self.session.execute(
+            insert(EqCompressorPerfomanceCurve),
+            [
+                {
+                'unit_id': unit_id,
+                'head': curve['k_nap'],
+                'non_dim_rate': curve['k_rash'],
+                'kpd': curve['kpd'],
+                }
+            for unit, unit_id in zip(units, unit_ids) 
+                for curve in unit['perfomance_curves']]
+        )
+        await self.session.commit()
+        return unit_ids
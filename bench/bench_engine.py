@@ -0,0 +1,101 @@
+"""Нагрузочное сравнение настроек SQLite: чтение ГДХ параллельно с записью
+
+Запуск из корня репозитория: python -m bench.bench_engine [путь к файлу БД]
+"""
+import asyncio
+import os
+import sys
+import time
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app_name.infrastructure.repositories.compressor.database import (
+    Base, create_engine_from_settings, get_db_settings)
+from app_name.infrastructure.repositories.compressor.models.models_gdh import (
+    EqCompressorUnit, EqCompressorPerfomanceCurve)
+
+N_READERS = 8
+DURATION = 5.
+
+
+async def _prepare(session_maker, n_units=20, n_points=40):
+    async with session_maker() as session:
+        result = await session.execute(
+            insert(EqCompressorUnit).returning(EqCompressorUnit.id),
+            [{'name': f'bench_{ind}', 'diam': 0.5} for ind in range(n_units)]
+        )
+        await session.execute(insert(EqCompressorPerfomanceCurve), [
+            {'unit_id': unit_id, 'head': 1., 'non_dim_rate': 0.01 * ind, 'kpd': 0.8}
+        for unit_id in result.scalars().all() for ind in range(n_points)])
+        await session.commit()
+
+
+async def _reader(session_maker, stop:float, stats:dict):
+    while time.monotonic() < stop:
+        start = time.monotonic()
+        try:
+            async with session_maker() as session:
+                await session.execute(
+                    select(EqCompressorUnit.name, func.count(EqCompressorPerfomanceCurve.id))
+                    .join(EqCompressorPerfomanceCurve, EqCompressorPerfomanceCurve.unit_id == EqCompressorUnit.id)
+                    .group_by(EqCompressorUnit.name)
+                )
+            stats['latency'].append(time.monotonic() - start)
+        except OperationalError:
+            stats['errors'] += 1
+
+
+async def _writer(session_maker, stop:float, stats:dict):
+    unit_id = 0
+    while time.monotonic() < stop:
+        try:
+            async with session_maker() as session:
+                await session.execute(insert(EqCompressorPerfomanceCurve), [
+                    {'unit_id': unit_id % 20 + 1, 'head': 1., 'non_dim_rate': 0.01 * ind, 'kpd': 0.8}
+                for ind in range(200)])
+                await session.commit()
+            stats['writes'] += 1
+        except OperationalError:
+            stats['errors'] += 1
+        unit_id += 1
+
+
+async def run_bench(path:str, sqlite_wal:bool) -> dict:
+    """Чтения в N_READERS задачах и непрерывная запись в течение DURATION, с"""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    settings = get_db_settings()
+    settings.update(url=f'sqlite+aiosqlite:///{path}', echo=False, sqlite_wal=sqlite_wal)
+    engine = create_engine_from_settings(settings)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    await _prepare(session_maker)
+
+    stats = {'latency': [], 'writes': 0, 'errors': 0}
+    stop = time.monotonic() + DURATION
+    await asyncio.gather(
+        _writer(session_maker, stop, stats),
+        *(_reader(session_maker, stop, stats) for _ in range(N_READERS))
+    )
+    await engine.dispose()
+    latency = sorted(stats['latency']) or [float('nan')]
+    return {
+        'reads_per_s': len(stats['latency']) / DURATION,
+        'writes_per_s': stats['writes'] / DURATION,
+        'p50_ms': latency[len(latency) // 2] * 1e3,
+        'p99_ms': latency[int(len(latency) * 0.99)] * 1e3,
+        'errors': stats['errors'],
+    }
+
+
+async def main(path:str):
+    for name, sqlite_wal in (('journal_mode=DELETE', False), ('WAL + synchronous=NORMAL', True)):
+        res = await run_bench(path, sqlite_wal)
+        print(f'{name:<26}' + '  '.join(f'{key}={value:.1f}' for key, value in res.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else 'bench_dks.db'))
@@ -0,0 +1,79 @@
+"""Нагрузочный тест API: задержки читающих эндпойнтов во время расчетов /calc/
+
+Запуск из корня репозитория (сервер уже запущен):
+    python -m bench.load_test calc_payload.json --url http://localhost:8001 --n-calc 4
+calc_payload.json - тело запроса /calc/ ({"conf_gdh": [...], "mode": [...], "bound_dict": [...]})
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+import httpx
+
+READ_ENDPOINTS = ['/api/v1/company_tree/', '/api/v1/gdh/', '/api/v1/default_bound/']
+
+
+def _percentile(values:List[float], q:float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] * 1e3 if values else float('nan')
+
+
+async def _calc_loop(client:httpx.AsyncClient, payload:Dict, stop:float, stats:Dict):
+    while time.monotonic() < stop:
+        start = time.monotonic()
+        response = await client.post('/api/v1/calc/', json=payload, timeout=None)
+        stats['calc'].append(time.monotonic() - start)
+        stats['calc_status'][response.status_code] = stats['calc_status'].get(response.status_code, 0) + 1
+
+
+async def _read_loop(client:httpx.AsyncClient, stop:float, stats:Dict, interval:float):
+    ind = 0
+    while time.monotonic() < stop:
+        start = time.monotonic()
+        await client.get(READ_ENDPOINTS[ind % len(READ_ENDPOINTS)])
+        stats['read'].append(time.monotonic() - start)
+        ind += 1
+        await asyncio.sleep(interval)
+
+
+async def run_load_test(client:httpx.AsyncClient, payload:Dict, n_calc:int=4, n_readers:int=4,
+                        duration:float=30., interval:float=0.05) -> Dict[str, float]:
+    """n_calc клиентов непрерывно отправляют /calc/, n_readers - читающие запросы
+    Returns:
+        Dict[str, float]: Количество и перцентили задержек (мс) чтений и расчетов
+    """
+    stats = {'read': [], 'calc': [], 'calc_status': {}}
+    stop = time.monotonic() + duration
+    await asyncio.gather(
+        *(_calc_loop(client, payload, stop, stats) for _ in range(n_calc)),
+        *(_read_loop(client, stop, stats, interval) for _ in range(n_readers))
+    )
+    return {
+        'reads': len(stats['read']),
+        'read_p50_ms': _percentile(stats['read'], 0.5),
+        'read_p99_ms': _percentile(stats['read'], 0.99),
+        'read_max_ms': _percentile(stats['read'], 1.),
+        'calcs': len(stats['calc']),
+        'calc_p50_ms': _percentile(stats['calc'], 0.5),
+        'calc_status': stats['calc_status'],
+    }
+
+
+async def main(args):
+    with open(args.payload, encoding='utf-8') as file:
+        payload = json.load(file)
+    async with httpx.AsyncClient(base_url=args.url) as client:
+        res = await run_load_test(client, payload, args.n_calc, args.n_readers, args.duration)
+    for key, value in res.items():
+        print(f'{key:<12} {value:.1f}' if isinstance(value, float) else f'{key:<12} {value}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('payload')
+    parser.add_argument('--url', default='http://localhost:8001')
+    parser.add_argument('--n-calc', type=int, default=4)
+    parser.add_argument('--n-readers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=30.)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,51 @@
+"""Calc jobs
+
+Revision ID: 7d2e4b9a1c35
+Revises: 3441674ea8cf
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e4b9a1c35'
+down_revision: Union[str, None] = '3441674ea8cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('CALC_JOB',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=True, comment='Тип расчета: calc, calc_vfp'),
+    sa.Column('status', sa.String(), nullable=True, comment='Статус: queued, running, done, failed, cancelled'),
+    sa.Column('progress_done', sa.Integer(), nullable=True, comment='Рассчитано режимов/ячеек'),
+    sa.Column('progress_total', sa.Integer(), nullable=True, comment='Всего режимов/ячеек'),
+    sa.Column('error', sa.Text(), nullable=True, comment='Текст ошибки'),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    comment='Таблица фоновых расчетов'
+    )
+    op.create_table('CALC_JOB_RESULT',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('ind', sa.Integer(), nullable=True, comment='Порядковый номер записи результата'),
+    sa.Column('data', sa.Text(), nullable=True, comment='Запись результата, json'),
+    sa.ForeignKeyConstraint(['job_id'], ['CALC_JOB.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    comment='Таблица результатов фоновых расчетов'
+    )
+    op.create_index(op.f('ix_CALC_JOB_RESULT_job_id'), 'CALC_JOB_RESULT', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_CALC_JOB_RESULT_job_id'), table_name='CALC_JOB_RESULT')
+    op.drop_table('CALC_JOB_RESULT')
+    op.drop_table('CALC_JOB')
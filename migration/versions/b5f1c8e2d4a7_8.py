@@ -0,0 +1,68 @@
+"""Unique compressor type nominals
+
+Revision ID: b5f1c8e2d4a7
+Revises: 7d2e4b9a1c35
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5f1c8e2d4a7'
+down_revision: Union[str, None] = '7d2e4b9a1c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VALUE_TABLES = {
+    'EQ_COMPRESSOR_TYPE_PRESSURE_OUT': 'press_out_id',
+    'EQ_COMPRESSOR_TYPE_COMP_RATIO': 'comp_ratio_id',
+    'EQ_COMPRESSOR_TYPE_FREQ_NOMINAL': 'freq_nominal_id',
+    'EQ_COMPRESSOR_TYPE_POWER': 'power_id',
+}
+TYPE_COLUMNS = list(VALUE_TABLES.values())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    #дубли номиналов: ссылки переводятся на запись с минимальным id, остальные удаляются
+    for table, column in VALUE_TABLES.items():
+        op.execute(f'''
+            UPDATE "EQ_COMPRESSOR_TYPE" SET {column} = (
+                SELECT MIN(d.id) FROM "{table}" d JOIN "{table}" s ON d.value = s.value
+                WHERE s.id = "EQ_COMPRESSOR_TYPE".{column})
+            WHERE {column} IN (SELECT id FROM "{table}" WHERE value IS NOT NULL)
+        ''')
+        op.execute(f'''
+            DELETE FROM "{table}"
+            WHERE value IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM "{table}" GROUP BY value)
+        ''')
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.create_unique_constraint(f'uq_{table}_value', ['value'])
+
+    same_type = ' AND '.join(f'd.{column} = s.{column}' for column in TYPE_COLUMNS)
+    not_null = ' AND '.join(f'{column} IS NOT NULL' for column in TYPE_COLUMNS)
+    op.execute(f'''
+        UPDATE "EQ_COMPRESSOR_UNIT" SET type_id = (
+            SELECT MIN(d.id) FROM "EQ_COMPRESSOR_TYPE" d JOIN "EQ_COMPRESSOR_TYPE" s ON {same_type}
+            WHERE s.id = "EQ_COMPRESSOR_UNIT".type_id)
+        WHERE type_id IN (SELECT id FROM "EQ_COMPRESSOR_TYPE" WHERE {not_null})
+    ''')
+    op.execute(f'''
+        DELETE FROM "EQ_COMPRESSOR_TYPE"
+        WHERE {not_null} AND id NOT IN (SELECT MIN(id) FROM "EQ_COMPRESSOR_TYPE" GROUP BY {', '.join(TYPE_COLUMNS)})
+    ''')
+    with op.batch_alter_table('EQ_COMPRESSOR_TYPE') as batch_op:
+        batch_op.create_unique_constraint('uq_EQ_COMPRESSOR_TYPE_nominals', TYPE_COLUMNS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('EQ_COMPRESSOR_TYPE') as batch_op:
+        batch_op.drop_constraint('uq_EQ_COMPRESSOR_TYPE_nominals', type_='unique')
+    for table in VALUE_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f'uq_{table}_value', type_='unique')